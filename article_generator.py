@@ -7,23 +7,258 @@ AI関連の最新ニュースを基にしたブログ記事生成モジュール
 
 import os
 import sys
-import re
-import requests
-import tempfile
-import json
+import io
 from datetime import datetime, timedelta
 from openai import OpenAI
 from dotenv import load_dotenv
 import random
-from typing import Optional, Dict, Tuple, List
+from typing import Optional, Dict, Tuple, List, Callable, Iterator
 from pathlib import Path
-import xml.etree.ElementTree as ET
-import urllib.request
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from feed_cache import FeedCache
+from image_cache import ImageCache
+from image_spool import ImageSpool
+from image_providers import ProviderHealth, provider_chain, create_providers
+from feed_parser import parse_feed_stream
+from http_client import get_session, get_timeout, DeadlineReader
+from concurrency import limiter
+from job_poller import PollPolicy, CancelToken, poll_job, first_completed, hedged
+from llm_cache import LLMCache, cache_key, ALWAYS, OPTIONAL
+from duplicate_index import DuplicateIndex
+from history_store import HistoryStore
+from vector_index import VectorIndex, create_embedding_backend
+from news_selector import parse_news_items, rank_news_items, news_source_url
+from length_budget import LengthBudget
+from html_normalizer import normalize_html
+from section_writer import (
+    OUTLINE_SYSTEM_PROMPT, DEFAULT_SECTIONS,
+    build_outline_prompt, parse_outline, build_section_messages, assemble_sections
+)
+import numpy as np
 
 load_dotenv()
 
+# 記事生成用のシステムプロンプト（本文生成・続きの生成で共通）
+ARTICLE_SYSTEM_PROMPT = """あなたはAI技術の専門知識を持つ経験豊富なテックライターです。
+以下の条件を厳密に守って記事を執筆してください：
+
+【文字数について】
+- 本文は必ず4000字以上、5000字程度にする（タイトルは除く）
+- 詳細で読み応えのある長文記事にする
+- 具体的な事例、比較情報、実用的なアドバイスを豊富に含める
+- 各セクションを詳しく掘り下げて解説する
+
+【内容について】
+- 最新のAI技術やサービスに関する情報を含める
+- AIツールの比較や評価を具体的に行う
+- 読者が実際に使える実用的な情報を提供する
+- 最新機能や新機能について詳しく解説する
+- 読者が興味を持つような内容（比較、実用例、メリット・デメリットなど）を含める
+- 専門的でありながら、初心者にもわかりやすい説明をする
+
+【ターゲット読者について】
+- AIに興味がある一般ユーザーから技術者まで幅広い読者を想定
+- 実際にAIツールを使いたい人、比較検討している人を主なターゲットとする
+- 実用的な情報を求めている読者に寄り添う
+- 業界の動向を広く知りたい人
+
+【記事のスタイル】
+- 単なるニュースの羅列ではなく、それらが社会や個人の生活にどう影響するかを考察する
+- 複数のニュースを関連付けて、大きなトレンドとして解説する
+- 読者が「へぇ、そうなんだ」と思えるような深い洞察を含める
+
+【構成について】
+- 導入: 最新のAI技術やサービスの重要性を説明
+- 最新動向: 最新ニュースや技術動向を紹介
+- 詳細解説: 主要な機能や特徴を詳しく説明
+- 比較・評価: 複数のツールやサービスを比較（該当する場合）
+- 実用例: 実際の使用例や活用方法を紹介
+- まとめ: 読者にとっての価値や今後の展望を提示
+
+【形式について】
+- HTML形式で出力する（段落は<p>タグで囲む）
+- 見出しは<h2>タグを使用して構造化する
+- 重要なポイントは<strong>タグで強調する
+- 比較表やリストは<ul>や<ol>タグを使用する
+
+【トーン】
+- 専門的でありながら親しみやすい
+- 最新技術への興奮や期待を伝える
+- 実用的で役立つ情報を提供する
+- 読者の興味を引く内容にする
+
+【出力フォーマット】
+1行目: タイトル: [記事のタイトル]
+2行目以降: [HTML形式の本文]
+"""
+
+
+class StreamBuffer:
+    """
+    ストリーミングの応答の受信バッファ（同期版と非同期パイプラインで共有）
+    受信しながら書き込み、1行目が揃った時点でそれを返す（タイトルの重複チェックで受信を打ち切るため）
+    """
+    
+    def __init__(self):
+        self._buffer = io.StringIO()
+        self._first_line_returned = False
+        # 最後のチャンクで送られるトークン数
+        self.completion_tokens: Optional[int] = None
+    
+    def feed(self, chunk) -> Optional[str]:
+        """
+        チャンクを書き込む
+        
+        Returns:
+            1行目が揃った時点で1回だけ1行目、それ以外はNone
+        """
+        if getattr(chunk, 'usage', None):
+            self.completion_tokens = chunk.usage.completion_tokens
+        if not chunk.choices:
+            return None
+        delta = chunk.choices[0].delta.content
+        if not delta:
+            return None
+        self._buffer.write(delta)
+        if not self._first_line_returned and '\n' in delta:
+            self._first_line_returned = True
+            return self._buffer.getvalue().split('\n', 1)[0]
+        return None
+    
+    def text(self) -> str:
+        """
+        受信した本文（前後の空白を除去）
+        """
+        return self._buffer.getvalue().strip()
+
+
+class DraftRetries:
+    """
+    重複しないタイトルが得られるまで記事の下書きを生成し直すための状態（同期版と非同期パイプラインで共有）
+    記事の元にするニュース・トピックの選択と、生成結果の読み取り・重複チェックの結果の判定を行う
+    OpenAIの呼び出しと重複チェック（_reserve_title）は呼び出し側で行う
+    """
+    
+    def __init__(self, generator: 'ArticleGenerator', latest_news: Optional[str], max_retries: int):
+        """
+        Args:
+            generator: 記事生成器
+            latest_news: 取得したニュース（投稿済みのものを除き、最も新しい話題から順に使う）
+            max_retries: 重複回避のための最大リトライ回数（1以上）
+        """
+        if max_retries < 1:
+            raise ValueError(f"max_retries は1以上を指定してください: {max_retries}")
+        self.generator = generator
+        self.max_retries = max_retries
+        self.attempt = 0
+        
+        # 投稿済みのニュースを除き、最も新しい話題の1件だけを記事の元にする（重複した場合は次の候補へ）
+        self.news_candidates = generator._select_news_candidates(latest_news)
+        if self.news_candidates:
+            self.latest_news = self.news_candidates.pop(0)
+        else:
+            if latest_news:
+                print("⚠️ 取得したニュースはすべて投稿済みです。フォールバックトピックを使用します。")
+            else:
+                print("⚠️ 最新ニュースの取得に失敗しました。フォールバックトピックを使用します。")
+            self.latest_news = None
+        
+        # フォールバック用のトピックを選択し、使用済みのトピックを追跡する
+        self.fallback_topic = random.choice(generator.ai_topics)
+        self.used_topics = {self.fallback_topic}
+    
+    def attempts(self) -> Iterator[int]:
+        """
+        生成の試行（ニュースがない場合は、試行ごとに使用済みでないトピックを選ぶ）
+        """
+        for attempt in range(self.max_retries):
+            self.attempt = attempt
+            print(f"\n--- 生成試行 {attempt + 1}/{self.max_retries} ---")
+            if not self.latest_news:
+                available_topics = [t for t in self.generator.ai_topics if t not in self.used_topics]
+                if available_topics:
+                    self.fallback_topic = random.choice(available_topics)
+                    self.used_topics.add(self.fallback_topic)
+            yield attempt
+    
+    @property
+    def is_last_attempt(self) -> bool:
+        """
+        最後の試行か（重複していても続行するため、1行目での打ち切りも行わない）
+        """
+        return self.attempt == self.max_retries - 1
+    
+    @property
+    def measure(self) -> bool:
+        """
+        1回目の生成結果を文字数の予算に記録するか（セクション分割の構成案は記録しない）
+        """
+        return self.generator.article_mode != 'sections'
+    
+    @property
+    def theme(self) -> str:
+        """
+        記事の元にしたニュース・トピック（画像のテーマ）
+        """
+        return self.latest_news[:100] if self.latest_news else self.fallback_topic
+    
+    def messages(self) -> Tuple[List[Dict], int]:
+        """
+        この試行の生成のメッセージと max_tokens
+        """
+        return self.generator._build_draft_messages(self.latest_news, self.fallback_topic)
+    
+    def retry(self):
+        """
+        次のニュース候補（なければ別のフォールバックトピック）で生成し直す
+        """
+        print(f"別のトピックで再生成します... ({self.attempt + 1}/{self.max_retries})")
+        self.latest_news = self.news_candidates.pop(0) if self.news_candidates else None
+        self.fallback_topic = random.choice(self.generator.ai_topics)
+    
+    def parse(self, article_text: str) -> Tuple[str, str, Optional[List[Tuple[str, str]]]]:
+        """
+        生成結果をタイトルと本文に分解
+        
+        Returns:
+            (タイトル, 本文, 構成) のタプル
+            （セクション分割の場合は本文が構成案で、内容の重複チェックには構成案の要点を使う。それ以外は構成がNone）
+        """
+        generator = self.generator
+        if generator.article_mode == 'sections':
+            title, sections = generator._parse_outline_text(article_text, self.latest_news, self.fallback_topic)
+            return title, article_text, sections
+        title, content = generator._parse_article_text(article_text, self.latest_news, self.fallback_topic)
+        return title, content, None
+    
+    def accept(self, title: str, is_duplicate: bool) -> bool:
+        """
+        重複チェックの結果を判定（重複していて最後の試行でなければ、次の候補を選んでFalseを返す）
+        
+        Returns:
+            この記事を使う場合True
+        """
+        if is_duplicate:
+            print(f"⚠️ 重複する記事が検出されました: {title}")
+            if not self.is_last_attempt:
+                self.retry()
+                return False
+            print("⚠️ 最大リトライ回数に達しました。")
+            print("⚠️ このまま投稿すると重複の可能性がありますが、続行します。")
+        print(f"✓ 重複なし: 新しい記事として認識されました")
+        return True
+
+
 class ArticleGenerator:
+    # 同じプロセス内の複数ワーカー（バッチ実行）で重複チェックと履歴保存を直列化する
+    _history_lock = threading.RLock()
+    # 重複チェックを通過したが、まだ履歴に保存されていない記事のタイトル
+    _pending_titles = set()
+    # 生成中の記事の埋め込みベクトル（タイトル -> ベクトル、履歴保存時にベクトルインデックスへ追加）
+    _pending_embeddings = {}
+    
     def __init__(self, image_source: str = 'unsplash', debug: bool = False):
         """
         Args:
@@ -55,6 +290,9 @@ class ArticleGenerator:
         
         self.client = OpenAI(api_key=api_key)
         
+        # 外部APIとの通信はコネクションプール付きの共有セッションを使う
+        self.http = get_session()
+        
         # 画像生成の設定
         self.image_source = image_source
         self.unsplash_access_key = os.getenv('UNSPLASH_ACCESS_KEY', '')
@@ -63,8 +301,34 @@ class ArticleGenerator:
         # NewsAPI設定（オプション）
         self.newsapi_key = os.getenv('NEWSAPI_KEY', '')
         
-        # 投稿履歴ファイルのパス
+        # 投稿履歴（SQLite、旧形式の post_history.json は初回に取り込む）
         self.history_file = Path('post_history.json')
+        self.history_store = HistoryStore(self.history_file.with_name('post_history.db'),
+                                          legacy_json=self.history_file)
+        # 投稿履歴の保存期間（日）
+        self.history_retention_days = int(os.getenv('HISTORY_RETENTION_DAYS', '180'))
+        # 重複チェック用インデックス（初回の重複チェック時に投稿履歴から作成する）
+        self._duplicate_index = None
+        # 意味的な重複チェック（埋め込みベクトル）の設定
+        self.semantic_check = os.getenv('SEMANTIC_DUPLICATE_CHECK', 'true').lower() == 'true'
+        self.vectors_file = self.history_file.with_name('post_history_vectors.f32')
+        self._vector_index = None
+        
+        # RSSフィードのキャッシュ（条件付きGETで変更がなければ再利用）
+        self.feed_cache = FeedCache()
+        # OpenAIの応答キャッシュ（同じプロンプトの再実行でAPIを呼ばない）
+        self.llm_cache = LLMCache()
+        # アイキャッチ画像のキャッシュ（アップロード済みの画像のダウンロードを省き、最近使った画像を避ける）
+        self.image_cache = ImageCache()
+        # 画像の取得元ごとの所要時間・エラー率（失敗が続く取得元はスキップする）
+        self.provider_health = ProviderHealth()
+        
+        # 記事の文字数の予算（1トークンあたりの文字数の測定結果から max_tokens を決める）
+        self.length_budget = LengthBudget()
+        
+        # 記事の生成方法（'single': 1回の生成 + 続き / 'sections': 構成を作ってセクションを並列に生成）
+        self.article_mode = os.getenv('ARTICLE_MODE', 'single').lower()
+        self.section_concurrency = int(os.getenv('SECTION_CONCURRENCY', '4'))
         
         print(f"📝 画像ソース: {self.image_source}")
         print(f"🔑 Unsplash APIキー: {'設定済み' if self.unsplash_access_key else '未設定'}")
@@ -103,110 +367,215 @@ class ArticleGenerator:
             "AI開発フレームワーク：LangChain vs LlamaIndex",
         ]
     
-    def _load_post_history(self) -> List[Dict]:
+    def _get_duplicate_index(self) -> DuplicateIndex:
         """
-        投稿履歴を読み込む
-        
-        Returns:
-            投稿履歴のリスト
+        重複チェック用インデックスを取得（他のプロセスが追加した履歴も差分で反映する）
+        """
+        if self._duplicate_index is None:
+            self._duplicate_index = DuplicateIndex.from_store(self.history_store)
+        else:
+            self._duplicate_index.sync(self.history_store)
+        return self._duplicate_index
+    
+    def _get_vector_index(self) -> Optional[VectorIndex]:
+        """
+        意味的な重複チェック用のベクトルインデックスを取得（無効または作成できない場合はNone）
         """
-        if self.history_file.exists():
+        if not self.semantic_check:
+            return None
+        if self._vector_index is None:
             try:
-                with open(self.history_file, 'r', encoding='utf-8') as f:
-                    history = json.load(f)
-                    return history if isinstance(history, list) else []
+                backend = create_embedding_backend(client=self.client)
+                self._vector_index = VectorIndex(self.vectors_file, backend)
             except Exception as e:
-                print(f"⚠️ 投稿履歴の読み込みエラー: {e}")
-                return []
-        return []
+                print(f"⚠️ 意味的な重複チェックを無効にします: {e}")
+                self.semantic_check = False
+                return None
+        return self._vector_index
     
-    def _save_post_history(self, history: List[Dict]):
+    def _embed_article(self, title: str, content: str) -> Optional[np.ndarray]:
         """
-        投稿履歴を保存する
-        
-        Args:
-            history: 投稿履歴のリスト
+        記事の埋め込みベクトルを計算（失敗した場合はNoneを返し、タイトルのみで重複チェックする）
         """
+        vector_index = self._get_vector_index()
+        if vector_index is None or not content:
+            return None
         try:
-            # 30日以上前の履歴を削除
-            cutoff_date = datetime.now() - timedelta(days=30)
-            filtered_history = [
-                h for h in history
-                if datetime.fromisoformat(h.get('date', '2000-01-01')) > cutoff_date
-            ]
-            
-            with open(self.history_file, 'w', encoding='utf-8') as f:
-                json.dump(filtered_history, f, ensure_ascii=False, indent=2)
+            return vector_index.embed(title, content)
         except Exception as e:
-            print(f"⚠️ 投稿履歴の保存エラー: {e}")
+            print(f"⚠️ 埋め込みの計算に失敗しました（タイトルのみで重複チェックします）: {e}")
+            return None
     
-    def _calculate_similarity(self, text1: str, text2: str) -> float:
+    def _is_duplicate(self, title: str, content: str = "",
+                      embedding: Optional[np.ndarray] = None) -> bool:
         """
-        2つのテキストの類似度を計算（簡易版）
+        タイトルと内容が重複していないかチェック（厳密版）
         
         Args:
-            text1: テキスト1
-            text2: テキスト2
+            title: 記事のタイトル
+            content: 記事の内容（オプション）
+            embedding: 記事の埋め込みベクトル（省略時は content から計算）
             
         Returns:
-            類似度（0.0〜1.0）
+            重複している場合True
         """
-        # 単語に分割
-        words1 = set(text1.lower().split())
-        words2 = set(text2.lower().split())
+        # 履歴全体を走査せず、インデックスで共通する単語を持つ記事だけを比較する
+        # 他のワーカーが生成中の記事も比較対象に含める
+        reason = self._get_duplicate_index().find_duplicate(title, extra_titles=self._pending_titles)
+        if reason:
+            print(reason)
+            return True
         
-        # 共通単語の割合を計算
-        if not words1 or not words2:
-            return 0.0
+        # 言い回しが違うだけの同じ話題の記事を、本文の埋め込みベクトルで検出する
+        if embedding is None:
+            embedding = self._embed_article(title, content)
+        vector_index = self._get_vector_index()
+        if embedding is not None and vector_index is not None:
+            match = vector_index.search(embedding, extra=self._pending_embeddings)
+            if match:
+                similar_title, similarity = match
+                print(f"⚠️ 内容の類似度が高い記事があります ({similarity:.2%}): {similar_title}")
+                return True
         
-        intersection = words1.intersection(words2)
-        union = words1.union(words2)
+        return False
+    
+    def _cached_chat(self, messages: List[Dict], max_tokens: int, temperature: float, model: str,
+                     cache: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+        """
+        応答キャッシュを確認（同期版と非同期パイプラインで共有）
         
-        return len(intersection) / len(union) if union else 0.0
+        Returns:
+            (キャッシュのキー（キャッシュしない場合はNone）, キャッシュ済みの応答（なければNone）) のタプル
+        """
+        if not self.llm_cache.enabled_for(cache):
+            return None, None
+        key = cache_key(model, messages, {'temperature': temperature, 'max_tokens': max_tokens})
+        cached = self.llm_cache.get(key)
+        if cached is not None:
+            print("✓ 応答キャッシュを使用しました")
+        return key, cached
     
-    def _is_duplicate(self, title: str, content: str = "") -> bool:
+    @staticmethod
+    def _chat_request(messages: List[Dict], max_tokens: int, temperature: float, model: str,
+                      stream: bool) -> Dict:
         """
-        タイトルと内容が重複していないかチェック（厳密版）
+        チャット補完のリクエストの引数（同期版と非同期パイプラインで共有）
+        """
+        request = {
+            'model': model,
+            'messages': messages,
+            'temperature': temperature,
+            'max_tokens': max_tokens,
+        }
+        if stream:
+            # 最後のチャンクでトークン数を受け取る（文字数の予算の測定に使う）
+            request['stream'] = True
+            request['stream_options'] = {"include_usage": True}
+        return request
+    
+    def _finish_chat(self, content: str, completion_tokens: Optional[int], key: Optional[str],
+                     measure: bool) -> str:
+        """
+        受信した応答を文字数の予算に記録し、応答キャッシュに保存（同期版と非同期パイプラインで共有）
+        """
+        if measure:
+            self.length_budget.record(content, completion_tokens)
+        if key is not None:
+            self.llm_cache.put(key, content)
+        return content
+    
+    def _chat_completion(self, messages: List[Dict], max_tokens: int, temperature: float = 0.8,
+                         model: str = "gpt-4o-mini", cache: Optional[str] = None,
+                         on_first_line: Optional[Callable[[str], bool]] = None,
+                         measure: bool = False) -> Optional[str]:
+        """
+        OpenAIにチャット補完をリクエストし、本文を返す
         
         Args:
-            title: 記事のタイトル
-            content: 記事の内容（オプション）
+            messages: チャットのメッセージ
+            max_tokens: 最大トークン数
+            temperature: 温度
+            model: モデル名
+            cache: 応答キャッシュの方針（ALWAYS / OPTIONAL、省略時はキャッシュしない）
+            on_first_line: 指定した場合はストリーミングで受信し、1行目を受信した時点で呼び出す
+                           （Falseを返すと受信を打ち切る）
+            measure: 応答の文字数とトークン数を記事の文字数の予算に記録するかどうか
             
         Returns:
-            重複している場合True
+            応答の本文（前後の空白を除去）、on_first_line で打ち切った場合はNone
         """
-        history = self._load_post_history()
+        key, cached = self._cached_chat(messages, max_tokens, temperature, model, cache)
+        if cached is not None:
+            return cached
         
-        title_lower = title.lower().strip()
+        request = self._chat_request(messages, max_tokens, temperature, model, stream=on_first_line is not None)
+        with limiter('openai'):
+            if on_first_line is None:
+                response = self.client.chat.completions.create(**request)
+                content = response.choices[0].message.content.strip()
+                completion_tokens = getattr(response.usage, 'completion_tokens', None)
+            else:
+                buffer = StreamBuffer()
+                content = self._read_stream(self.client.chat.completions.create(**request), on_first_line, buffer)
+                if content is None:
+                    return None
+                completion_tokens = buffer.completion_tokens
         
-        for entry in history:
-            existing_title = entry.get('title', '').lower().strip()
-            existing_theme = entry.get('theme', '').lower().strip()
-            
-            # 1. 完全一致チェック
-            if title_lower == existing_title:
-                print(f"⚠️ 完全一致: {existing_title}")
-                return True
-            
-            # 2. タイトルの類似度チェック（70%以上で重複）
-            similarity = self._calculate_similarity(title_lower, existing_title)
-            if similarity > 0.7:
-                print(f"⚠️ 高類似度 ({similarity:.2%}): {existing_title}")
-                return True
-            
-            # 3. 最初の30文字が一致している場合
-            if len(title_lower) > 30 and len(existing_title) > 30:
-                if title_lower[:30] == existing_title[:30]:
-                    print(f"⚠️ 冒頭一致: {existing_title}")
-                    return True
-            
-            # 4. テーマの重複チェック（同じテーマは避ける）
-            if existing_theme and len(existing_theme) > 10:
-                theme_similarity = self._calculate_similarity(title_lower, existing_theme)
-                if theme_similarity > 0.6:
-                    print(f"⚠️ テーマ重複 ({theme_similarity:.2%}): {existing_theme}")
-                    return True
+        return self._finish_chat(content, completion_tokens, key, measure)
+    
+    @staticmethod
+    def _read_stream(stream, on_first_line: Callable[[str], bool],
+                     buffer: Optional['StreamBuffer'] = None) -> Optional[str]:
+        """
+        ストリーミングの応答を受信し、1行目が揃った時点で on_first_line を呼び出す
+        
+        Args:
+            buffer: 受信バッファ（指定した場合、最後に送られるトークン数も書き込まれる）
+        
+        Returns:
+            応答の本文（前後の空白を除去）、打ち切った場合はNone
+        """
+        buffer = buffer or StreamBuffer()
+        try:
+            for chunk in stream:
+                first_line = buffer.feed(chunk)
+                if first_line is not None and not on_first_line(first_line):
+                    return None
+        finally:
+            # 打ち切った場合も接続を閉じて、残りのトークンの生成を止める
+            stream.close()
+        return buffer.text()
+    
+    @staticmethod
+    def _title_from_first_line(line: str) -> Optional[str]:
+        """
+        生成中の記事の1行目からタイトルを取り出す（_parse_article_text と同じ規則）
         
+        Returns:
+            タイトル、1行目がタイトルでない場合はNone
+        """
+        line = line.strip()
+        if line.startswith('タイトル:') or line.startswith('タイトル：'):
+            return line.replace('タイトル:', '').replace('タイトル：', '').strip() or None
+        if line and not line.startswith('#'):
+            return line
+        return None
+    
+    def _is_duplicate_title_line(self, first_line: str) -> bool:
+        """
+        生成中の記事の1行目（タイトル）が既存の記事と重複していないかチェック
+        本文を待たずにタイトルだけで判定する（内容による判定は生成後の _reserve_title で行う）
+        
+        Returns:
+            重複している場合True
+        """
+        title = self._title_from_first_line(first_line)
+        if not title:
+            return False
+        with self._history_lock:
+            if self._is_duplicate(title):
+                print(f"⚠️ タイトルが重複しているため生成を中断しました: {title}")
+                return True
         return False
     
     def _save_debug_artifact(self, name: str, content: str):
@@ -227,6 +596,53 @@ class ArticleGenerator:
         except Exception as e:
             print(f"⚠️ デバッグ情報保存エラー: {e}")
 
+    def _fetch_single_feed(self, url: str, max_items: int = 2, deadline: Optional[float] = None) -> List[str]:
+        """
+        RSS / Atomフィードを1件取得してニュース行に整形する（ワーカースレッドで実行）
+        
+        Args:
+            url: RSSフィードのURL
+            max_items: 取得する最大件数（各ソースから最新2件）
+            deadline: 全体の期限（time.monotonic() の値）。タイムアウトを残り時間以下にし、期限を過ぎたら読み込みを打ち切る
+            
+        Returns:
+            整形済みニュース行のリスト
+        """
+        timeout = get_timeout('rss')
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError("制限時間を過ぎたため取得しません")
+            timeout = min(timeout, remaining)
+        
+        print(f"  - Fetching: {url}")
+        cached = self.feed_cache.get(url)
+        headers = {'User-Agent': 'Mozilla/5.0'}
+        headers.update(FeedCache.conditional_headers(cached))
+        
+        with self.http.get(url, headers=headers, timeout=timeout, stream=True) as response:
+            # 304 Not Modified の場合は保存済みのアイテムを再利用
+            if response.status_code == 304 and cached:
+                print(f"  ✓ 更新なし（キャッシュを使用）: {url}")
+                self.feed_cache.touch(url, cached)
+                channel_title, items = cached['channel_title'], cached['items']
+            else:
+                response.raise_for_status()
+                # gzip等を展開しながら読み込み、必要な件数が集まった時点で打ち切る
+                response.raw.decode_content = True
+                stream = response.raw if deadline is None else DeadlineReader(response.raw, deadline)
+                channel_title, items = parse_feed_stream(stream, max_items)
+                self.feed_cache.put(
+                    url, channel_title, items,
+                    etag=response.headers.get('ETag'),
+                    last_modified=response.headers.get('Last-Modified')
+                )
+        
+        return [
+            f"- [{channel_title}] {item['title']}: {item['description']} ({item['link']})"
+            for item in items[:max_items]
+        ]
+
     def _fetch_rss_news(self) -> Optional[str]:
         """
         RSSフィードから最新ニュースを取得
@@ -244,40 +660,26 @@ class ArticleGenerator:
         
         all_news = []
         
-        print("RSSフィードから最新ニュースを取得中...")
+        # 全体の制限時間（秒）。遅いフィードがあっても最も遅い1件分の待ち時間に収める
+        deadline = float(os.getenv('RSS_FETCH_DEADLINE', '8'))
         
-        for url in rss_urls:
+        print(f"RSSフィードから最新ニュースを取得中... ({len(rss_urls)}件を並列取得、制限時間{deadline:.0f}秒)")
+        
+        # 各フィードの取得にも期限を渡し、打ち切ったフィードのスレッドが制限時間を過ぎて通信を続けないようにする
+        fetch_deadline = time.monotonic() + deadline
+        executor = ThreadPoolExecutor(max_workers=len(rss_urls))
+        futures = [executor.submit(self._fetch_single_feed, url, deadline=fetch_deadline) for url in rss_urls]
+        done, _ = wait(futures, timeout=deadline)
+        # 制限時間内に終わらなかったフィードは待たずに打ち切る
+        executor.shutdown(wait=False, cancel_futures=True)
+        
+        # ソースの並び順を維持して結果をまとめる
+        for url, future in zip(rss_urls, futures):
+            if future not in done:
+                print(f"  ⚠️ RSS取得タイムアウト ({url})")
+                continue
             try:
-                print(f"  - Fetching: {url}")
-                req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-                with urllib.request.urlopen(req, timeout=5) as response:
-                    xml_content = response.read()
-                    root = ET.fromstring(xml_content)
-                    
-                    # チャンネル情報を取得
-                    channel_title = "Unknown Source"
-                    channel = root.find('channel')
-                    if channel is not None:
-                        title_elem = channel.find('title')
-                        if title_elem is not None:
-                            channel_title = title_elem.text
-                    
-                    # アイテムを取得
-                    count = 0
-                    for item in root.findall('.//item'):
-                        if count >= 2: break  # 各ソースから最新2件
-                        
-                        title = item.find('title').text if item.find('title') is not None else "No Title"
-                        desc = item.find('description').text if item.find('description') is not None else ""
-                        link = item.find('link').text if item.find('link') is not None else ""
-                        
-                        # HTMLタグを除去
-                        if desc:
-                            desc = re.sub(r'<[^>]+>', '', desc)[:200] + "..."
-                        
-                        all_news.append(f"- [{channel_title}] {title}: {desc} ({link})")
-                        count += 1
-                        
+                all_news.extend(future.result())
             except Exception as e:
                 print(f"  ⚠️ RSS取得エラー ({url}): {e}")
         
@@ -312,7 +714,7 @@ class ArticleGenerator:
                     'X-API-Key': self.newsapi_key
                 }
                 
-                response = requests.get(url, params=params, headers=headers, timeout=10)
+                response = self.http.get(url, params=params, headers=headers, timeout=get_timeout('newsapi'))
                 response.raise_for_status()
                 
                 data = response.json()
@@ -356,17 +758,15 @@ class ArticleGenerator:
 
 最新の情報を5-7件、簡潔にまとめてください。各項目は「- タイトル: 説明」の形式で出力してください。"""
             
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
+            news_summary = self._chat_completion(
+                [
                     {"role": "system", "content": "あなたはAI技術の専門家です。最新のAIニュースや技術動向について正確な情報を提供します。"},
                     {"role": "user", "content": search_prompt}
                 ],
                 temperature=0.7,
-                max_tokens=1000
+                max_tokens=1000,
+                cache=OPTIONAL
             )
-            
-            news_summary = response.choices[0].message.content.strip()
             print("✓ OpenAIから最新情報を取得しました")
             self._save_debug_artifact("openai_news_search.txt", news_summary)
             return news_summary
@@ -375,6 +775,34 @@ class ArticleGenerator:
             print(f"⚠️ 最新情報取得エラー: {e}")
             return None
     
+    def _select_news_candidates(self, latest_news: Optional[str]) -> List[str]:
+        """
+        取得したニュースから投稿済みのものを除き、記事の元にする候補を優先順に並べる
+        
+        Args:
+            latest_news: ニュースの要約テキスト
+            
+        Returns:
+            ニュース1件ごとの文字列のリスト（1件ずつの形式でない場合は元のテキストのみ）
+        """
+        items = parse_news_items(latest_news)
+        if not items:
+            return [latest_news] if latest_news else []
+        
+        # 同じURLのニュースを元にした記事があれば、類似度を計算するまでもなく除外する
+        unused_items = []
+        for item in items:
+            if self.history_store.has_source_url(item['link']):
+                print(f"  ⏭️ 投稿済みのニュースを除外（URL一致）: {item['title'][:60]}")
+            else:
+                unused_items.append(item)
+        items, total = unused_items, len(items)
+        
+        with self._history_lock:
+            ranked = rank_news_items(items, self._get_duplicate_index())
+        print(f"✓ ニュース候補: {total}件中 {len(ranked)}件が未使用")
+        return [item['text'] for item in ranked]
+    
     def _generate_image_keywords(self, theme: str) -> str:
         """
         記事テーマから画像検索用のキーワードを生成（OpenAIを使用）
@@ -397,17 +825,16 @@ Requirements:
 - Return ONLY the keywords separated by spaces (no punctuation, no explanations)
 - Example output: artificial intelligence robot future technology blue"""
 
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
+            # 同じテーマなら同じキーワードでよいため、常にキャッシュを使う
+            keywords = self._chat_completion(
+                [
                     {"role": "system", "content": "You are an expert at finding the perfect stock photos for tech articles."},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.7,
-                max_tokens=50
+                max_tokens=50,
+                cache=ALWAYS
             )
-            
-            keywords = response.choices[0].message.content.strip()
             print(f"✓ 生成されたキーワード: {keywords}")
             return keywords
             
@@ -416,7 +843,7 @@ Requirements:
             # フォールバック
             return 'artificial intelligence technology future'
     
-    def generate_image_from_unsplash(self, theme: str) -> Optional[Tuple[str, str]]:
+    def generate_image_from_unsplash(self, theme: str) -> Optional[Tuple[str, Optional[ImageSpool]]]:
         """
         Unsplash APIから記事テーマに関連する画像を取得
         
@@ -424,7 +851,7 @@ Requirements:
             theme: 記事のテーマ
             
         Returns:
-            (画像URL, 画像ファイルパス) のタプル、失敗時はNone
+            (画像URL, 画像データ) のタプル、失敗時はNone
         """
         if not self.unsplash_access_key:
             print("⚠️ UNSPLASH_ACCESS_KEYが設定されていません。画像生成をスキップします。")
@@ -455,47 +882,39 @@ Requirements:
             if self.debug:
                 print(f"🔧 Unsplash Request: {url} params={params}")
             
-            response = requests.get(url, params=params, headers=headers, timeout=10)
+            response = self.http.get(url, params=params, headers=headers, timeout=get_timeout('unsplash'))
             response.raise_for_status()
             
             data = response.json()
             image_url = data['urls']['regular']  # 1080px幅の画像
             
-            # 画像をダウンロード
-            print(f"画像をダウンロード中: {image_url}")
-            image_response = requests.get(image_url, timeout=30)
-            image_response.raise_for_status()
-            
-            # 一時ファイルに保存
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.jpg')
-            temp_file.write(image_response.content)
-            temp_file.close()
-            
-            print(f"✓ Unsplashから画像を取得しました: {temp_file.name}")
-            return (image_url, temp_file.name)
+            image = self._download_image(image_url, '.jpg')
+            print(f"✓ Unsplashから画像を取得しました: {image_url}")
+            return (image_url, image)
             
         except Exception as e:
             print(f"⚠️ Unsplash画像取得エラー: {e}")
             return None
     
-    def generate_image_from_banana_pro(self, theme: str, title: str) -> Optional[Tuple[str, str]]:
+    def generate_image_from_banana_pro(self, theme: str, title: str,
+                                       cancel: Optional[CancelToken] = None) -> Optional[Tuple[str, Optional[ImageSpool]]]:
         """
         Banana Pro (Nano)で記事テーマに関連する画像を生成
+        BANANA_CANDIDATES を2以上にすると複数の生成を並列に開始し、最初に完了した画像を使う
         
         Args:
             theme: 記事のテーマ
             title: 記事のタイトル
+            cancel: セットされたら生成の完了を待つのをやめるイベント
             
         Returns:
-            (画像URL, 画像ファイルパス) のタプル、失敗時はNone
+            (画像URL, 画像データ) のタプル、失敗時はNone
         """
         if not self.banana_api_key:
             print("⚠️ BANANA_API_KEYが設定されていません。")
             return None
         
         try:
-            import base64
-            
             # プロンプトを生成（英語で）
             prompt = f"""Professional tech blog header image about {theme}. 
 Modern, clean design with AI and technology theme. 
@@ -505,95 +924,22 @@ Colors: blues, purples, tech gradients. No text."""
             print(f"Banana Pro (Nano)で画像を生成中...")
             print(f"プロンプト: {prompt[:100]}...")
             
-            # Banana Pro APIを使用して画像生成
-            url = "https://api.banana.dev/start/v4"
-            headers = {
-                "Content-Type": "application/json"
-            }
-            
-            data = {
-                "apiKey": self.banana_api_key,
-                "modelKey": "flux-nano",  # Nanoモデルを使用
-                "modelInputs": {
-                    "prompt": prompt,
-                    "width": 1024,
-                    "height": 576,  # 16:9アスペクト比
-                    "num_inference_steps": 4,  # Nanoは高速生成
-                    "guidance_scale": 3.5
-                }
-            }
-            
-            # 画像生成リクエスト
-            response = requests.post(url, json=data, headers=headers, timeout=30)
-            response.raise_for_status()
-            
-            result = response.json()
+            candidates = max(1, int(os.getenv('BANANA_CANDIDATES', '1')))
+            policy = PollPolicy(deadline=float(os.getenv('BANANA_MAX_WAIT', '30')))
+            print(f"画像生成中... (最大{policy.deadline:.0f}秒待機、候補数: {candidates})")
             
-            # callIDを取得
-            call_id = result.get('callID')
-            if not call_id:
-                print(f"⚠️ callIDが取得できませんでした: {result}")
-                return None
-            
-            # 結果を取得
-            print("画像生成中... (最大30秒待機)")
-            check_url = "https://api.banana.dev/check/v4"
-            max_wait = 30
-            start_time = time.time()
-            
-            while time.time() - start_time < max_wait:
-                check_data = {
-                    "apiKey": self.banana_api_key,
-                    "callID": call_id
-                }
-                
-                check_response = requests.post(check_url, json=check_data, headers=headers, timeout=10)
-                check_response.raise_for_status()
-                
-                check_result = check_response.json()
-                
-                if check_result.get('finished'):
-                    model_outputs = check_result.get('modelOutputs', [{}])
-                    if model_outputs and len(model_outputs) > 0:
-                        # Base64エンコードされた画像を取得
-                        image_base64 = model_outputs[0].get('image_base64')
-                        if image_base64:
-                            # Base64をデコードして画像として保存
-                            image_data = base64.b64decode(image_base64)
-                            
-                            # 一時ファイルに保存
-                            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.jpg')
-                            temp_file.write(image_data)
-                            temp_file.close()
-                            
-                            print(f"✓ Banana Pro (Nano)で画像を生成しました: {temp_file.name}")
-                            # URLはローカルファイルパスを返す
-                            return (f"file://{temp_file.name}", temp_file.name)
-                        else:
-                            # URLが返される場合
-                            image_url = model_outputs[0].get('image_url')
-                            if image_url:
-                                # 画像をダウンロード
-                                print(f"画像をダウンロード中: {image_url}")
-                                image_response = requests.get(image_url, timeout=30)
-                                image_response.raise_for_status()
-                                
-                                # 一時ファイルに保存
-                                temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.jpg')
-                                temp_file.write(image_response.content)
-                                temp_file.close()
-                                
-                                print(f"✓ Banana Pro (Nano)で画像を生成しました: {temp_file.name}")
-                                return (image_url, temp_file.name)
-                    
-                    print(f"⚠️ 予期しない出力形式: {model_outputs}")
+            def run_candidate(cancel: threading.Event) -> Optional[Tuple[str, Optional[ImageSpool]]]:
+                call_id = self._start_banana_job(prompt)
+                if not call_id:
                     return None
-                
-                # まだ処理中の場合は待機
-                time.sleep(1)
+                check_result = poll_job(lambda: self._check_banana_job(call_id), policy, cancel)
+                if check_result is None:
+                    if not cancel.is_set():
+                        print("⚠️ Banana Pro (Nano)画像生成タイムアウト")
+                    return None
+                return self._banana_output_image(check_result)
             
-            print("⚠️ Banana Pro (Nano)画像生成タイムアウト")
-            return None
+            return first_completed([run_candidate] * candidates, discard=self._close_image_result, cancel=cancel)
             
         except Exception as e:
             print(f"⚠️ Banana Pro (Nano)画像生成エラー: {e}")
@@ -601,183 +947,232 @@ Colors: blues, purples, tech gradients. No text."""
             traceback.print_exc()
             return None
     
-    def generate_image_from_dalle(self, theme: str, title: str) -> Optional[Tuple[str, str]]:
+    def _start_banana_job(self, prompt: str) -> Optional[str]:
         """
-        DALL-E 3で記事テーマに関連する画像を生成
+        Banana Pro (Nano)の画像生成ジョブを開始
         
-        Args:
-            theme: 記事のテーマ
-            title: 記事のタイトル
-            
         Returns:
-            (画像URL, 画像ファイルパス) のタプル、失敗時はNone
+            ジョブのcallID、取得できなかった場合はNone
         """
-        try:
-            # プロンプトを生成（英語で）
-            prompt = f"""Create a professional, modern illustration for an AI technology blog article about: {theme}. 
-The image should be:
-- Clean and minimalist design
-- Suitable for a technology blog
-- Related to artificial intelligence, AI technology, or digital innovation
-- Modern tech colors (blues, purples, gradients)
-- Futuristic but approachable
-- No text in the image
-Style: Modern tech illustration, professional, sleek"""
-            
-            print(f"DALL-E 3で画像を生成中...")
-            print(f"プロンプト: {prompt[:100]}...")
-            
-            response = self.client.images.generate(
-                model="dall-e-3",
-                prompt=prompt,
-                size="1024x1024",
-                quality="standard",
-                n=1,
-            )
+        data = {
+            "apiKey": self.banana_api_key,
+            "modelKey": "flux-nano",  # Nanoモデルを使用
+            "modelInputs": {
+                "prompt": prompt,
+                "width": 1024,
+                "height": 576,  # 16:9アスペクト比
+                "num_inference_steps": 4,  # Nanoは高速生成
+                "guidance_scale": 3.5
+            }
+        }
+        response = self.http.post("https://api.banana.dev/start/v4", json=data,
+                                  headers={"Content-Type": "application/json"},
+                                  timeout=get_timeout('banana_start'))
+        response.raise_for_status()
+        
+        result = response.json()
+        call_id = result.get('callID')
+        if not call_id:
+            print(f"⚠️ callIDが取得できませんでした: {result}")
+        return call_id
+    
+    def _check_banana_job(self, call_id: str) -> Optional[Dict]:
+        """
+        Banana Pro (Nano)のジョブが完了したか問い合わせる
+        
+        Returns:
+            完了していれば応答、処理中ならNone
+        """
+        check_data = {
+            "apiKey": self.banana_api_key,
+            "callID": call_id
+        }
+        check_response = self.http.post("https://api.banana.dev/check/v4", json=check_data,
+                                        headers={"Content-Type": "application/json"},
+                                        timeout=get_timeout('banana_check'))
+        check_response.raise_for_status()
+        
+        check_result = check_response.json()
+        return check_result if check_result.get('finished') else None
+    
+    def _banana_output_image(self, check_result: Dict) -> Optional[Tuple[str, Optional[ImageSpool]]]:
+        """
+        完了したジョブの応答から画像を取り出す
+        """
+        import base64
+        
+        model_outputs = check_result.get('modelOutputs', [{}])
+        if model_outputs and len(model_outputs) > 0:
+            # Base64エンコードされた画像を取得
+            image_base64 = model_outputs[0].get('image_base64')
+            if image_base64:
+                # Base64をデコードして画像データにする
+                image = ImageSpool.from_bytes(base64.b64decode(image_base64), '.jpg')
+                
+                print(f"✓ Banana Pro (Nano)で画像を生成しました: {image.size}バイト")
+                # 取得元のURLはないため空文字を返す
+                return ('', image)
+            else:
+                # URLが返される場合
+                image_url = model_outputs[0].get('image_url')
+                if image_url:
+                    image = self._download_image(image_url, '.jpg')
+                    print(f"✓ Banana Pro (Nano)で画像を生成しました: {image_url}")
+                    return (image_url, image)
+        
+        print(f"⚠️ 予期しない出力形式: {model_outputs}")
+        return None
+    
+    @staticmethod
+    def _close_image_result(result: Tuple[str, Optional[ImageSpool]]):
+        """
+        使わなかった画像の画像データを閉じる
+        """
+        image = result[1]
+        if image:
+            image.close()
+    
+    def generate_image_from_dalle(self, theme: str, title: str) -> Optional[Tuple[str, Optional[ImageSpool]]]:
+        """
+        DALL-E 3で記事テーマに関連する画像を生成
+        
+        Args:
+            theme: 記事のテーマ
+            title: 記事のタイトル
             
-            image_url = response.data[0].url
+        Returns:
+            (画像URL, 画像データ) のタプル、失敗時はNone
+        """
+        try:
+            # プロンプトを生成（英語で）
+            prompt = f"""Create a professional, modern illustration for an AI technology blog article about: {theme}. 
+The image should be:
+- Clean and minimalist design
+- Suitable for a technology blog
+- Related to artificial intelligence, AI technology, or digital innovation
+- Modern tech colors (blues, purples, gradients)
+- Futuristic but approachable
+- No text in the image
+Style: Modern tech illustration, professional, sleek"""
             
-            # 画像をダウンロード
-            print(f"画像をダウンロード中: {image_url}")
-            image_response = requests.get(image_url, timeout=30)
-            image_response.raise_for_status()
+            print(f"DALL-E 3で画像を生成中...")
+            print(f"プロンプト: {prompt[:100]}...")
             
-            # 一時ファイルに保存
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
-            temp_file.write(image_response.content)
-            temp_file.close()
+            with limiter('openai'):
+                response = self.client.images.generate(
+                    model="dall-e-3",
+                    prompt=prompt,
+                    size="1024x1024",
+                    quality="standard",
+                    n=1,
+                )
+            
+            image_url = response.data[0].url
             
-            print(f"✓ DALL-E 3で画像を生成しました: {temp_file.name}")
-            return (image_url, temp_file.name)
+            image = self._download_image(image_url, '.png')
+            print(f"✓ DALL-E 3で画像を生成しました: {image_url}")
+            return (image_url, image)
             
         except Exception as e:
             print(f"⚠️ DALL-E 3画像生成エラー: {e}")
             return None
     
-    def generate_image(self, theme: str, title: str = "") -> Optional[Tuple[str, str]]:
+    def _download_image(self, image_url: str, suffix: str) -> Optional[ImageSpool]:
         """
-        設定に基づいて画像を生成
+        画像をチャンクごとにダウンロード（アップロード済みの画像はダウンロードしない）
         
         Args:
-            theme: 記事のテーマ
-            title: 記事のタイトル
+            image_url: 画像のURL
+            suffix: Content-Type から形式がわからない場合の拡張子
             
         Returns:
-            (画像URL, 画像ファイルパス) のタプル、失敗時はNone
-        """
-        if self.image_source == 'banana' or self.image_source == 'nano':
-            result = self.generate_image_from_banana_pro(theme, title)
-            # Banana Proが失敗した場合、Unsplashにフォールバック
-            if result is None:
-                print("Banana Proが失敗したため、Unsplashにフォールバックします...")
-                result = self.generate_image_from_unsplash(theme)
-            return result
-        elif self.image_source == 'unsplash':
-            result = self.generate_image_from_unsplash(theme)
-            # Unsplashが失敗した場合、DALL-Eにフォールバック
-            if result is None and os.getenv('DALLE_FALLBACK', 'false').lower() == 'true':
-                print("Unsplashが失敗したため、DALL-E 3にフォールバックします...")
-                result = self.generate_image_from_dalle(theme, title)
-            return result
-        elif self.image_source == 'dalle':
-            return self.generate_image_from_dalle(theme, title)
-        else:
-            print(f"⚠️ 不明な画像ソース: {self.image_source}")
+            画像データ、アップロード済みの画像の場合はNone（メディアIDを再利用する）
+        """
+        if self.image_cache.has_url(image_url):
+            print(f"✓ アップロード済みの画像のため、ダウンロードを省略します: {image_url}")
             return None
         
-    def generate_article(self, generate_image: bool = True, max_retries: int = 5):
+        print(f"画像をダウンロード中: {image_url}")
+        with self.http.get(image_url, timeout=get_timeout('image_download'), stream=True) as image_response:
+            image_response.raise_for_status()
+            return ImageSpool.from_response(image_response, suffix)
+    
+    def generate_image(self, theme: str, title: str = "") -> Optional[Tuple[str, Optional[ImageSpool]]]:
         """
-        AI関連の最新ニュースを基にした4000〜5000字の実用的でユニークな記事を生成
-        最新機能や比較など読者が興味を持つ内容を含む
-        重複チェックを厳密に行い、絶対に同じ内容の記事を投稿しない
-        Banana Pro Nanoで美しい画像を自動生成
+        設定に基づいて画像を生成
+        最近アイキャッチに使った画像とほぼ同じ画像の場合は取得し直す
         
         Args:
-            generate_image: 画像を生成するかどうか
-            max_retries: 重複回避のための最大リトライ回数（デフォルト5回）
-        
+            theme: 記事のテーマ
+            title: 記事のタイトル
+            
         Returns:
-            dict: {'title': str, 'content': str, 'image_path': str (optional), 'image_url': str (optional)}
+            (画像URL, 画像データ) のタプル、失敗時はNone
+            （アップロード済みの画像の場合、画像データはNone。使い終わったら close する）
         """
-        print(f"\n{'='*60}")
-        print("📰 最新AI記事生成開始")
-        print(f"{'='*60}\n")
-        
-        # 最新ニュースを取得
-        print("ステップ1: 最新AIニュースの取得")
-        latest_news = self._get_latest_ai_news()
-        
-        if not latest_news:
-            print("⚠️ 最新ニュースの取得に失敗しました。フォールバックトピックを使用します。")
+        max_attempts = int(os.getenv('IMAGE_DEDUP_ATTEMPTS', '3'))
+        # バッチ実行時に画像取得の同時実行数を制限
+        with limiter('image'):
+            for attempt in range(max_attempts):
+                result = self._generate_image_from_source(theme, title)
+                if result is None or attempt == max_attempts - 1:
+                    return result
+                
+                image_url, image = result
+                if not self.image_cache.recently_used(image_url, self.image_cache.image_hash(image)):
+                    return result
+                
+                print(f"⚠️ 最近アイキャッチに使った画像とほぼ同じため、別の画像を取得します ({attempt + 1}/{max_attempts})")
+                if image:
+                    image.close()
+        return None
+    
+    def _generate_image_from_source(self, theme: str, title: str) -> Optional[Tuple[str, Optional[ImageSpool]]]:
+        """
+        image_sourceの設定に応じた取得元（image_providers に登録したもの）から画像を取得
+        優先の取得元が一定時間内に画像を返さない場合は次の取得元も並列に開始し、
+        先に取得できた画像を使う（失敗した場合はすぐに次の取得元に切り替える）
+        - 待ち時間は IMAGE_HEDGE_DELAY 秒（所要時間の実績があれば平均の2倍、最短2秒）
+        - コストの高い取得元（DALL-E）は、並列に実行するコストの合計が IMAGE_HEDGE_BUDGET 以内の場合のみ並列に開始する
+        - 失敗が続いている取得元は一定時間スキップする
+        """
+        providers = []
+        for provider in create_providers(provider_chain(self.image_source), self):
+            if self.provider_health.allow(provider.name):
+                providers.append(provider)
+            else:
+                print(f"⚠️ {provider.label}は失敗が続いているため、スキップします")
+        if not providers:
+            return None
         
-        # 使用済みトピックを追跡
-        used_topics = set()
+        hedge_delay = self.provider_health.hedge_delay(
+            providers[0].name, float(os.getenv('IMAGE_HEDGE_DELAY', '10')))
+        candidates = [
+            (provider.label, self.provider_health.track(provider, theme, title, slow_after=hedge_delay),
+             provider.cost)
+            for provider in providers
+        ]
+        return hedged(
+            candidates,
+            hedge_delay=hedge_delay,
+            budget=float(os.getenv('IMAGE_HEDGE_BUDGET', '1')),
+            timeout=float(os.getenv('IMAGE_DEADLINE', '60')),
+            discard=self._close_image_result
+        )
         
-        # フォールバック用のトピックを選択
-        fallback_topic = random.choice(self.ai_topics)
-        used_topics.add(fallback_topic)
+    def _build_user_prompt(self, latest_news: Optional[str], fallback_topic: str) -> str:
+        """
+        記事生成用のユーザープロンプトを構築
         
-        # 重複を避けながら記事を生成
-        print(f"\nステップ2: 記事生成（最大{max_retries}回リトライ）")
-        for attempt in range(max_retries):
-            print(f"\n--- 生成試行 {attempt + 1}/{max_retries} ---")
-            
-            system_prompt = """あなたはAI技術の専門知識を持つ経験豊富なテックライターです。
-以下の条件を厳密に守って記事を執筆してください：
-
-【文字数について】
-- 本文は必ず4000字以上、5000字程度にする（タイトルは除く）
-- 詳細で読み応えのある長文記事にする
-- 具体的な事例、比較情報、実用的なアドバイスを豊富に含める
-- 各セクションを詳しく掘り下げて解説する
-
-【内容について】
-- 最新のAI技術やサービスに関する情報を含める
-- AIツールの比較や評価を具体的に行う
-- 読者が実際に使える実用的な情報を提供する
-- 最新機能や新機能について詳しく解説する
-- 読者が興味を持つような内容（比較、実用例、メリット・デメリットなど）を含める
-- 専門的でありながら、初心者にもわかりやすい説明をする
-
-【ターゲット読者について】
-- AIに興味がある一般ユーザーから技術者まで幅広い読者を想定
-- 実際にAIツールを使いたい人、比較検討している人を主なターゲットとする
-- 実用的な情報を求めている読者に寄り添う
-- 業界の動向を広く知りたい人
-
-【記事のスタイル】
-- 単なるニュースの羅列ではなく、それらが社会や個人の生活にどう影響するかを考察する
-- 複数のニュースを関連付けて、大きなトレンドとして解説する
-- 読者が「へぇ、そうなんだ」と思えるような深い洞察を含める
-
-【構成について】
-- 導入: 最新のAI技術やサービスの重要性を説明
-- 最新動向: 最新ニュースや技術動向を紹介
-- 詳細解説: 主要な機能や特徴を詳しく説明
-- 比較・評価: 複数のツールやサービスを比較（該当する場合）
-- 実用例: 実際の使用例や活用方法を紹介
-- まとめ: 読者にとっての価値や今後の展望を提示
-
-【形式について】
-- HTML形式で出力する（段落は<p>タグで囲む）
-- 見出しは<h2>タグを使用して構造化する
-- 重要なポイントは<strong>タグで強調する
-- 比較表やリストは<ul>や<ol>タグを使用する
-
-【トーン】
-- 専門的でありながら親しみやすい
-- 最新技術への興奮や期待を伝える
-- 実用的で役立つ情報を提供する
-- 読者の興味を引く内容にする
-
-【出力フォーマット】
-1行目: タイトル: [記事のタイトル]
-2行目以降: [HTML形式の本文]
-"""
+        Args:
+            latest_news: 最新ニュース（なければNone）
+            fallback_topic: ニュースがない場合に使うトピック
             
-            # ユーザープロンプトを構築
-            if latest_news:
-                user_prompt = f"""以下の最新AIニュースを基に、上記の条件を守って記事を書いてください：
+        Returns:
+            ユーザープロンプト
+        """
+        if latest_news:
+            return f"""以下の最新AIニュースを基に、上記の条件を守って記事を書いてください：
 
 【最新ニュース情報】
 {latest_news}
@@ -792,14 +1187,8 @@ Style: Modern tech illustration, professional, sleek"""
 - 読者が「このツールを試してみたい」「比較して選びたい」と思える内容にしてください
 
 記事を執筆してください。"""
-            else:
-                # 使用済みトピックを避ける
-                available_topics = [t for t in self.ai_topics if t not in used_topics]
-                if available_topics:
-                    fallback_topic = random.choice(available_topics)
-                    used_topics.add(fallback_topic)
-                
-                user_prompt = f"""以下のトピックについて、上記の条件を守って記事を書いてください：
+        
+        return f"""以下のトピックについて、上記の条件を守って記事を書いてください：
 
 トピック: {fallback_topic}
 
@@ -813,77 +1202,68 @@ Style: Modern tech illustration, professional, sleek"""
 - 読者が興味を持つような内容（比較、実用例、メリット・デメリットなど）を含めてください
 
 記事を執筆してください。"""
+    
+    def _parse_article_text(self, article_text: str, latest_news: Optional[str],
+                            fallback_topic: str) -> Tuple[str, str]:
+        """
+        生成されたテキストをタイトルと本文に分割
+        
+        Args:
+            article_text: OpenAIの出力（1行目: タイトル: ...）
+            latest_news: 最新ニュース（タイトルが取れない場合の判定用）
+            fallback_topic: フォールバックトピック
             
-            try:
-                print(f"OpenAI APIにリクエストを送信中... (モデル: gpt-4o-mini)")
-                response = self.client.chat.completions.create(
-                    model="gpt-4o-mini",  # より安価なモデルを使用（必要に応じてgpt-4に変更）
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    temperature=0.8,
-                    max_tokens=4500  # 4000〜5000字に対応
-                )
-                
-                article_text = response.choices[0].message.content.strip()
-                
-                # タイトルと本文を分割
-                lines = article_text.split('\n')
-                title = None
-                content_lines = []
-                
-                for i, line in enumerate(lines):
-                    if line.startswith('タイトル:') or line.startswith('タイトル：'):
-                        title = line.replace('タイトル:', '').replace('タイトル：', '').strip()
-                    elif title is None and line.strip() and not line.strip().startswith('#'):
-                        if not title and i == 0:
-                            title = line.strip()
-                        else:
-                            content_lines.append(line)
-                    else:
-                        content_lines.append(line)
-                
-                if not title:
-                    title = fallback_topic if not latest_news else "最新AI技術の動向"
-                
-                # 本文を結合
-                content = '\n'.join(content_lines).strip()
-                
-                if not content:
-                    content = article_text
-                    if title == fallback_topic:
-                        first_line = article_text.split('\n')[0]
-                        if len(first_line) < 100:
-                            title = first_line.strip()
-                            content = '\n'.join(article_text.split('\n')[1:]).strip()
-                
-                # 重複チェック（厳密版）
-                print(f"\n重複チェック中: {title}")
-                if self._is_duplicate(title, content):
-                    print(f"⚠️ 重複する記事が検出されました: {title}")
-                    if attempt < max_retries - 1:
-                        print(f"別のトピックで再生成します... ({attempt + 1}/{max_retries})")
-                        # 別のトピックを選択
-                        fallback_topic = random.choice(self.ai_topics)
-                        continue
-                    else:
-                        print("⚠️ 最大リトライ回数に達しました。")
-                        print("⚠️ このまま投稿すると重複の可能性がありますが、続行します。")
-                
-                print(f"✓ 重複なし: 新しい記事として認識されました")
-                
-                if not content.startswith('<'):
-                    paragraphs = [p.strip() for p in content.split('\n\n') if p.strip()]
-                    content = '\n\n'.join([f'<p>{p}</p>' for p in paragraphs])
-                
-                plain_text = re.sub(r'<[^>]+>', '', content)
-                plain_text_length = len(plain_text.strip())
-                print(f"生成された記事の文字数: {plain_text_length}文字")
-                
-                if plain_text_length < 4500:
-                    needed_length = max(5000 - plain_text_length, 800)
-                    additional_prompt = f"""上記の記事の続きとして、さらに約{needed_length}字以上の内容を追加してください。
+        Returns:
+            (タイトル, 本文) のタプル
+        """
+        # タイトルと本文を分割
+        lines = article_text.split('\n')
+        title = None
+        content_lines = []
+
+        for i, line in enumerate(lines):
+            if line.startswith('タイトル:') or line.startswith('タイトル：'):
+                title = line.replace('タイトル:', '').replace('タイトル：', '').strip()
+            elif title is None and line.strip() and not line.strip().startswith('#'):
+                if not title and i == 0:
+                    title = line.strip()
+                else:
+                    content_lines.append(line)
+            else:
+                content_lines.append(line)
+
+        if not title:
+            title = fallback_topic if not latest_news else "最新AI技術の動向"
+
+        # 本文を結合
+        content = '\n'.join(content_lines).strip()
+
+        if not content:
+            content = article_text
+            if title == fallback_topic:
+                first_line = article_text.split('\n')[0]
+                if len(first_line) < 100:
+                    title = first_line.strip()
+                    content = '\n'.join(article_text.split('\n')[1:]).strip()
+        
+        return title, content
+    
+    def _build_continuation_messages(self, content: str, plain_text_length: int) -> Optional[List[Dict]]:
+        """
+        文字数が足りない場合の「続き」生成用メッセージを構築
+        
+        Args:
+            content: 生成済みの本文（HTML）
+            plain_text_length: 本文のテキストの文字数
+            
+        Returns:
+            OpenAIに渡すメッセージ、続きが不要な場合はNone
+        """
+        needed_length = self.length_budget.continuation_chars(plain_text_length)
+        if needed_length is None:
+            return None
+        
+        additional_prompt = f"""上記の記事の続きとして、さらに約{needed_length}字の内容を追加してください。
 同じテーマで、以下の点を含めてください：
 - 追加のAI技術情報や最新動向
 - 実用的な活用方法や使用例（ステップバイステップで）
@@ -893,29 +1273,382 @@ Style: Modern tech illustration, professional, sleek"""
 - さらなる実用的なヒントとコツ
 
 HTML形式（<p>タグ、<h2>タグ、<strong>タグを使用）で出力してください。"""
-                    
-                    additional_response = self.client.chat.completions.create(
-                        model="gpt-4o-mini",
-                        messages=[
-                            {"role": "system", "content": system_prompt},
-                            {"role": "user", "content": f"既存の記事:\n{content}\n\n{additional_prompt}"}
-                        ],
-                        temperature=0.8,
-                        max_tokens=2000  # 追加コンテンツを増やす
-                    )
-                    
-                    additional_content = additional_response.choices[0].message.content.strip()
-                    if not additional_content.startswith('<'):
-                        paragraphs = [p.strip() for p in additional_content.split('\n\n') if p.strip()]
-                        additional_content = '\n\n'.join([f'<p>{p}</p>' for p in paragraphs])
-                    
-                    content += '\n\n' + additional_content
+        
+        return [
+            {"role": "system", "content": ARTICLE_SYSTEM_PROMPT},
+            {"role": "user", "content": f"既存の記事:\n{content}\n\n{additional_prompt}"}
+        ]
+    
+    def _build_draft_messages(self, latest_news: Optional[str], fallback_topic: str) -> Tuple[List[Dict], int]:
+        """
+        1回目の生成（記事全体、またはセクション分割時は構成案）のメッセージ
+        
+        Returns:
+            (メッセージ, max_tokens) のタプル
+        """
+        user_prompt = self._build_user_prompt(latest_news, fallback_topic)
+        if self.article_mode == 'sections':
+            return [
+                {"role": "system", "content": OUTLINE_SYSTEM_PROMPT},
+                {"role": "user", "content": build_outline_prompt(user_prompt)}
+            ], 800
+        return [
+            {"role": "system", "content": ARTICLE_SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ], self.length_budget.draft_max_tokens()  # 上限の5000字程度で止まるように設定
+    
+    def _parse_outline_text(self, outline_text: str, latest_news: Optional[str],
+                            fallback_topic: str) -> Tuple[str, List[Tuple[str, str]]]:
+        """
+        構成案をタイトルとセクションに分解（読み取れない場合は標準の構成を使う）
+        
+        Returns:
+            (タイトル, [(見出し, 要点), ...]) のタプル
+        """
+        title, sections = parse_outline(outline_text)
+        if not title:
+            title = fallback_topic if not latest_news else "最新AI技術の動向"
+        if len(sections) < 2:
+            print("⚠️ 構成案を読み取れなかったため、標準の構成で生成します")
+            sections = list(DEFAULT_SECTIONS)
+        print(f"✓ 構成案: {len(sections)}セクション（{' / '.join(heading for heading, _ in sections)}）")
+        return title, sections
+    
+    def _section_requests(self, title: str, sections: List[Tuple[str, str]],
+                          source: str) -> Tuple[List[List[Dict]], int, int]:
+        """
+        各セクションの本文の生成リクエスト（同期版と非同期パイプラインで共有）
+        
+        Args:
+            title: 記事のタイトル
+            sections: 記事の構成
+            source: 記事の元になるニュース・トピック
+            
+        Returns:
+            (セクションごとのメッセージ, max_tokens, セクションの上限の文字数) のタプル
+        """
+        target_chars = self.length_budget.target_chars // len(sections)
+        # 各セクションの上限は記事全体の上限を均等に割り当てる
+        max_chars = self.length_budget.max_chars // len(sections)
+        max_tokens = self.length_budget.max_tokens_for(max_chars)
+        workers = max(1, min(self.section_concurrency, len(sections)))
+        print(f"セクションを並列に生成中...（{len(sections)}セクション、同時実行 {workers}件、各{target_chars}字程度）")
+        messages = [build_section_messages(title, sections, index, source, target_chars)
+                    for index in range(len(sections))]
+        return messages, max_tokens, max_chars
+    
+    @staticmethod
+    def _assemble_article(sections: List[Tuple[str, str]], bodies: List[str], max_chars: int) -> Dict:
+        """
+        生成した各セクションの本文を構成の順番に組み立てる（同期版と非同期パイプラインで共有）
+        
+        Returns:
+            記事の本文の normalize_html の結果
+        """
+        bodies = [normalize_html(body, max_chars)['html'] for body in bodies]
+        article = normalize_html(assemble_sections(sections, bodies))
+        print(f"生成された記事の文字数: {article['text_length']}文字")
+        return article
+    
+    def _generate_sections(self, title: str, sections: List[Tuple[str, str]], source: str) -> Dict:
+        """
+        各セクションの本文を並列に生成し、構成の順番に組み立てる
+        
+        Args:
+            title: 記事のタイトル
+            sections: 記事の構成
+            source: 記事の元になるニュース・トピック
+            
+        Returns:
+            記事の本文の normalize_html の結果
+        """
+        section_messages, max_tokens, max_chars = self._section_requests(title, sections, source)
+        
+        def write_section(messages: List[Dict]) -> str:
+            return self._chat_completion(messages, max_tokens=max_tokens, temperature=0.8,
+                                         cache=OPTIONAL, measure=True)
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(self.section_concurrency, len(sections)))) as executor:
+            bodies = list(executor.map(write_section, section_messages))
+        return self._assemble_article(sections, bodies, max_chars)
+    
+    def _normalize_draft(self, content: str) -> Dict:
+        """
+        1回目に生成した本文を正規化（同期版と非同期パイプラインで共有）
+        段落の<p>タグへの変換・文字数の計算と、max_tokens で途中まで生成されたブロックや
+        上限を超えた分の切り詰めを1回の走査で行う
+        
+        Returns:
+            記事の本文の normalize_html の結果
+        """
+        article = normalize_html(content, self.length_budget.max_chars)
+        print(f"生成された記事の文字数: {article['text_length']}文字")
+        return article
+    
+    def _continuation_request(self, article: Dict) -> Optional[Tuple[List[Dict], int]]:
+        """
+        文字数が足りない場合の「続き」の生成リクエスト（同期版と非同期パイプラインで共有）
+        上限の文字数までの残りに合わせて max_tokens を決める
+        
+        Returns:
+            (メッセージ, max_tokens) のタプル、続きが不要な場合はNone
+        """
+        messages = self._build_continuation_messages(article['html'], article['text_length'])
+        if not messages:
+            return None
+        return messages, self.length_budget.max_tokens_for(self.length_budget.max_chars - article['text_length'])
+    
+    def _append_continuation(self, article: Dict, additional_content: str) -> Dict:
+        """
+        生成した続きを本文に追加（上限を超えた分は切り詰める）
+        
+        Returns:
+            記事の本文の normalize_html の結果
+        """
+        article = normalize_html(article['html'] + '\n\n' + additional_content, self.length_budget.max_chars)
+        print(f"続きを追加した記事の文字数: {article['text_length']}文字")
+        return article
+    
+    def _reserve_title(self, title: str, content: str = "", force: bool = False) -> bool:
+        """
+        重複チェックを行い、重複していなければ生成中のタイトルとして予約する
+        チェックと予約を同時に行い、並列実行中の他のワーカーと同じ記事にならないようにする
+        
+        Args:
+            title: 記事のタイトル
+            content: 記事の内容
+            force: 重複していても予約する（最大リトライ回数に達した場合）
+            
+        Returns:
+            重複している場合True
+        """
+        # 埋め込みはAPI呼び出しになるため、ロックの外で計算しておく
+        embedding = self._embed_article(title, content)
+        with self._history_lock:
+            is_duplicate = self._is_duplicate(title, content, embedding=embedding)
+            if not is_duplicate or force:
+                self._pending_titles.add(title)
+                if embedding is not None:
+                    self._pending_embeddings[title] = embedding
+            return is_duplicate
+    
+    def _release_title(self, title: str):
+        """
+        生成中のタイトルの予約を解除（エラーや中断時）
+        """
+        with self._history_lock:
+            self._pending_titles.discard(title)
+            self._pending_embeddings.pop(title, None)
+    
+    def _record_history(self, title: str, theme: str, content: str, source_url: str = '',
+                        preview: Optional[str] = None) -> int:
+        """
+        生成した記事を投稿履歴に保存し、タイトルの予約を解除
+        
+        Args:
+            title: 記事のタイトル
+            theme: 記事のテーマ
+            content: 記事の本文（HTML）
+            source_url: 記事の元にしたニュースのURL
+            preview: 本文の冒頭（normalize_html の結果、省略時は本文から作成）
+            
+        Returns:
+            保存後の履歴件数
+        """
+        content_preview = preview if preview is not None else normalize_html(content)['preview']
+        entry = {
+            'title': title,
+            'date': datetime.now().isoformat(),
+            'theme': theme,
+            'source_url': source_url,
+            'content_preview': content_preview
+        }
+        cutoff_date = datetime.now() - timedelta(days=self.history_retention_days)
+        with self._history_lock:
+            # 1行の追記と、保存期間（デフォルト180日）を過ぎた履歴の範囲削除のみ行う
+            self.history_store.append(entry)
+            self.history_store.prune(cutoff_date)
+            history_count = self.history_store.count()
+            
+            # インデックスには追加分だけ反映し、保存期間を過ぎたものを削除
+            self._get_duplicate_index().prune(cutoff_date)
+            self._pending_titles.discard(title)
+            
+            # 重複チェック時に計算した埋め込みを再利用して保存（記事ごとに1回だけ計算）
+            embedding = self._pending_embeddings.pop(title, None)
+            vector_index = self._get_vector_index()
+            if vector_index is not None:
+                if embedding is not None:
+                    vector_index.add(title, entry['date'], embedding)
+                vector_index.prune(cutoff_date)
+        return history_count
+    
+    def _print_api_error_help(self, error_msg: str):
+        """
+        OpenAI APIのエラー内容に応じて対処方法を表示
+        """
+        if "invalid_api_key" in error_msg or "401" in error_msg or "Incorrect API key" in error_msg:
+            print("\n" + "="*60)
+            print("⚠️  APIキーエラーが発生しました")
+            print("="*60)
+            print("\n対処方法:")
+            print("1. APIキーが正しくコピーされているか確認:")
+            print("   - .envファイルのOPENAI_API_KEYの値を確認")
+            print("   - 余分なスペースや改行が入っていないか確認")
+            print("\n2. 新しいAPIキーを作成:")
+            print("   https://platform.openai.com/api-keys")
+            print("   - 古いキーが無効化されている可能性があります")
+            print("   - 新しいキーを作成して.envファイルを更新してください")
+            print("="*60 + "\n")
+        elif "insufficient_quota" in error_msg or "429" in error_msg:
+            print("\n" + "="*60)
+            print("⚠️  OpenAI APIクォータエラーが発生しました")
+            print("="*60)
+            print("\n対処方法:")
+            print("1. OpenAIダッシュボードを確認:")
+            print("   https://platform.openai.com/account/billing")
+            print("\n2. プロジェクトのクォータ設定を確認:")
+            print("   - APIキーが特定のプロジェクトに紐づいている場合、")
+            print("     そのプロジェクトのクォータを使い切っている可能性があります")
+            print("   - 新しいAPIキーを生成するか、プロジェクトのクォータを増やしてください")
+            print("\n3. 組織レベルのクォータを確認:")
+            print("   - 組織全体のクォータ設定も確認してください")
+            print("="*60 + "\n")
+    
+    def _prepare_image(self, theme: str, title: str,
+                       image_handler: Optional[Callable[[str, Optional[ImageSpool], str], Optional[int]]] = None) -> Dict:
+        """
+        画像を生成し、ハンドラーが指定されていれば続けてアップロードする（バックグラウンドで実行）
+        
+        Args:
+            theme: 記事のテーマ
+            title: 記事のタイトル
+            image_handler: (画像URL, 画像データ, タイトル) を受け取りメディアIDを返す関数
+                           （アップロード済みの画像の場合、画像データはNone）
+            
+        Returns:
+            記事データに追加する項目（image_url と image または featured_media_id）
+        """
+        image_result = self.generate_image(theme, title)
+        if not image_result:
+            print("⚠️ 画像生成に失敗しましたが、記事は正常に生成されました")
+            print("  画像生成をスキップして記事のみ投稿します")
+            return {}
+        
+        image_url, image = image_result
+        print(f"✓ 画像が正常に生成されました")
+        print(f"  画像URL: {image_url or '（生成画像）'}")
+        print(f"  画像サイズ: {f'{image.size}バイト' if image else '（アップロード済みの画像を再利用）'}")
+        
+        if image_handler is None:
+            return {'image_url': image_url, 'image': image}
+        
+        return {'image_url': image_url, 'featured_media_id': image_handler(image_url, image, title)}
+    
+    def _image_result(self, image_future) -> Dict:
+        """
+        バックグラウンドの画像処理の結果を取得（エラーの場合は画像なしで続行する）
+        
+        Returns:
+            記事データに追加する項目、エラーの場合は空の辞書
+        """
+        try:
+            return image_future.result()
+        except Exception as e:
+            print(f"⚠️ 画像処理エラー: {e}")
+            print("  画像生成をスキップして記事のみ投稿します")
+            return {}
+    
+    def _discard_image(self, image_future):
+        """
+        記事を破棄する場合に、バックグラウンドの画像処理の完了を待って後始末する
+        アップロード済みのメディアは image_handler を渡した側で削除する
+        """
+        try:
+            image_data = image_future.result()
+        except Exception as e:
+            print(f"⚠️ 画像処理エラー: {e}")
+            return
+        
+        image = image_data.get('image')
+        if image:
+            image.close()
+    
+    def generate_article(self, generate_image: bool = True, max_retries: int = 5,
+                         latest_news: Optional[str] = None, fetch_news: bool = True,
+                         image_handler: Optional[Callable[[str, Optional[ImageSpool], str], Optional[int]]] = None):
+        """
+        AI関連の最新ニュースを基にした4000〜5000字の実用的でユニークな記事を生成
+        最新機能や比較など読者が興味を持つ内容を含む
+        重複チェックを厳密に行い、絶対に同じ内容の記事を投稿しない
+        Banana Pro Nanoで美しい画像を自動生成
+        
+        Args:
+            generate_image: 画像を生成するかどうか
+            max_retries: 重複回避のための最大リトライ回数（デフォルト5回）
+            latest_news: 記事の元にするニュース（バッチ実行で割り当て済みの場合に指定）
+            fetch_news: latest_newsが未指定の場合にニュースを取得するかどうか
+            image_handler: 画像が生成された時点で呼ばれる関数（本文の生成中にアップロードを済ませる場合）
+        
+        Returns:
+            dict: {'title': str, 'content': str, 'image': ImageSpool (optional), 'image_url': str (optional),
+                   'featured_media_id': int (optional, image_handler指定時)}
+        """
+        print(f"\n{'='*60}")
+        print("📰 最新AI記事生成開始")
+        print(f"{'='*60}\n")
+        
+        # 最新ニュースを取得
+        print("ステップ1: 最新AIニュースの取得")
+        if latest_news is None and fetch_news:
+            latest_news = self._get_latest_ai_news()
+        elif latest_news:
+            print("✓ 割り当て済みのニュースを使用します")
+        
+        # 重複しないタイトルが得られるまで、ニュース・トピックを変えて生成し直す
+        retries = DraftRetries(self, latest_news, max_retries)
+        
+        # 重複チェックを通過して生成中のタイトル（履歴保存またはエラー時に解放）
+        reserved_title = None
+        # バックグラウンドで実行中の画像処理
+        image_future = None
+        
+        # 重複を避けながら記事を生成
+        print(f"\nステップ2: 記事生成（最大{max_retries}回リトライ）")
+        for _ in retries.attempts():
+            messages, max_tokens = retries.messages()
+            
+            try:
+                print(f"OpenAI APIにリクエストを送信中... (モデル: gpt-4o-mini)")
+                # ストリーミングで受信し、1行目のタイトルが重複していれば本文を生成させずに打ち切る
+                # （最後の試行は重複していても続行するため打ち切らない）
+                article_text = self._chat_completion(
+                    messages,
+                    model="gpt-4o-mini",  # より安価なモデルを使用（必要に応じてgpt-4に変更）
+                    temperature=0.8,
+                    max_tokens=max_tokens,
+                    cache=OPTIONAL,
+                    on_first_line=None if retries.is_last_attempt else (
+                        lambda first_line: not self._is_duplicate_title_line(first_line)),
+                    measure=retries.measure
+                )
+                if article_text is None:
+                    retries.retry()
+                    continue
                 
-                # 画像を生成
-                result = {
-                    'title': title,
-                    'content': content
-                }
+                title, content, sections = retries.parse(article_text)
+                
+                # 重複チェック（厳密版）
+                # チェックと予約を同時に行い、並列実行中の他のワーカーと同じ記事にならないようにする
+                # 続きの生成（2回目の呼び出し）の前に本文の埋め込みでも比較し、重複ならここで打ち切る
+                print(f"\n重複チェック中: {title}")
+                is_duplicate = self._reserve_title(title, content, force=retries.is_last_attempt)
+                if not is_duplicate or retries.is_last_attempt:
+                    reserved_title = title
+                if not retries.accept(title, is_duplicate):
+                    continue
+                latest_news, fallback_topic = retries.latest_news, retries.fallback_topic
+                image_theme = retries.theme
                 
                 # 画像生成のデバッグ情報を表示
                 print(f"\n{'='*60}")
@@ -927,74 +1660,67 @@ HTML形式（<p>タグ、<h2>タグ、<strong>タグを使用）で出力して
                     print(f"Unsplash APIキー: {'設定済み' if self.unsplash_access_key else '未設定'}")
                 print(f"{'='*60}\n")
                 
+                # タイトルが決まった時点で画像の生成（とアップロード）をバックグラウンドで開始し、
+                # 本文の続きの生成と並行させる
                 if generate_image:
-                    print("画像生成を開始します...")
-                    image_theme = latest_news[:100] if latest_news else fallback_topic
-                    image_result = self.generate_image(image_theme, title)
-                    if image_result:
-                        image_url, image_path = image_result
-                        result['image_url'] = image_url
-                        result['image_path'] = image_path
-                        print(f"✓ 画像が正常に生成されました")
-                        print(f"  画像URL: {image_url}")
-                        print(f"  画像パス: {image_path}")
-                    else:
-                        print("⚠️ 画像生成に失敗しましたが、記事は正常に生成されました")
-                        print("  画像生成をスキップして記事のみ投稿します")
+                    print("画像生成を開始します（バックグラウンド）...")
+                    image_executor = ThreadPoolExecutor(max_workers=1)
+                    image_future = image_executor.submit(self._prepare_image, image_theme, title, image_handler)
+                    image_executor.shutdown(wait=False)
+                
+                if sections:
+                    # 各セクションを並列に生成するため、続きの生成は不要
+                    article = self._generate_sections(title, sections, latest_news or fallback_topic)
                 else:
-                    image_theme = fallback_topic
+                    article = self._normalize_draft(content)
+                    continuation = self._continuation_request(article)
+                    if continuation:
+                        continuation_messages, continuation_tokens = continuation
+                        additional_content = self._chat_completion(
+                            continuation_messages,
+                            temperature=0.8,
+                            max_tokens=continuation_tokens,
+                            cache=OPTIONAL,
+                            measure=True
+                        )
+                        article = self._append_continuation(article, additional_content)
+                content = article['html']
                 
-                # 投稿履歴に保存（内容の一部も保存して重複チェックを強化）
-                history = self._load_post_history()
-                content_preview = re.sub(r'<[^>]+>', '', content)[:200]  # 最初の200文字
-                history.append({
+                result = {
                     'title': title,
-                    'date': datetime.now().isoformat(),
-                    'theme': image_theme,
-                    'content_preview': content_preview
-                })
-                self._save_post_history(history)
+                    'content': content
+                }
+                
+                # バックグラウンドの画像処理の完了を待つ（画像の処理に失敗しても記事は投稿する）
+                if image_future is not None:
+                    result.update(self._image_result(image_future))
+                    image_future = None
+                
+                # 投稿履歴に保存（内容の一部も保存して重複チェックを強化）
+                history_count = self._record_history(title, image_theme, content,
+                                                     source_url=news_source_url(latest_news),
+                                                     preview=article['preview'])
+                reserved_title = None
                 print(f"✓ 投稿履歴に保存しました: {title}")
-                print(f"✓ 履歴件数: {len(history)}件（過去30日間）")
+                print(f"✓ 履歴件数: {history_count}件（過去{self.history_retention_days}日間）")
                 
                 return result
                 
             except Exception as e:
                 error_msg = str(e)
                 print(f"記事生成エラー: {error_msg}")
-            
-            if "invalid_api_key" in error_msg or "401" in error_msg or "Incorrect API key" in error_msg:
-                print("\n" + "="*60)
-                print("⚠️  APIキーエラーが発生しました")
-                print("="*60)
-                print("\n対処方法:")
-                print("1. APIキーが正しくコピーされているか確認:")
-                print("   - .envファイルのOPENAI_API_KEYの値を確認")
-                print("   - 余分なスペースや改行が入っていないか確認")
-                print("\n2. 新しいAPIキーを作成:")
-                print("   https://platform.openai.com/api-keys")
-                print("   - 古いキーが無効化されている可能性があります")
-                print("   - 新しいキーを作成して.envファイルを更新してください")
-                print("="*60 + "\n")
-            elif "insufficient_quota" in error_msg or "429" in error_msg:
-                print("\n" + "="*60)
-                print("⚠️  OpenAI APIクォータエラーが発生しました")
-                print("="*60)
-                print("\n対処方法:")
-                print("1. OpenAIダッシュボードを確認:")
-                print("   https://platform.openai.com/account/billing")
-                print("\n2. プロジェクトのクォータ設定を確認:")
-                print("   - APIキーが特定のプロジェクトに紐づいている場合、")
-                print("     そのプロジェクトのクォータを使い切っている可能性があります")
-                print("   - 新しいAPIキーを生成するか、プロジェクトのクォータを増やしてください")
-                print("\n3. 組織レベルのクォータを確認:")
-                print("   - 組織全体のクォータ設定も確認してください")
-                print("="*60 + "\n")
-            
-            raise
+                if reserved_title:
+                    self._release_title(reserved_title)
+                if image_future is not None:
+                    self._discard_image(image_future)
+                
+                self._print_api_error_help(error_msg)
+                
+                raise
 
 
-def generate_article(image_source: str = 'banana', generate_image: bool = True):
+def generate_article(image_source: str = 'banana', generate_image: bool = True,
+                     image_handler: Optional[Callable[[str, Optional[ImageSpool], str], Optional[int]]] = None):
     """
     記事生成関数（外部から呼び出し可能）
     毎日、最新のAI技術に関する実用的でユニークな4000〜5000字の記事を生成
@@ -1003,9 +1729,11 @@ def generate_article(image_source: str = 'banana', generate_image: bool = True):
     Args:
         image_source: 画像生成のソース ('banana'/'nano', 'unsplash', 'dalle')
         generate_image: 画像を生成するかどうか
+        image_handler: 画像が生成された時点で呼ばれる関数（アップロードしてメディアIDを返す）
     
     Returns:
-        dict: {'title': str, 'content': str, 'image_path': str (optional), 'image_url': str (optional)}
+        dict: {'title': str, 'content': str, 'image': ImageSpool (optional), 'image_url': str (optional),
+               'featured_media_id': int (optional)}
     """
     print(f"\n{'='*60}")
     print(f"📰 最新AI記事生成開始")
@@ -1016,7 +1744,7 @@ def generate_article(image_source: str = 'banana', generate_image: bool = True):
     print(f"{'='*60}\n")
     
     generator = ArticleGenerator(image_source=image_source)
-    return generator.generate_article(generate_image=generate_image)
+    return generator.generate_article(generate_image=generate_image, image_handler=image_handler)
 
 
 if __name__ == "__main__":
@@ -1036,7 +1764,10 @@ if __name__ == "__main__":
     print(f"\n📝 タイトル: {article['title']}\n")
     print(f"📊 本文の長さ: {len(article['content'])}文字\n")
     print(f"本文プレビュー:\n{article['content'][:500]}...\n")
-    if 'image_path' in article:
-        print(f"🖼️  画像パス: {article['image_path']}")
-        print(f"🔗 画像URL: {article.get('image_url', 'N/A')}")
+    if 'image_url' in article:
+        image = article.get('image')
+        print(f"🖼️  画像サイズ: {f'{image.size}バイト' if image else 'N/A'}")
+        print(f"🔗 画像URL: {article.get('image_url') or 'N/A'}")
+        if image:
+            image.close()
     print("="*60)
@@ -0,0 +1,280 @@
+"""
+非同期の記事投稿パイプライン
+ニュース取得 → 記事生成 → 画像生成 → メディアアップロード → 投稿 を asyncio で実行します
+タイトルが決まった時点で画像の生成・アップロードを開始し、本文の「続き」の生成と並行して進めるため、
+1記事あたりの所要時間はクリティカルパス（本文生成 + 投稿）程度になります
+OpenAIの呼び出しには AsyncOpenAI を使い、HTTP通信は共有セッション（http_client）をスレッドで実行します
+"""
+
+import os
+import asyncio
+from datetime import datetime
+from typing import Optional, Dict, List, Tuple, Callable
+from openai import AsyncOpenAI
+from article_generator import ArticleGenerator, DraftRetries, StreamBuffer
+from llm_cache import OPTIONAL
+from news_selector import news_source_url
+from wordpress_poster import WordPressPoster
+
+
+class AsyncArticlePipeline:
+    def __init__(self, generator: ArticleGenerator, poster: WordPressPoster, async_client=None):
+        """
+        Args:
+            generator: 記事生成器（プロンプト・重複チェック・画像取得を共有）
+            poster: WordPress投稿クラス
+            async_client: AsyncOpenAIクライアント（省略時は generator と同じAPIキーで作成）
+        """
+        self.generator = generator
+        self.poster = poster
+        self.client = async_client or AsyncOpenAI(api_key=generator.client.api_key)
+
+    async def _chat(self, messages, max_tokens: int, temperature: float = 0.8,
+                    cache: Optional[str] = None,
+                    on_first_line: Optional[Callable[[str], bool]] = None,
+                    measure: bool = False) -> Optional[str]:
+        """
+        OpenAIにチャット補完をリクエストし、本文を返す（応答キャッシュと文字数の予算は generator と共有）
+        on_first_line を指定した場合はストリーミングで受信し、Falseが返れば受信を打ち切ってNoneを返す
+        """
+        generator = self.generator
+        key, cached = generator._cached_chat(messages, max_tokens, temperature, "gpt-4o-mini", cache)
+        if cached is not None:
+            return cached
+
+        request = generator._chat_request(messages, max_tokens, temperature, "gpt-4o-mini",
+                                          stream=on_first_line is not None)
+        if on_first_line is None:
+            response = await self.client.chat.completions.create(**request)
+            content = response.choices[0].message.content.strip()
+            completion_tokens = getattr(response.usage, 'completion_tokens', None)
+        else:
+            buffer = StreamBuffer()
+            content = await self._read_stream(await self.client.chat.completions.create(**request),
+                                              on_first_line, buffer)
+            if content is None:
+                return None
+            completion_tokens = buffer.completion_tokens
+
+        return generator._finish_chat(content, completion_tokens, key, measure)
+
+    @staticmethod
+    async def _read_stream(stream, on_first_line: Callable[[str], bool],
+                           buffer: StreamBuffer) -> Optional[str]:
+        """
+        ストリーミングの応答を受信し、1行目が揃った時点で on_first_line をスレッドで呼び出す
+        （重複チェックは埋め込みの計算やロックの取得を含むため、イベントループを止めない）
+
+        Returns:
+            応答の本文（前後の空白を除去）、打ち切った場合はNone
+        """
+        try:
+            async for chunk in stream:
+                first_line = buffer.feed(chunk)
+                if first_line is not None and not await asyncio.to_thread(on_first_line, first_line):
+                    return None
+        finally:
+            # 打ち切った場合も接続を閉じて、残りのトークンの生成を止める
+            await stream.close()
+        return buffer.text()
+
+    async def _generate_draft(self, retries: DraftRetries) -> Tuple[str, str, Optional[List[Tuple[str, str]]]]:
+        """
+        重複しないタイトルが得られるまで記事の下書きを生成
+
+        Args:
+            retries: 生成し直すための状態（記事の元にしたニュース・トピックもここに残る）
+
+        Returns:
+            (タイトル, 本文, 構成) のタプル（構成はセクション分割で生成する場合のみ、それ以外はNone）
+        """
+        generator = self.generator
+        for _ in retries.attempts():
+            # 1行目のタイトルが重複していれば本文を生成させずに打ち切る（最後の試行は打ち切らない）
+            messages, max_tokens = retries.messages()
+            article_text = await self._chat(
+                messages,
+                max_tokens=max_tokens,
+                cache=OPTIONAL,
+                on_first_line=None if retries.is_last_attempt else (
+                    lambda first_line: not generator._is_duplicate_title_line(first_line)),
+                measure=retries.measure
+            )
+            if article_text is None:
+                retries.retry()
+                continue
+
+            title, content, sections = retries.parse(article_text)
+            print(f"\n重複チェック中: {title}")
+            # 埋め込みの計算（API呼び出し）と履歴のロックの取得はスレッドで行う
+            is_duplicate = await asyncio.to_thread(
+                generator._reserve_title, title, content, retries.is_last_attempt)
+            if retries.accept(title, is_duplicate):
+                return title, content, sections
+        # 最後の試行は重複していても続行するため、ここには到達しない
+        raise RuntimeError("記事の下書きを生成できませんでした")
+
+    async def _extend_content(self, content: str) -> Dict:
+        """
+        本文を正規化し、文字数が足りない場合に「続き」を生成して本文に追加
+
+        Returns:
+            記事の本文の normalize_html の結果
+        """
+        article = self.generator._normalize_draft(content)
+        continuation = self.generator._continuation_request(article)
+        if not continuation:
+            return article
+        messages, max_tokens = continuation
+        additional_content = await self._chat(messages, max_tokens=max_tokens, cache=OPTIONAL, measure=True)
+        return self.generator._append_continuation(article, additional_content)
+
+    async def _write_sections(self, title: str, sections: List[Tuple[str, str]], source: str) -> Dict:
+        """
+        各セクションの本文を並列に生成し、構成の順番に組み立てる
+
+        Returns:
+            記事の本文の normalize_html の結果
+        """
+        section_messages, max_tokens, max_chars = self.generator._section_requests(title, sections, source)
+        semaphore = asyncio.Semaphore(max(1, self.generator.section_concurrency))
+
+        async def write_section(messages) -> str:
+            async with semaphore:
+                return await self._chat(messages, max_tokens=max_tokens, cache=OPTIONAL, measure=True)
+
+        bodies = await asyncio.gather(*(write_section(messages) for messages in section_messages))
+        return self.generator._assemble_article(sections, bodies, max_chars)
+
+    async def _prepare_featured_image(self, theme: str, title: str) -> Tuple[Optional[int], bool]:
+        """
+        画像を生成してWordPressにアップロード（本文の生成と並行して実行）
+
+        Returns:
+            (メディアID, 新しくアップロードしたかどうか) のタプル、失敗時はメディアIDがNone
+        """
+        image_result = await asyncio.to_thread(self.generator.generate_image, theme, title)
+        if not image_result:
+            print("⚠️ 画像生成に失敗しましたが、記事のみ投稿します")
+            return None, False
+
+        image_url, image = image_result
+        print(f"✓ 画像が正常に生成されました: {image_url or '（生成画像）'}")
+        try:
+            return await asyncio.to_thread(self.poster.upload_featured_image, image, title, image_url)
+        finally:
+            if image:
+                image.close()
+
+    async def _featured_image_result(self, image_task: Optional[asyncio.Task]) -> Tuple[Optional[int], bool]:
+        """
+        画像の準備の完了を待つ（エラーの場合は画像なしで投稿する、キャンセルはそのまま伝える）
+
+        Returns:
+            (メディアID, 新しくアップロードしたかどうか) のタプル、画像がない場合はメディアIDがNone
+        """
+        if image_task is None:
+            return None, False
+        try:
+            return await image_task
+        except Exception as e:
+            print(f"⚠️ 画像処理エラー: {e}")
+            print("  画像生成をスキップして記事のみ投稿します")
+            return None, False
+
+    async def _discard_featured_image(self, image_task: Optional[asyncio.Task]):
+        """
+        記事を破棄する場合に、画像の準備の完了を待って新しくアップロードしたメディアを削除
+        （アップロード途中でキャンセルすると画像だけがWordPressに残るため、キャンセルはしない）
+        """
+        if image_task is None:
+            return
+        try:
+            media_id, uploaded = await image_task
+        except Exception as e:
+            print(f"⚠️ 画像処理エラー: {e}")
+            return
+        if media_id and uploaded:
+            await asyncio.to_thread(self.poster.delete_media, media_id)
+
+    async def run(self, generate_image: bool = True, max_retries: int = 5) -> Dict:
+        """
+        記事を1件生成して投稿
+
+        Args:
+            generate_image: 画像を生成するかどうか
+            max_retries: 重複回避のための最大リトライ回数
+
+        Returns:
+            投稿のレスポンス
+        """
+        print("ステップ1: 最新AIニュースの取得")
+        latest_news = await asyncio.to_thread(self.generator._get_latest_ai_news)
+        retries = await asyncio.to_thread(DraftRetries, self.generator, latest_news, max_retries)
+
+        print(f"\nステップ2: 記事生成（最大{max_retries}回リトライ）")
+        title, content, sections = await self._generate_draft(retries)
+        latest_news, fallback_topic = retries.latest_news, retries.fallback_topic
+        image_theme = retries.theme
+
+        image_task = None
+        try:
+            # タイトルが決まった時点で画像の準備を開始し、続きの生成と並行させる
+            if generate_image:
+                image_task = asyncio.create_task(self._prepare_featured_image(image_theme, title))
+
+            if sections:
+                article = await self._write_sections(title, sections, latest_news or fallback_topic)
+            else:
+                article = await self._extend_content(content)
+            content = article['html']
+            featured_media_id, uploaded = await self._featured_image_result(image_task)
+        except BaseException:
+            self.generator._release_title(title)
+            await self._discard_featured_image(image_task)
+            raise
+
+        history_count = await asyncio.to_thread(self.generator._record_history, title, image_theme, content,
+                                                source_url=news_source_url(latest_news),
+                                                preview=article['preview'])
+        print(f"✓ 投稿履歴に保存しました: {title}（{history_count}件）")
+
+        print("\nWordPressへの投稿を開始します...")
+        try:
+            result = await asyncio.to_thread(
+                self.poster.create_post,
+                title=title,
+                content=content,
+                status='publish',
+                featured_media_id=featured_media_id
+            )
+        except Exception:
+            # 投稿できなかった場合、アップロードした画像が残らないように削除（再利用した画像は残す）
+            if featured_media_id and uploaded:
+                await asyncio.to_thread(self.poster.delete_media, featured_media_id)
+            raise
+
+        print(f"\n✓ 投稿成功！")
+        print(f"記事ID: {result.get('id')}")
+        print(f"記事URL: {result.get('link', 'N/A')}")
+        return result
+
+
+def post_article_async(image_source: Optional[str] = None) -> Dict:
+    """
+    非同期パイプラインで記事を1件投稿（外部から呼び出し可能）
+
+    Args:
+        image_source: 画像生成のソース（省略時は環境変数IMAGE_SOURCE）
+
+    Returns:
+        投稿のレスポンス
+    """
+    print(f"\n{'='*60}")
+    print(f"🚀 AI記事自動投稿開始（非同期パイプライン）")
+    print(f"📅 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"{'='*60}\n")
+
+    image_source = image_source or os.getenv('IMAGE_SOURCE', 'unsplash')
+    pipeline = AsyncArticlePipeline(ArticleGenerator(image_source=image_source), WordPressPoster())
+    return asyncio.run(pipeline.run())
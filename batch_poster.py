@@ -0,0 +1,115 @@
+"""
+バッチ投稿モジュール
+1回の実行で複数の記事を並列に生成・投稿します（過去分の補充や複数カテゴリーの運用向け）
+ニュースは最初に1回だけ取得し、投稿済みのものを除いて各ワーカーに別々のニュースを割り当て、
+同じ記事が作られないようにします
+"""
+
+import os
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict
+from article_generator import ArticleGenerator
+from wordpress_poster import WordPressPoster, FeaturedImageUploader
+
+
+class NewsClaims:
+    """
+    ワーカー間でニュースを重複なく割り当てる
+    """
+
+    def __init__(self, items: List[str]):
+        self._items = list(items)
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def claim(self) -> Optional[str]:
+        """
+        まだ割り当てられていないニュースを1件取得
+
+        Returns:
+            ニュース1件、残っていない場合はNone
+        """
+        with self._lock:
+            if self._next >= len(self._items):
+                return None
+            item = self._items[self._next]
+            self._next += 1
+            return item
+
+
+def run_batch(count: int, image_source: Optional[str] = None, workers: Optional[int] = None) -> List[Dict]:
+    """
+    複数の記事を並列に生成して投稿
+
+    Args:
+        count: 投稿する記事数
+        image_source: 画像生成のソース（省略時は環境変数IMAGE_SOURCE）
+        workers: 同時に処理する記事数（省略時は環境変数BATCH_WORKERS、デフォルトは最大4）
+
+    Returns:
+        記事ごとの結果のリスト（{'index', 'title', 'post_id', 'link', 'error'}）
+    """
+    if count < 1:
+        raise ValueError(f"投稿する記事数は1以上を指定してください: {count}")
+    image_source = image_source or os.getenv('IMAGE_SOURCE', 'unsplash')
+    if workers is None:
+        workers = int(os.getenv('BATCH_WORKERS', str(min(count, 4))))
+    workers = max(1, min(workers, count))
+
+    print(f"\n{'='*60}")
+    print(f"🚀 バッチ投稿開始: {count}件（同時実行 {workers}件）")
+    print(f"📅 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"{'='*60}\n")
+
+    poster = WordPressPoster()
+    # OpenAIクライアントとHTTPセッションはスレッド間で共有できるため、1つの生成器を使い回す
+    generator = ArticleGenerator(image_source=image_source)
+
+    # ニュースは1回だけ取得し、投稿済みのものを除いて新しい話題の順に各ワーカーに割り当てる
+    claims = NewsClaims(generator._select_news_candidates(generator._get_latest_ai_news()))
+
+    def worker(index: int) -> Dict:
+        news_item = claims.claim()
+        label = f"[{index + 1}/{count}]"
+        print(f"\n{label} 記事生成を開始します" + (f": {news_item[:60]}" if news_item else "（フォールバックトピック）"))
+        uploader = FeaturedImageUploader(poster)
+        try:
+            # 記事の生成・投稿に失敗した場合は、生成中にアップロードした画像を削除する
+            try:
+                article_data = generator.generate_article(
+                    generate_image=True,
+                    latest_news=news_item,
+                    fetch_news=False,
+                    image_handler=uploader.upload
+                )
+                result = poster.publish_article(article_data)
+            except Exception:
+                uploader.discard()
+                raise
+            print(f"{label} ✓ 投稿成功: {article_data['title']}")
+            return {
+                'index': index,
+                'title': article_data['title'],
+                'post_id': result.get('id'),
+                'link': result.get('link'),
+                'error': None,
+            }
+        except Exception as e:
+            # 1件の失敗で他のワーカーを止めない
+            print(f"{label} ⚠️ 投稿失敗: {e}")
+            return {'index': index, 'title': None, 'post_id': None, 'link': None, 'error': str(e)}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(worker, range(count)))
+
+    succeeded = [r for r in results if not r['error']]
+    print(f"\n{'='*60}")
+    print(f"✅ バッチ投稿完了: 成功 {len(succeeded)}件 / 失敗 {len(results) - len(succeeded)}件")
+    for r in results:
+        status = f"✓ {r['title']} ({r['link']})" if not r['error'] else f"✗ {r['error']}"
+        print(f"  {r['index'] + 1}. {status}")
+    print(f"{'='*60}\n")
+
+    return results
@@ -0,0 +1,73 @@
+"""
+同時実行数の制限モジュール
+バッチ実行で複数の記事を並列に処理する際、OpenAI / 画像取得 / WordPressアップロード
+それぞれの同時リクエスト数を個別に制限します（1記事ずつの実行では実質的に制限なし）
+複数サイトへの投稿では、サイトごとに RequestLimiter で同時リクエスト数とリクエストの間隔を制限します
+"""
+
+import os
+import time
+import threading
+from typing import Dict
+
+# リソースごとのデフォルト同時実行数
+# 環境変数 <名前>_CONCURRENCY（例: OPENAI_CONCURRENCY=8）で上書き可能
+DEFAULT_LIMITS = {
+    'openai': 4,
+    'image': 3,
+    'wordpress': 2,
+}
+
+_limiters: Dict[str, threading.BoundedSemaphore] = {}
+_limiters_lock = threading.Lock()
+
+
+def limiter(name: str) -> threading.BoundedSemaphore:
+    """
+    リソース名に対応するセマフォを取得（with文で使用）
+
+    Args:
+        name: DEFAULT_LIMITS のキー（'openai', 'image', 'wordpress'）
+
+    Returns:
+        プロセス内で共有されるセマフォ
+    """
+    with _limiters_lock:
+        if name not in _limiters:
+            default = DEFAULT_LIMITS.get(name, 4)
+            size = max(1, int(os.getenv(f"{name.upper()}_CONCURRENCY", str(default))))
+            _limiters[name] = threading.BoundedSemaphore(size)
+        return _limiters[name]
+
+
+class RequestLimiter:
+    """
+    同時リクエスト数とリクエストの間隔を制限する（with文で使用、サイトごとの制限など）
+    """
+
+    def __init__(self, concurrency: int, min_interval: float = 0.0):
+        """
+        Args:
+            concurrency: 同時リクエスト数の上限
+            min_interval: リクエストを開始する最短の間隔（秒、0なら制限なし）
+        """
+        self.concurrency = max(1, concurrency)
+        self.min_interval = max(0.0, min_interval)
+        self._semaphore = threading.BoundedSemaphore(self.concurrency)
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+
+    def __enter__(self):
+        self._semaphore.acquire()
+        if self.min_interval > 0:
+            # 開始する時刻を順番に予約し、前のリクエストから min_interval 秒空ける
+            with self._lock:
+                now = time.monotonic()
+                start = max(now, self._next_start)
+                self._next_start = start + self.min_interval
+            if start > now:
+                time.sleep(start - now)
+        return self
+
+    def __exit__(self, *exc):
+        self._semaphore.release()
@@ -0,0 +1,301 @@
+"""
+重複チェック用のインデックスモジュール
+投稿履歴のタイトル・テーマを文字n-gram（シングル）に分割して転置インデックスを作り、
+類似度がしきい値を超えうる履歴だけを比較することで、履歴が増えてもチェックが遅くならないようにします
+日本語のタイトルは単語の区切り（空白）がないため、単語単位ではなく文字単位で比較します
+インデックスは起動時に投稿履歴（SQLite）から作成し、以降は投稿履歴に追加された分（最後に反映したIDより後の行）だけを反映します
+別のファイルに複製を保存しないため、複数のプロセスが同時に投稿しても書き込みが競合しません
+"""
+
+import re
+import math
+import unicodedata
+from collections import defaultdict
+from datetime import datetime
+from typing import Optional, Dict, Set, Iterable, Callable
+from history_store import HistoryStore
+
+# 重複と判定するしきい値（文字2-gramで、言い換えたタイトルが0.55〜0.75、無関係なタイトルが0.25以下になる程度）
+TITLE_SIMILARITY_THRESHOLD = 0.45  # タイトル同士の類似度（Jaccard係数）
+THEME_SIMILARITY_THRESHOLD = 0.45  # タイトルが過去のテーマに含まれる割合
+PREFIX_LENGTH = 30                 # 冒頭一致とみなす文字数
+MIN_THEME_LENGTH = 10              # テーマ比較の対象にする最小文字数
+SHINGLE_SIZE = 2                   # シングルの文字数
+
+# 比較に使わない文字（空白・記号）
+_IGNORED_CHARS_RE = re.compile(r'[\s\W_]+')
+
+
+def normalize(text: str) -> str:
+    """
+    比較用にテキストを正規化（全角英数を半角に、小文字に、空白と記号を除去）
+    """
+    return _IGNORED_CHARS_RE.sub('', unicodedata.normalize('NFKC', text).lower())
+
+
+def tokenize(text: str) -> Set[str]:
+    """
+    テキストを文字n-gram（シングル）の集合に分割
+
+    例: "AI画像生成" -> {"ai", "i画", "画像", "像生", "生成"}
+    """
+    text = normalize(text)
+    if len(text) <= SHINGLE_SIZE:
+        return {text} if text else set()
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def jaccard(tokens1: Set[str], tokens2: Set[str]) -> float:
+    """
+    2つのシングル集合の類似度（Jaccard係数、0.0〜1.0）
+    """
+    if not tokens1 or not tokens2:
+        return 0.0
+    intersection = len(tokens1 & tokens2)
+    return intersection / (len(tokens1) + len(tokens2) - intersection)
+
+
+def containment(query: Set[str], tokens: Set[str]) -> float:
+    """
+    queryのシングルのうち tokens に含まれる割合（0.0〜1.0）
+    短いタイトルと長いテーマ（ニュースの冒頭）を比べる場合に使用
+    """
+    if not query or not tokens:
+        return 0.0
+    return len(query & tokens) / len(query)
+
+
+class DuplicateIndex:
+    def __init__(self):
+        # 反映済みの最後の投稿履歴ID
+        self.last_id = 0
+        # 文書ID（投稿履歴のID） -> {'title', 'theme', 'date', 'title_tokens', 'theme_tokens'}（*_tokens はシングル）
+        self.docs: Dict[int, Dict] = {}
+        # 完全一致・冒頭一致の検索用
+        self._exact: Dict[str, int] = {}
+        self._prefix: Dict[str, int] = {}
+        # シングル -> そのシングルを含む文書IDの集合
+        self._title_postings: Dict[str, Set[int]] = defaultdict(set)
+        self._theme_postings: Dict[str, Set[int]] = defaultdict(set)
+        # 文書ごとのシングル集合（候補の類似度計算用）
+        self._token_sets: Dict[str, Dict[int, Set[str]]] = {'title_tokens': {}, 'theme_tokens': {}}
+
+    @classmethod
+    def from_store(cls, store: HistoryStore) -> 'DuplicateIndex':
+        """
+        投稿履歴からインデックスを作成
+
+        Args:
+            store: 投稿履歴
+
+        Returns:
+            DuplicateIndex（作成後に追加された履歴は sync で反映する）
+        """
+        index = cls()
+        index.sync(store)
+        return index
+
+    def sync(self, store: HistoryStore) -> bool:
+        """
+        前回以降に投稿履歴へ追加された分（他のプロセスの投稿を含む）を反映
+
+        Args:
+            store: 投稿履歴
+
+        Returns:
+            追加があった場合True
+        """
+        new_entries = store.entries(after_id=self.last_id)
+        for entry in new_entries:
+            self.add(entry)
+        return bool(new_entries)
+
+    def _add_doc(self, doc_id: int, doc: Dict):
+        """
+        文書を各インデックスに登録
+        """
+        self.docs[doc_id] = doc
+        title = doc['title']
+        self._exact.setdefault(title, doc_id)
+        if len(title) > PREFIX_LENGTH:
+            self._prefix.setdefault(title[:PREFIX_LENGTH], doc_id)
+        for token in doc['title_tokens']:
+            self._title_postings[token].add(doc_id)
+        for token in doc['theme_tokens']:
+            self._theme_postings[token].add(doc_id)
+        for field in self._token_sets:
+            self._token_sets[field][doc_id] = set(doc[field])
+
+    def _remove_doc(self, doc_id: int):
+        """
+        文書を各インデックスから削除
+        """
+        doc = self.docs.pop(doc_id)
+        title = doc['title']
+        if self._exact.get(title) == doc_id:
+            del self._exact[title]
+        if self._prefix.get(title[:PREFIX_LENGTH]) == doc_id:
+            del self._prefix[title[:PREFIX_LENGTH]]
+        for field in self._token_sets:
+            del self._token_sets[field][doc_id]
+        for postings, tokens in ((self._title_postings, doc['title_tokens']),
+                                 (self._theme_postings, doc['theme_tokens'])):
+            for token in tokens:
+                postings[token].discard(doc_id)
+                if not postings[token]:
+                    del postings[token]
+
+    def add(self, entry: Dict) -> int:
+        """
+        投稿履歴の1件をインデックスに追加
+
+        Args:
+            entry: 投稿履歴のエントリ（id, title, theme, date）
+
+        Returns:
+            追加した文書のID
+        """
+        title = entry.get('title', '').lower().strip()
+        theme = entry.get('theme', '').lower().strip()
+        doc = {
+            'title': title,
+            'theme': theme,
+            'date': entry.get('date', '2000-01-01'),
+            'title_tokens': sorted(tokenize(title)),
+            # 短すぎるテーマは比較しないため登録しない
+            'theme_tokens': sorted(tokenize(theme)) if len(theme) > MIN_THEME_LENGTH else [],
+        }
+        doc_id = entry['id']
+        self.last_id = max(self.last_id, doc_id)
+        self._add_doc(doc_id, doc)
+        return doc_id
+
+    def prune(self, cutoff_date: datetime) -> int:
+        """
+        保存期間を過ぎた文書を削除
+        文書は投稿履歴のID順（= 日付順）に並んでいるため、古い方から期限内の文書に達するまでを削除する
+
+        Args:
+            cutoff_date: これより前（同時刻を含む）の文書を削除
+
+        Returns:
+            削除した件数
+        """
+        cutoff = cutoff_date.isoformat()
+        expired = []
+        for doc_id, doc in self.docs.items():
+            if doc['date'] > cutoff:
+                break
+            expired.append(doc_id)
+        for doc_id in expired:
+            self._remove_doc(doc_id)
+        return len(expired)
+
+    def find_duplicate(self, title: str, extra_titles: Iterable[str] = ()) -> Optional[str]:
+        """
+        タイトルが既存の記事と重複していないかチェック
+
+        Args:
+            title: 記事のタイトル
+            extra_titles: 履歴に未保存の比較対象（生成中の記事のタイトル）
+
+        Returns:
+            重複している場合はその理由、重複していなければNone
+        """
+        title_lower = title.lower().strip()
+        query = tokenize(title_lower)
+
+        # 生成中の記事（少数）はそのまま比較
+        for other in extra_titles:
+            other_lower = other.lower().strip()
+            if title_lower == other_lower:
+                return f"⚠️ 生成中の記事と完全一致: {other_lower}"
+            similarity = jaccard(query, tokenize(other_lower))
+            if similarity >= TITLE_SIMILARITY_THRESHOLD:
+                return f"⚠️ 生成中の記事と高類似度 ({similarity:.2%}): {other_lower}"
+            if len(title_lower) > PREFIX_LENGTH and len(other_lower) > PREFIX_LENGTH:
+                if title_lower[:PREFIX_LENGTH] == other_lower[:PREFIX_LENGTH]:
+                    return f"⚠️ 生成中の記事と冒頭一致: {other_lower}"
+
+        # 1. 完全一致チェック
+        if title_lower in self._exact:
+            return f"⚠️ 完全一致: {title_lower}"
+
+        # 2. タイトルの類似度チェック（45%以上で重複）
+        match = self._find_similar(query, self._title_postings, 'title_tokens', TITLE_SIMILARITY_THRESHOLD, jaccard)
+        if match:
+            doc_id, similarity = match
+            return f"⚠️ 高類似度 ({similarity:.2%}): {self.docs[doc_id]['title']}"
+
+        # 3. 最初の30文字が一致している場合
+        if len(title_lower) > PREFIX_LENGTH:
+            doc_id = self._prefix.get(title_lower[:PREFIX_LENGTH])
+            if doc_id is not None:
+                return f"⚠️ 冒頭一致: {self.docs[doc_id]['title']}"
+
+        # 4. テーマの重複チェック（タイトルの大部分が過去のテーマに含まれる場合は同じ話題とみなす）
+        match = self._find_similar(query, self._theme_postings, 'theme_tokens', THEME_SIMILARITY_THRESHOLD, containment)
+        if match:
+            doc_id, similarity = match
+            return f"⚠️ テーマ重複 ({similarity:.2%}): {self.docs[doc_id]['theme']}"
+
+        return None
+
+    def max_similarity(self, text: str, field: str = 'theme_tokens',
+                       measure: Callable[[Set[str], Set[str]], float] = jaccard,
+                       floor: float = 0.2) -> float:
+        """
+        テキストと最も似ている履歴の類似度（投稿前のニュースの選択用）
+
+        Args:
+            text: 比較するテキスト
+            field: 比較対象（'title_tokens' または 'theme_tokens'）
+            measure: 類似度の関数（jaccard または containment）
+            floor: これ未満の類似度は0として扱う（候補を絞り込むため）
+
+        Returns:
+            最大の類似度（0.0〜1.0）
+        """
+        postings = self._title_postings if field == 'title_tokens' else self._theme_postings
+        match = self._find_similar(tokenize(text.lower().strip()), postings, field, floor, measure, best=True)
+        return match[1] if match else 0.0
+
+    def _find_similar(self, query: Set[str], postings: Dict[str, Set[int]], field: str,
+                      threshold: float, measure: Callable[[Set[str], Set[str]], float],
+                      best: bool = False) -> Optional[tuple]:
+        """
+        類似度がしきい値以上の文書を探す
+
+        類似度（jaccard / containment）が threshold 以上となる文書は、クエリのシングルのうち
+        少なくとも ceil(threshold * |q|) 個を含むため、出現数の少ない順に |q| - ceil(threshold * |q|) + 1 個の
+        シングルの転置リストだけを候補にすれば取りこぼさない
+
+        Args:
+            measure: 類似度の関数（jaccard または containment）
+            best: Trueなら最初に見つかった文書ではなく、最も類似度の高い文書を返す
+
+        Returns:
+            (文書ID, 類似度) のタプル、見つからなければNone
+        """
+        if not query:
+            return None
+
+        min_overlap = max(1, math.ceil(threshold * len(query)))
+        rare_first = sorted(query, key=lambda token: len(postings.get(token, ())))
+        candidates = set()
+        for token in rare_first[:len(query) - min_overlap + 1]:
+            candidates.update(postings.get(token, ()))
+
+        # Jaccard係数ではシングル数が大きく違う文書はしきい値を超えない
+        max_size = len(query) / threshold if measure is jaccard else math.inf
+        match = None
+        for doc_id in candidates:
+            doc_tokens = self._token_sets[field][doc_id]
+            if not min_overlap <= len(doc_tokens) <= max_size:
+                continue
+            similarity = measure(query, doc_tokens)
+            if similarity >= threshold and (match is None or similarity > match[1]):
+                match = (doc_id, similarity)
+                if not best:
+                    break
+        return match
@@ -0,0 +1,135 @@
+"""
+RSSフィードのキャッシュモジュール
+ETag / Last-Modified を保存して条件付きGETを行い、304の場合は保存済みのアイテムを再利用します
+URLごとに1ファイルとしてキャッシュディレクトリに保存し、TTLと合計サイズの上限で古いものから削除します
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from typing import Optional, Dict, List
+from file_store import write_json_atomic, evict_files
+
+
+class FeedCache:
+    def __init__(self, cache_dir: Optional[str] = None, ttl_seconds: Optional[float] = None,
+                 max_bytes: Optional[int] = None):
+        """
+        Args:
+            cache_dir: キャッシュの保存先（デフォルトは .cache/feeds）
+            ttl_seconds: キャッシュの有効期間（秒、デフォルトは7日）
+            max_bytes: キャッシュ全体の最大サイズ（バイト、デフォルトは2MB）
+        """
+        self.cache_dir = Path(cache_dir or os.getenv('FEED_CACHE_DIR', '.cache/feeds'))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(
+            os.getenv('FEED_CACHE_TTL', str(7 * 24 * 3600)))
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            os.getenv('FEED_CACHE_MAX_BYTES', str(2 * 1024 * 1024)))
+        # 複数のワーカースレッドから同時に呼ばれるため、削除処理を排他する
+        self._lock = threading.Lock()
+
+    def _path_for(self, url: str) -> Path:
+        """
+        URLに対応するキャッシュファイルのパス
+        """
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()[:32]
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, url: str) -> Optional[Dict]:
+        """
+        キャッシュを取得（期限切れの場合は削除してNone）
+
+        Args:
+            url: フィードのURL
+
+        Returns:
+            {'url', 'etag', 'last_modified', 'channel_title', 'items', 'stored_at'} の辞書、なければNone
+        """
+        path = self._path_for(url)
+        if not path.exists():
+            return None
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except Exception as e:
+            print(f"  ⚠️ フィードキャッシュの読み込みエラー ({url}): {e}")
+            return None
+
+        if time.time() - entry.get('stored_at', 0) > self.ttl_seconds:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            return None
+
+        return entry
+
+    @staticmethod
+    def conditional_headers(entry: Optional[Dict]) -> Dict[str, str]:
+        """
+        条件付きGET用のリクエストヘッダーを作成
+
+        Args:
+            entry: get() で取得したキャッシュ
+
+        Returns:
+            If-None-Match / If-Modified-Since ヘッダーの辞書
+        """
+        headers = {}
+        if not entry:
+            return headers
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def put(self, url: str, channel_title: str, items: List[Dict],
+            etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """
+        取得したフィードをキャッシュに保存
+
+        Args:
+            url: フィードのURL
+            channel_title: チャンネル名
+            items: パース済みのアイテム（title, description, link の辞書）
+            etag: レスポンスのETagヘッダー
+            last_modified: レスポンスのLast-Modifiedヘッダー
+        """
+        entry = {
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'channel_title': channel_title,
+            'items': items,
+            'stored_at': time.time(),
+        }
+        self._write(url, entry)
+        self._evict()
+
+    def touch(self, url: str, entry: Dict):
+        """
+        304 (Not Modified) の場合にキャッシュの有効期限を延長
+        """
+        entry = dict(entry, stored_at=time.time())
+        self._write(url, entry)
+
+    def _write(self, url: str, entry: Dict):
+        """
+        一時ファイルに書き込んでから置き換える（途中で落ちても壊れたファイルを残さない）
+        """
+        try:
+            write_json_atomic(self._path_for(url), entry)
+        except Exception as e:
+            print(f"  ⚠️ フィードキャッシュの保存エラー ({url}): {e}")
+
+    def _evict(self):
+        """
+        期限切れのものと、合計サイズが上限を超えた分を更新が古いものから削除
+        """
+        with self._lock:
+            evict_files(self.cache_dir, self.max_bytes, self.ttl_seconds)
@@ -0,0 +1,111 @@
+"""
+RSS / Atom フィードの逐次パーサー
+レスポンスを少しずつ読み込みながら解析し、必要な件数が集まった時点で読み込みを打ち切ります
+処理済みの要素はその場で破棄するため、大きなフィードでもメモリ使用量が増えません
+"""
+
+import re
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Tuple
+
+# HTMLタグ除去用（説明文に含まれるタグを取り除く）
+_TAG_RE = re.compile(r'<[^>]+>')
+
+
+def _local_name(tag: str) -> str:
+    """
+    名前空間を除いたタグ名（'{http://www.w3.org/2005/Atom}entry' -> 'entry'）
+    """
+    return tag.rsplit('}', 1)[-1]
+
+
+def _parse_entry(elem: ET.Element) -> Dict:
+    """
+    RSSの<item>またはAtomの<entry>からタイトル・説明・リンクを取り出す
+
+    Args:
+        elem: <item> / <entry> 要素
+
+    Returns:
+        {'title': str, 'description': str, 'link': str} の辞書
+    """
+    fields = {}
+    link = ""
+    for child in elem:
+        name = _local_name(child.tag)
+        if name == 'link':
+            # Atomは href 属性、RSSはテキストにURLが入る
+            href = child.get('href')
+            if href:
+                if not link and child.get('rel', 'alternate') == 'alternate':
+                    link = href
+            elif not link and child.text:
+                link = child.text.strip()
+        elif name in ('title', 'description', 'summary', 'content') and name not in fields:
+            fields[name] = child.text or ""
+
+    title = fields.get('title', '').strip() or "No Title"
+    desc = fields.get('description') or fields.get('summary') or fields.get('content') or ""
+
+    # HTMLタグを除去
+    if desc:
+        desc = _TAG_RE.sub('', desc)[:200] + "..."
+
+    return {'title': title, 'description': desc, 'link': link}
+
+
+def parse_feed_stream(stream, max_items: int = 2, chunk_size: int = 8192) -> Tuple[str, List[Dict]]:
+    """
+    ストリームからRSS / Atomフィードを逐次解析する
+
+    Args:
+        stream: read(size) を持つファイルライクオブジェクト（HTTPレスポンスなど）
+        max_items: 取得する最大件数（集まった時点で読み込みを終了）
+        chunk_size: 1回に読み込むバイト数
+
+    Returns:
+        (チャンネル名, アイテムのリスト) のタプル
+    """
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    channel_title = "Unknown Source"
+    found_channel_title = False
+    items = []
+    # 開始済みの要素（親要素をたどって処理済みの子要素を取り除くため）
+    stack = []
+
+    def handle_events():
+        nonlocal channel_title, found_channel_title
+        for event, elem in parser.read_events():
+            if event == 'start':
+                stack.append(elem)
+                continue
+
+            stack.pop()
+            name = _local_name(elem.tag)
+            parent = _local_name(stack[-1].tag) if stack else ''
+
+            # チャンネル名（RSSは<channel><title>、Atomは<feed><title>）
+            if name == 'title' and parent in ('channel', 'feed') and not found_channel_title:
+                found_channel_title = True
+                if elem.text:
+                    channel_title = elem.text.strip()
+            elif name in ('item', 'entry'):
+                items.append(_parse_entry(elem))
+                # 処理済みの要素を破棄してメモリを解放
+                elem.clear()
+                if stack:
+                    stack[-1].remove(elem)
+                if len(items) >= max_items:
+                    return
+
+    while len(items) < max_items:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            # 最後まで読み込んだ場合は残りのイベントを処理
+            parser.close()
+            handle_events()
+            break
+        parser.feed(chunk)
+        handle_events()
+
+    return channel_title, items[:max_items]
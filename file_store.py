@@ -0,0 +1,68 @@
+"""
+ファイルへの保存の共通モジュール
+- JSONを一時ファイルに書き込んでから置き換える（途中で落ちても壊れたファイルを残さない）
+  一時ファイルの名前にプロセスIDとスレッドIDを含め、複数のプロセス・スレッドが同時に保存しても互いの書きかけを置き換えない
+- キャッシュディレクトリの古いファイルを、期限と合計サイズの上限で削除する
+"""
+
+import os
+import json
+import time
+import threading
+from pathlib import Path
+from typing import Any, Optional
+
+
+def write_json_atomic(path: Path, data: Any, **dump_options):
+    """
+    JSONを一時ファイルに書き込んでから置き換える（保存先のディレクトリがなければ作成）
+    失敗した場合は一時ファイルを削除して例外をそのまま送出する（エラーの表示は呼び出し側で行う）
+
+    Args:
+        path: 保存先
+        data: 保存する値
+        dump_options: json.dump に渡すオプション（indent など、ensure_ascii は False）
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, **dump_options)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
+        raise
+
+
+def evict_files(directory: Path, max_bytes: int, max_age: Optional[float] = None, pattern: str = '*.json'):
+    """
+    キャッシュディレクトリのファイルを、更新時刻が古いものから削除
+    - 更新から max_age 秒を過ぎたファイル（期限切れ）
+    - 合計サイズが max_bytes を超える分
+
+    Args:
+        directory: キャッシュディレクトリ
+        max_bytes: 合計サイズの上限（バイト）
+        max_age: 期限（秒、Noneなら期限では削除しない）
+        pattern: 対象にするファイル名のパターン
+    """
+    try:
+        files = [(p, p.stat()) for p in Path(directory).glob(pattern)]
+    except OSError:
+        return
+
+    total = sum(st.st_size for _, st in files)
+    expires = time.time() - max_age if max_age is not None else None
+    for path, st in sorted(files, key=lambda f: f[1].st_mtime):
+        expired = expires is not None and st.st_mtime < expires
+        if not expired and total <= max_bytes:
+            break
+        try:
+            path.unlink()
+            total -= st.st_size
+        except OSError:
+            pass
@@ -0,0 +1,181 @@
+"""
+投稿履歴の保存モジュール（SQLite）
+記事ごとに1行を追記し、日付・元ニュースのURLにインデックスを張ります
+保存期間を過ぎた履歴は日付の範囲指定で削除するため、投稿1件あたりの読み書きが履歴の件数に比例しません
+WALモードで開くため、スケジューラーと手動実行など複数のプロセスが同時に書き込んでも履歴が壊れません
+以前の post_history.json がある場合は、初回に1度だけ取り込みます
+"""
+
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Dict, List
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT NOT NULL,
+    title TEXT NOT NULL,
+    theme TEXT NOT NULL DEFAULT '',
+    source_url TEXT NOT NULL DEFAULT '',
+    content_preview TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_posts_date ON posts(date);
+CREATE INDEX IF NOT EXISTS idx_posts_source_url ON posts(source_url);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+_COLUMNS = ('id', 'date', 'title', 'theme', 'source_url', 'content_preview')
+
+
+class HistoryStore:
+    def __init__(self, db_path: Path, legacy_json: Optional[Path] = None):
+        """
+        Args:
+            db_path: SQLiteデータベースのパス
+            legacy_json: 取り込む旧形式の投稿履歴（post_history.json）
+        """
+        self.db_path = Path(db_path)
+        # sqlite3の接続はスレッド間で共有できないため、スレッドごとに接続する
+        self._local = threading.local()
+
+        conn = self._connect()
+        conn.executescript(_SCHEMA)
+        if legacy_json is not None:
+            self._migrate_json(Path(legacy_json))
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        このスレッドの接続を取得（初回のみ作成）
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # isolation_level=None: 自動でトランザクションを開始せず、必要な箇所だけ BEGIN する
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _migrate_json(self, json_path: Path):
+        """
+        旧形式の投稿履歴（JSON）を1度だけ取り込む
+        """
+        conn = self._connect()
+        # 複数のプロセスが同時に取り込まないよう、書き込みロックを取ってから確認する
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'migrated_json'").fetchone():
+                conn.execute('COMMIT')
+                return
+
+            history = []
+            if json_path.exists():
+                try:
+                    with open(json_path, 'r', encoding='utf-8') as f:
+                        history = json.load(f)
+                except Exception as e:
+                    print(f"⚠️ 旧形式の投稿履歴の読み込みエラー: {e}")
+                history = history if isinstance(history, list) else []
+
+            for entry in history:
+                self._insert(conn, entry)
+            conn.execute("INSERT INTO meta (key, value) VALUES ('migrated_json', ?)",
+                         (datetime.now().isoformat(),))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+        if history:
+            print(f"✓ 投稿履歴を {json_path} から取り込みました（{len(history)}件）")
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, entry: Dict) -> int:
+        """
+        1件を挿入してIDを返す
+        """
+        cursor = conn.execute(
+            'INSERT INTO posts (date, title, theme, source_url, content_preview) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (
+                entry.get('date') or datetime.now().isoformat(),
+                entry.get('title', ''),
+                entry.get('theme', ''),
+                entry.get('source_url', ''),
+                entry.get('content_preview', ''),
+            )
+        )
+        return cursor.lastrowid
+
+    def append(self, entry: Dict) -> Dict:
+        """
+        投稿履歴を1件追加
+
+        Args:
+            entry: {'title', 'date', 'theme', 'source_url', 'content_preview'}
+
+        Returns:
+            IDを追加したエントリ
+        """
+        entry = dict(entry)
+        entry['id'] = self._insert(self._connect(), entry)
+        return entry
+
+    def prune(self, cutoff_date: datetime) -> int:
+        """
+        保存期間を過ぎた履歴を削除（日付のインデックスで範囲削除）
+
+        Args:
+            cutoff_date: これより前（同時刻を含む）の履歴を削除
+
+        Returns:
+            削除した件数
+        """
+        cursor = self._connect().execute('DELETE FROM posts WHERE date <= ?', (cutoff_date.isoformat(),))
+        return cursor.rowcount
+
+    def entries(self, after_id: int = 0) -> List[Dict]:
+        """
+        投稿履歴を古い順に取得
+
+        Args:
+            after_id: このIDより後に追加された履歴のみ取得（差分の取得用）
+
+        Returns:
+            投稿履歴のリスト
+        """
+        rows = self._connect().execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM posts WHERE id > ? ORDER BY id", (after_id,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def count(self) -> int:
+        """
+        保存されている履歴の件数
+        """
+        return self._connect().execute('SELECT COUNT(*) FROM posts').fetchone()[0]
+
+    def last_id(self) -> int:
+        """
+        最後に追加された履歴のID（IDは削除後も再利用されない）
+        """
+        row = self._connect().execute("SELECT seq FROM sqlite_sequence WHERE name = 'posts'").fetchone()
+        return row[0] if row else 0
+
+    def has_source_url(self, url: str) -> bool:
+        """
+        同じニュース（URL）を元にした履歴があるか
+        """
+        if not url:
+            return False
+        row = self._connect().execute(
+            'SELECT 1 FROM posts WHERE source_url = ? LIMIT 1', (url,)
+        ).fetchone()
+        return row is not None
@@ -0,0 +1,274 @@
+"""
+生成された本文（HTML）の正規化モジュール
+本文を html.parser で1回だけ走査し、次の処理をまとめて行います
+- タグで囲まれていない段落を空行区切りで<p>タグに変換
+- 許可したタグ・属性以外の除去（<script>などは中身ごと除去）と、閉じていないタグの補完
+- HTMLタグを除いた文字数・プレビュー・見出しの一覧の取得
+- 上限の文字数を超えた分の、最上位のブロック要素の区切りでの切り詰め（区切りがなければテキストの途中で切る）
+- 閉じ忘れた<li>や<p>を、次の<li>やブロック要素の開始で閉じる
+本文ごとに正規表現で何度もタグを除去する必要がなくなり、バッチ実行で大量の記事を処理する場合も速くなります
+"""
+
+import re
+from html import escape
+from html.parser import HTMLParser
+from typing import Optional, Dict, List, Tuple
+
+# プレビューの文字数（投稿履歴に保存する本文の冒頭）
+PREVIEW_LENGTH = 200
+
+# 出力に残すタグ
+_BLOCK_TAGS = {'p', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'li', 'table', 'thead', 'tbody',
+               'tr', 'th', 'td', 'blockquote', 'pre', 'hr'}
+_INLINE_TAGS = {'strong', 'em', 'b', 'i', 'u', 'a', 'code', 'br'}
+_VOID_TAGS = {'br', 'hr'}
+# 中身ごと取り除くタグ
+_DROP_CONTENT_TAGS = {'script', 'style', 'iframe', 'object', 'embed'}
+# 記事のタイトルはWordPress側で<h1>になるため、本文の<h1>は<h2>にする
+_TAG_ALIASES = {'h1': 'h2'}
+_HEADING_TAGS = {'h2', 'h3', 'h4', 'h5', 'h6'}
+# 閉じ忘れた要素を暗黙に閉じるタグ（HTMLの解析規則と同じ）
+# 開始タグ -> (閉じる要素, 探すのを止める要素)。<li>の閉じ忘れは次の<li>で閉じ、入れ子のリストの<li>は閉じない
+_IMPLIED_END_TAGS = {
+    'li': ({'li'}, {'ul', 'ol'}),
+    'tr': ({'tr'}, {'table', 'thead', 'tbody'}),
+    'td': ({'td', 'th'}, {'tr', 'table'}),
+    'th': ({'td', 'th'}, {'tr', 'table'}),
+}
+# 開いている<p>を閉じるブロック要素（<p>の中にブロック要素は入れられない）
+_CLOSES_P_TAGS = {'p', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'li', 'table', 'blockquote', 'pre', 'hr'}
+_P_SCOPE_TAGS = {'li', 'td', 'th', 'table', 'blockquote', 'ul', 'ol'}
+# 属性は<a>のhref（http / https）のみ残す
+_SAFE_HREF_RE = re.compile(r'^https?://', re.IGNORECASE)
+# タグで囲まれていない本文の段落の区切り
+_BLANK_LINE_RE = re.compile(r'\n\s*\n')
+# 正規化せずに文字数だけを数える場合に使用
+_TAG_RE = re.compile(r'<[^>]+>')
+
+
+def plain_text_length(html: str) -> int:
+    """
+    HTMLタグを除いた本文の文字数（正規化が不要な場合の簡易版）
+    """
+    return len(_TAG_RE.sub('', html or '').strip())
+
+
+class _Normalizer(HTMLParser):
+    """
+    本文を1回走査して正規化したHTMLと、最上位のブロック要素の区切りを記録する
+    max_chars を指定した場合は、文字数がそれに達した位置でテキストを切り、以降は読み飛ばす
+    """
+
+    def __init__(self, max_chars: Optional[int] = None):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        # max_chars に達して以降を読み飛ばしているかどうか
+        self.truncated = False
+        self.parts: List[str] = []
+        # 開いているタグ（出力に残すもののみ）
+        self.stack: List[str] = []
+        # タグで囲まれていない本文のために開いた<p>
+        self.implicit_p = False
+        self.drop_depth = 0
+        self.text_length = 0
+        self.preview_parts: List[str] = []
+        self.preview_length = 0
+        # (出力の位置, その時点までの文字数, 見出しかどうか)
+        self.boundaries: List[Tuple[int, int, bool]] = []
+        # (出力の位置, レベル, 見出しのテキスト)
+        self.headings: List[Tuple[int, int, str]] = []
+        self._heading_text: Optional[List[str]] = None
+
+    def _write(self, text: str):
+        self.parts.append(text)
+
+    def _mark_boundary(self, is_heading: bool = False):
+        position = len(self.parts)
+        self.boundaries.append((position, self.text_length, is_heading))
+        self._write('\n\n')
+        # プレビューではブロック要素の間を改行で区切る
+        if self.preview_parts and self.preview_length < PREVIEW_LENGTH:
+            self.preview_parts.append('\n')
+
+    def _open_implicit_p(self):
+        if not self.stack and not self.implicit_p:
+            self._write('<p>')
+            self.implicit_p = True
+
+    def _close_implicit_p(self):
+        if self.implicit_p:
+            self._write('</p>')
+            self.implicit_p = False
+            self._mark_boundary()
+
+    def _add_text(self, text: str):
+        if self.max_chars is not None and self.text_length + len(text) > self.max_chars:
+            text = text[:max(0, self.max_chars - self.text_length)]
+            self.truncated = True
+        self.text_length += len(text)
+        if self.preview_length < PREVIEW_LENGTH:
+            self.preview_parts.append(text)
+            self.preview_length += len(text)
+        if self._heading_text is not None:
+            self._heading_text.append(text)
+        self._write(escape(text, quote=False))
+
+    def _close_open(self, tags: set, scope: set):
+        """
+        開いている要素のうち、scope の要素より内側にある tags の要素を閉じる
+        """
+        for open_tag in reversed(self.stack):
+            if open_tag in tags:
+                self.handle_endtag(open_tag)
+                return
+            if open_tag in scope:
+                return
+
+    def handle_starttag(self, tag, attrs):
+        tag = _TAG_ALIASES.get(tag, tag)
+        if tag in _DROP_CONTENT_TAGS:
+            self.drop_depth += 1
+            return
+        if self.truncated or self.drop_depth or (tag not in _BLOCK_TAGS and tag not in _INLINE_TAGS):
+            return
+
+        if tag in _CLOSES_P_TAGS:
+            self._close_open({'p'}, _P_SCOPE_TAGS)
+        if tag in _IMPLIED_END_TAGS:
+            self._close_open(*_IMPLIED_END_TAGS[tag])
+
+        if tag in _BLOCK_TAGS:
+            if not self.stack:
+                self._close_implicit_p()
+        else:
+            self._open_implicit_p()
+
+        attributes = ''
+        if tag == 'a':
+            href = dict(attrs).get('href') or ''
+            if _SAFE_HREF_RE.match(href):
+                attributes = f' href="{escape(href)}"'
+        self._write(f'<{tag}{attributes}>')
+
+        if tag in _VOID_TAGS:
+            if tag == 'hr' and not self.stack:
+                self._mark_boundary()
+            return
+        self.stack.append(tag)
+        if tag in _HEADING_TAGS and len(self.stack) == 1:
+            self._heading_text = []
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        tag = _TAG_ALIASES.get(tag, tag)
+        if tag not in _VOID_TAGS and self.stack and self.stack[-1] == tag:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        tag = _TAG_ALIASES.get(tag, tag)
+        if tag in _DROP_CONTENT_TAGS:
+            self.drop_depth = max(0, self.drop_depth - 1)
+            return
+        if self.truncated or self.drop_depth or tag not in self.stack:
+            return
+
+        # 閉じ忘れた内側のタグもまとめて閉じる
+        while self.stack:
+            open_tag = self.stack.pop()
+            self._write(f'</{open_tag}>')
+            if open_tag == tag:
+                break
+
+        if not self.stack:
+            is_heading = tag in _HEADING_TAGS
+            if is_heading and self._heading_text is not None:
+                self.headings.append((len(self.parts), int(tag[1]), ''.join(self._heading_text).strip()))
+                self._heading_text = None
+            if tag in _BLOCK_TAGS:
+                self._mark_boundary(is_heading)
+
+    def handle_data(self, data):
+        if self.truncated or self.drop_depth:
+            return
+        if self.stack:
+            self._add_text(data)
+            return
+
+        # タグで囲まれていない本文は、空行区切りで段落にする
+        paragraphs = _BLANK_LINE_RE.split(data)
+        for i, paragraph in enumerate(paragraphs):
+            if self.truncated:
+                break
+            if i > 0:
+                self._close_implicit_p()
+            if not self.implicit_p:
+                paragraph = paragraph.lstrip()
+            if i < len(paragraphs) - 1:
+                paragraph = paragraph.rstrip()
+            if paragraph:
+                self._open_implicit_p()
+                self._add_text(paragraph)
+
+    def finish(self) -> bool:
+        """
+        走査を終了する
+
+        Returns:
+            最後のブロック要素が閉じていなかった（max_tokensで途中まで生成された場合など）か、
+            max_chars で途中で切ったかどうか
+        """
+        self.close()
+        incomplete = bool(self.stack) or self.truncated
+        while self.stack:
+            self._write(f'</{self.stack.pop()}>')
+        if self.implicit_p:
+            self._close_implicit_p()
+        elif incomplete:
+            self._mark_boundary()
+        return incomplete
+
+
+def normalize_html(content: str, max_chars: Optional[int] = None) -> Dict:
+    """
+    本文を1回走査して正規化し、文字数・プレビュー・見出しの一覧を取得
+
+    Args:
+        content: 生成された本文（HTMLまたは空行区切りのテキスト）
+        max_chars: 上限の文字数（HTMLタグを除く）。指定した場合、超えた分と閉じていない最後のブロック要素、
+                   本文のない末尾の見出しを取り除く（最初のブロック要素だけで上限を超える場合は、テキストの途中で切る）
+
+    Returns:
+        {'html': 正規化した本文, 'text_length': HTMLタグを除いた文字数,
+         'preview': 本文の冒頭（HTMLタグなし）, 'outline': [(レベル, 見出し), ...]}
+    """
+    parser = _Normalizer(max_chars)
+    parser.feed(content or '')
+    incomplete = parser.finish()
+
+    boundaries = parser.boundaries
+    end = len(boundaries)
+    if max_chars is not None:
+        if incomplete:
+            end -= 1
+        while end > 0 and boundaries[end - 1][1] > max_chars:
+            end -= 1
+        while end > 0 and boundaries[end - 1][2]:
+            end -= 1
+        if end == 0:
+            # 区切りが見つからない場合は、上限の文字数で切ったテキストをそのまま使う
+            end = len(boundaries)
+
+    if end < len(boundaries):
+        position, text_length, _ = boundaries[end - 1]
+        parts = parser.parts[:position]
+    else:
+        parts = parser.parts
+        text_length = parser.text_length
+        position = len(parts)
+
+    return {
+        'html': ''.join(parts).strip(),
+        'text_length': text_length,
+        'preview': ''.join(parser.preview_parts).strip()[:PREVIEW_LENGTH],
+        'outline': [(level, text) for pos, level, text in parser.headings if pos <= position],
+    }
@@ -0,0 +1,128 @@
+"""
+共通HTTPクライアントモジュール
+WordPress / Unsplash / NewsAPI / Banana / 画像ダウンロード / RSS の通信で同じセッションを共有し、
+ホストごとのコネクションプール（Keep-Alive）で毎回のTCP+TLSハンドシェイクを省きます
+リトライ（バックオフ付き）とエンドポイントごとのタイムアウトもここで一元管理します
+"""
+
+import os
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# エンドポイントごとのタイムアウト（秒）
+# 環境変数 HTTP_TIMEOUT_<名前>（例: HTTP_TIMEOUT_WORDPRESS_MEDIA=90）で上書き可能
+DEFAULT_TIMEOUTS = {
+    'rss': 5,
+    'newsapi': 10,
+    'unsplash': 10,
+    'image_download': 30,
+    'banana_start': 30,
+    'banana_check': 10,
+    'wordpress_post': 30,
+    'wordpress_media': 60,
+}
+
+# 一時的なエラーとしてリトライするステータスコード
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_timeout(endpoint: str) -> float:
+    """
+    エンドポイントのタイムアウトを取得
+
+    Args:
+        endpoint: DEFAULT_TIMEOUTS のキー
+
+    Returns:
+        タイムアウト（秒）
+    """
+    default = DEFAULT_TIMEOUTS.get(endpoint, 30)
+    return float(os.getenv(f"HTTP_TIMEOUT_{endpoint.upper()}", str(default)))
+
+
+def create_session(pool_connections: int = None, pool_maxsize: int = None,
+                   max_retries: int = None, backoff_factor: float = None) -> requests.Session:
+    """
+    コネクションプールとリトライを設定したセッションを作成
+
+    Args:
+        pool_connections: 保持するホストごとのプール数
+        pool_maxsize: 1ホストあたりの最大コネクション数
+        max_retries: 最大リトライ回数（GETなど冪等なリクエストのみ）
+        backoff_factor: リトライ間隔の係数（0.5なら 0.5秒, 1秒, 2秒...）
+
+    Returns:
+        設定済みの requests.Session
+    """
+    if pool_connections is None:
+        pool_connections = int(os.getenv('HTTP_POOL_CONNECTIONS', '16'))
+    if pool_maxsize is None:
+        pool_maxsize = int(os.getenv('HTTP_POOL_MAXSIZE', '10'))
+    if max_retries is None:
+        max_retries = int(os.getenv('HTTP_MAX_RETRIES', '2'))
+    if backoff_factor is None:
+        backoff_factor = float(os.getenv('HTTP_BACKOFF_FACTOR', '0.5'))
+
+    # POSTは二重投稿を避けるためリトライしない（接続エラーのみurllib3側で判定）
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset({'GET', 'HEAD', 'OPTIONS'}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=retry,
+    )
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """
+    プロセス内で共有するセッションを取得（初回呼び出し時に作成）
+
+    Returns:
+        共有の requests.Session
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+class DeadlineReader:
+    """
+    応答の本文を期限まで読み込むファイルライクオブジェクト
+    タイムアウトは1回の読み込みごとにかかるため、少しずつデータが届く応答も打ち切れるよう読み込みのたびに期限を確認する
+    """
+
+    def __init__(self, stream, deadline: float):
+        """
+        Args:
+            stream: read(size) を持つファイルライクオブジェクト（HTTPレスポンスの raw など）
+            deadline: 期限（time.monotonic() の値）
+        """
+        self.stream = stream
+        self.deadline = deadline
+
+    def read(self, size: int = -1) -> bytes:
+        if time.monotonic() >= self.deadline:
+            raise TimeoutError("応答の読み込みが制限時間を過ぎました")
+        # read は size バイト集まるまで待つため、届いた分だけ返す read1 があれば使う（urllib3 2.x）
+        read1 = getattr(self.stream, 'read1', None)
+        return read1(size) if read1 is not None else self.stream.read(size)
@@ -0,0 +1,248 @@
+"""
+アイキャッチ画像のキャッシュモジュール（SQLite）
+画像の取得元URLと知覚ハッシュ（dHash）を、WordPressにアップロード済みのメディアIDと対応付けて保存します
+- 同じ画像（同じURL、または見た目がほぼ同じ画像）はダウンロードとアップロードを省き、既存のメディアIDを再利用
+- 最近アイキャッチに使った画像とほぼ同じ画像は使わない（別の画像を取得し直す）
+知覚ハッシュの計算には Pillow を使います（requirements.txt に含まれています。未インストールの環境ではURLのみで判定）
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional, BinaryIO
+from urllib.parse import urlsplit, urlunsplit
+import numpy as np
+from image_spool import ImageSpool
+
+# ほぼ同じ画像とみなすハッシュの距離（64ビット中の異なるビット数）
+DEFAULT_HASH_DISTANCE = 6
+# 同じ画像をアイキャッチに再び使うまでの日数
+DEFAULT_REUSE_COOLDOWN_DAYS = 30
+
+# クエリ文字列が毎回変わるが、パスで画像が決まる配信元（Unsplashの ixid など）
+_QUERY_INSENSITIVE_HOSTS = {'images.unsplash.com', 'plus.unsplash.com'}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    site TEXT NOT NULL,
+    source_key TEXT NOT NULL DEFAULT '',
+    phash INTEGER,
+    media_id INTEGER NOT NULL,
+    used_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_images_source_key ON images(source_key);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_images_site_media ON images(site, media_id);
+CREATE INDEX IF NOT EXISTS idx_images_used_at ON images(used_at);
+"""
+
+_pillow_warned = False
+
+
+def source_key(image_url: Optional[str]) -> str:
+    """
+    画像URLをキャッシュのキーに変換（ローカルファイルのURLは対象外）
+
+    Returns:
+        キー、対象外の場合は空文字
+    """
+    if not image_url or not image_url.startswith(('http://', 'https://')):
+        return ''
+    parts = urlsplit(image_url)
+    query = '' if parts.netloc in _QUERY_INSENSITIVE_HOSTS else parts.query
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, query, ''))
+
+
+def image_dhash(image_file: BinaryIO) -> Optional[int]:
+    """
+    画像の知覚ハッシュ（dHash、64ビット）を計算
+    9x8のグレースケールに縮小し、横に隣り合う画素の明るさの大小をビットにする
+
+    Args:
+        image_file: 画像データのファイルオブジェクト（先頭から読み込む）
+
+    Returns:
+        ハッシュ値、Pillowが未インストールの場合や画像を読み込めない場合はNone
+    """
+    global _pillow_warned
+    try:
+        from PIL import Image
+    except ImportError:
+        if not _pillow_warned:
+            print("⚠️ Pillowが未インストールのため、画像の類似チェックはURLのみで行います（pip install pillow）")
+            _pillow_warned = True
+        return None
+
+    try:
+        with Image.open(image_file) as image:
+            pixels = np.asarray(image.convert('L').resize((9, 8)), dtype=np.int16)
+    except Exception as e:
+        print(f"⚠️ 画像のハッシュ計算エラー: {e}")
+        return None
+
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    # SQLiteのINTEGER（符号付き64ビット）に収める
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def hash_distance(a: int, b: int) -> int:
+    """
+    2つのハッシュの異なるビット数（ハミング距離）
+    """
+    return bin((a ^ b) & ((1 << 64) - 1)).count('1')
+
+
+class ImageCache:
+    def __init__(self, db_path: Optional[str] = None, max_distance: Optional[int] = None,
+                 cooldown_days: Optional[float] = None):
+        """
+        Args:
+            db_path: SQLiteデータベースのパス（デフォルトは .cache/images.db）
+            max_distance: ほぼ同じ画像とみなすハッシュの距離
+            cooldown_days: 同じ画像をアイキャッチに再び使うまでの日数
+        """
+        self.db_path = Path(db_path or os.getenv('IMAGE_CACHE_DB', '.cache/images.db'))
+        self.max_distance = max_distance if max_distance is not None else int(
+            os.getenv('IMAGE_HASH_DISTANCE', str(DEFAULT_HASH_DISTANCE)))
+        self.cooldown_days = cooldown_days if cooldown_days is not None else float(
+            os.getenv('IMAGE_REUSE_COOLDOWN_DAYS', str(DEFAULT_REUSE_COOLDOWN_DAYS)))
+        # sqlite3の接続はスレッド間で共有できないため、スレッドごとに接続する
+        self._local = threading.local()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._connect().executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        このスレッドの接続を取得（初回のみ作成）
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def image_hash(self, image: Optional[ImageSpool]) -> Optional[int]:
+        """
+        画像データの知覚ハッシュ（同じ画像データは1回だけ計算）
+        """
+        if image is None or image.closed:
+            return None
+        if not image.hashed:
+            image.phash = image_dhash(image.open())
+            image.hashed = True
+        return image.phash
+
+    def _find_similar(self, rows, phash: int) -> Optional[sqlite3.Row]:
+        """
+        ハッシュの距離がしきい値以内で最も近い行
+        """
+        best = None
+        best_distance = self.max_distance + 1
+        for row in rows:
+            distance = hash_distance(row['phash'], phash)
+            if distance < best_distance:
+                best, best_distance = row, distance
+        return best
+
+    def has_url(self, image_url: str) -> bool:
+        """
+        同じURLの画像がいずれかのサイトにアップロード済みか（ダウンロードを省けるか）
+        """
+        key = source_key(image_url)
+        if not key:
+            return False
+        row = self._connect().execute(
+            'SELECT 1 FROM images WHERE source_key = ? LIMIT 1', (key,)
+        ).fetchone()
+        return row is not None
+
+    def find_media(self, site: str, image_url: str = '', phash: Optional[int] = None) -> Optional[int]:
+        """
+        同じ画像（同じURL、またはほぼ同じ見た目）のアップロード済みのメディアIDを探す
+
+        Args:
+            site: WordPressのURL
+            image_url: 画像の取得元URL
+            phash: 画像の知覚ハッシュ
+
+        Returns:
+            メディアID、見つからなければNone
+        """
+        conn = self._connect()
+        key = source_key(image_url)
+        if key:
+            row = conn.execute(
+                'SELECT media_id FROM images WHERE site = ? AND source_key = ? ORDER BY used_at DESC LIMIT 1',
+                (site, key)
+            ).fetchone()
+            if row:
+                return row['media_id']
+        if phash is not None:
+            rows = conn.execute(
+                'SELECT media_id, phash FROM images WHERE site = ? AND phash IS NOT NULL', (site,)
+            ).fetchall()
+            row = self._find_similar(rows, phash)
+            if row:
+                return row['media_id']
+        return None
+
+    def recently_used(self, image_url: str = '', phash: Optional[int] = None) -> bool:
+        """
+        同じ画像（同じURL、またはほぼ同じ見た目）を最近アイキャッチに使ったか
+
+        Args:
+            image_url: 画像の取得元URL
+            phash: 画像の知覚ハッシュ
+        """
+        if self.cooldown_days <= 0:
+            return False
+        since = (datetime.now() - timedelta(days=self.cooldown_days)).isoformat()
+        conn = self._connect()
+        key = source_key(image_url)
+        if key:
+            row = conn.execute(
+                'SELECT 1 FROM images WHERE source_key = ? AND used_at > ? LIMIT 1', (key, since)
+            ).fetchone()
+            if row:
+                return True
+        if phash is not None:
+            rows = conn.execute(
+                'SELECT phash FROM images WHERE used_at > ? AND phash IS NOT NULL', (since,)
+            ).fetchall()
+            return self._find_similar(rows, phash) is not None
+        return False
+
+    def record(self, site: str, media_id: int, image_url: str = '', phash: Optional[int] = None):
+        """
+        アイキャッチに使った画像を記録（メディアごとに1行、再利用した場合は使用日時を更新する）
+
+        Args:
+            site: WordPressのURL
+            media_id: メディアID
+            image_url: 画像の取得元URL
+            phash: 画像の知覚ハッシュ
+        """
+        # 取得元URL・ハッシュは最初に記録した値を残し、未記録の場合のみ補う
+        self._connect().execute(
+            'INSERT INTO images (site, source_key, phash, media_id, used_at) VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT (site, media_id) DO UPDATE SET '
+            "source_key = CASE WHEN source_key = '' THEN excluded.source_key ELSE source_key END, "
+            'phash = COALESCE(phash, excluded.phash), '
+            'used_at = excluded.used_at',
+            (site, source_key(image_url), phash, media_id, datetime.now().isoformat())
+        )
+
+    def forget_media(self, site: str, media_id: int):
+        """
+        削除したメディアの記録を削除（以降は再利用しない）
+        """
+        self._connect().execute('DELETE FROM images WHERE site = ? AND media_id = ?', (site, media_id))
@@ -0,0 +1,137 @@
+"""
+アイキャッチ画像の最適化モジュール
+アップロードの前に、画像をアイキャッチのサイズに縮小してWebP / JPEGに再圧縮します
+- DALL-E（1024x1024のPNG）やBanana Proの生成画像は、そのままだと数MBになりアップロードとWordPress側のサムネイル作成が遅い
+- EXIFなどのメタデータは除去する（撮影情報・位置情報を公開しない。向きは画素に反映してから除去）
+- 再圧縮しても小さくならず、縮小も不要な画像は元のデータをそのまま使う
+縮小と再圧縮には Pillow を使います（requirements.txt に含まれています。未インストールの環境では最適化しません）
+"""
+
+import os
+from typing import Optional, Tuple
+from image_spool import ImageSpool
+
+# アイキャッチ画像の最大サイズ（ピクセル、縦横比は保つ）
+DEFAULT_MAX_WIDTH = 1200
+DEFAULT_MAX_HEIGHT = 1200
+# 再圧縮の品質（1〜100）
+DEFAULT_QUALITY = 82
+
+# 出力形式ごとのPillowの形式名・拡張子
+_OUTPUT_FORMATS = {
+    'jpeg': ('JPEG', '.jpg', 'image/jpeg'),
+    'webp': ('WEBP', '.webp', 'image/webp'),
+}
+# そのまま使ってもよい形式（PNG・GIFなどは再圧縮する）
+_COMPACT_MIME_TYPES = {'image/jpeg', 'image/webp'}
+
+_pillow_warned = False
+
+
+def _flatten(image, keep_alpha: bool):
+    """
+    出力形式に合わせて色の形式を変換（JPEGは透過部分を白で塗りつぶす）
+    """
+    from PIL import Image
+
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    if not has_alpha:
+        return image.convert('RGB')
+    image = image.convert('RGBA')
+    if keep_alpha:
+        return image
+    background = Image.new('RGB', image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+class ImageOptimizer:
+    def __init__(self, max_size: Optional[Tuple[int, int]] = None, output_format: Optional[str] = None,
+                 quality: Optional[int] = None, enabled: Optional[bool] = None):
+        """
+        Args:
+            max_size: 最大サイズ (幅, 高さ)（デフォルトは 1200x1200）
+            output_format: 'jpeg' または 'webp'（デフォルトは jpeg）
+            quality: 再圧縮の品質（デフォルトは82）
+            enabled: 最適化するかどうか（デフォルトは環境変数 IMAGE_OPTIMIZE、off 以外なら有効）
+        """
+        self.max_size = max_size or (
+            int(os.getenv('IMAGE_MAX_WIDTH', str(DEFAULT_MAX_WIDTH))),
+            int(os.getenv('IMAGE_MAX_HEIGHT', str(DEFAULT_MAX_HEIGHT))),
+        )
+        output_format = (output_format or os.getenv('IMAGE_FORMAT', 'jpeg')).lower()
+        if output_format not in _OUTPUT_FORMATS:
+            print(f"⚠️ 不明な画像形式: {output_format}（jpegを使用します）")
+            output_format = 'jpeg'
+        self.output_format = output_format
+        self.quality = quality if quality is not None else int(os.getenv('IMAGE_QUALITY', str(DEFAULT_QUALITY)))
+        self.enabled = enabled if enabled is not None else os.getenv('IMAGE_OPTIMIZE', 'on').lower() != 'off'
+
+    def optimize(self, image: ImageSpool) -> ImageSpool:
+        """
+        画像を縮小・再圧縮してメタデータを除去
+
+        Args:
+            image: 元の画像データ
+
+        Returns:
+            最適化した画像データ（新しく作成した場合は呼び出し側で close する）、
+            最適化しない場合や失敗した場合は元の画像データ
+        """
+        global _pillow_warned
+        if not self.enabled or image.mime_type == 'image/gif':
+            # GIFはアニメーションが失われるため変換しない
+            return image
+        try:
+            from PIL import Image, ImageOps
+        except ImportError:
+            if not _pillow_warned:
+                print("⚠️ Pillowが未インストールのため、画像を最適化せずにアップロードします（pip install pillow）")
+                _pillow_warned = True
+            return image
+
+        output_format = self.output_format
+        if output_format == 'webp':
+            from PIL import features
+            if not features.check('webp'):
+                print("⚠️ PillowがWebPに対応していないため、JPEGで再圧縮します")
+                output_format = 'jpeg'
+        pil_format, suffix, mime_type = _OUTPUT_FORMATS[output_format]
+        optimized = None
+        try:
+            with Image.open(image.open()) as source:
+                original_size = source.size
+                # JPEGは縮小後のサイズに近い解像度で読み込む（デコードが速くなる）
+                # 向きを反映すると縦横が入れ替わる場合があるため、長い辺に合わせた正方形を指定する
+                longest = max(self.max_size)
+                source.draft('RGB', (longest, longest))
+                converted = ImageOps.exif_transpose(source)
+                converted.thumbnail(self.max_size, Image.LANCZOS, reducing_gap=3.0)
+                resized = converted.size != original_size
+                converted = _flatten(converted, keep_alpha=pil_format == 'WEBP')
+
+                optimized = ImageSpool(suffix, mime_type)
+                save_options = {'quality': self.quality, 'optimize': True}
+                if pil_format == 'JPEG':
+                    save_options['progressive'] = True
+                else:
+                    save_options['method'] = 4
+                icc_profile = source.info.get('icc_profile')
+                if icc_profile:
+                    # 色の再現に必要なカラープロファイルだけは残す
+                    save_options['icc_profile'] = icc_profile
+                converted.save(optimized, format=pil_format, **save_options)
+        except Exception as e:
+            print(f"⚠️ 画像の最適化エラー（元の画像をアップロードします）: {e}")
+            if optimized is not None:
+                optimized.close()
+            return image
+
+        if not resized and image.mime_type in _COMPACT_MIME_TYPES and optimized.size >= image.size:
+            optimized.close()
+            return image
+
+        optimized.phash, optimized.hashed = image.phash, image.hashed
+        print(f"✓ 画像を最適化しました: {original_size[0]}x{original_size[1]} {image.mime_type} {image.size}バイト"
+              f" → {converted.size[0]}x{converted.size[1]} {mime_type} {optimized.size}バイト")
+        return optimized
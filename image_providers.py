@@ -0,0 +1,282 @@
+"""
+画像の取得元（プロバイダー）の登録と稼働状況の管理モジュール
+- 取得元は ImageProvider を継承したクラスを register_provider で登録する（名前で IMAGE_SOURCE / IMAGE_PROVIDERS に指定できる）
+- 取得元ごとの所要時間とエラー率を .cache/image_providers.json に保存し、実行をまたいで引き継ぐ
+- 失敗が続く取得元は一定時間使わない（サーキットブレーカー）。応答のないAPIで毎回30秒待つことを防ぐ
+- 所要時間の実績から、次の取得元を並列に開始するまでの待ち時間（ヘッジ）を決める
+"""
+
+import os
+import abc
+import json
+import inspect
+import time
+import threading
+from pathlib import Path
+from typing import Optional, Dict, List, Tuple, Callable, Type
+from image_spool import ImageSpool
+from file_store import write_json_atomic
+
+# (画像URL, 画像データ)
+ImageResult = Tuple[str, Optional[ImageSpool]]
+
+# 連続で何回失敗したら使わなくするか
+DEFAULT_BREAKER_THRESHOLD = 3
+# 使わなくする時間（秒）
+DEFAULT_BREAKER_COOLDOWN = 30 * 60
+# 所要時間・エラー率の更新の重み（指数移動平均）
+STATS_SMOOTHING = 0.2
+# ヘッジの待ち時間を所要時間の実績から決めるのに必要な成功回数
+MIN_LATENCY_SAMPLES = 3
+# ヘッジの待ち時間（所要時間の平均の何倍待つか、最短何秒待つか）
+HEDGE_LATENCY_FACTOR = 2.0
+MIN_HEDGE_DELAY = 2.0
+
+
+class ImageProvider(abc.ABC):
+    """
+    画像の取得元のインターフェース
+    fetch で (画像URL, 画像データ) を返す（失敗時はNone）
+    """
+
+    # IMAGE_SOURCE / IMAGE_PROVIDERS で指定する名前
+    name = ''
+    # ログに表示する名前
+    label = ''
+    # コストの重み（環境変数 IMAGE_COST_<名前> で上書き可能）
+    default_cost = 1.0
+
+    def __init__(self, generator):
+        """
+        Args:
+            generator: ArticleGenerator（APIキーやHTTPセッションを共有する）
+        """
+        self.generator = generator
+        self.cost = float(os.getenv(f"IMAGE_COST_{self.name.upper()}", str(self.default_cost)))
+
+    @abc.abstractmethod
+    def fetch(self, theme: str, title: str, cancel: threading.Event) -> Optional[ImageResult]:
+        """
+        画像を取得
+
+        Args:
+            theme: 記事のテーマ
+            title: 記事のタイトル
+            cancel: セットされたら取得をやめるイベント（他の取得元の画像が使われた場合など）
+        """
+
+
+_registry: Dict[str, Type[ImageProvider]] = {}
+
+
+def register_provider(provider_class: Type[ImageProvider]) -> Type[ImageProvider]:
+    """
+    取得元のクラスを登録（デコレーターとして使用）
+    fetch を実装していないクラスや名前のないクラスは、ヘッジの実行中ではなく登録の時点でエラーにする
+    """
+    if inspect.isabstract(provider_class):
+        raise TypeError(f"画像の取得元 {provider_class.__name__} が fetch を実装していません")
+    if not provider_class.name:
+        raise TypeError(f"画像の取得元 {provider_class.__name__} の name が設定されていません")
+    _registry[provider_class.name] = provider_class
+    return provider_class
+
+
+@register_provider
+class BananaProvider(ImageProvider):
+    name = 'banana'
+    label = 'Banana Pro'
+    # 1枚あたりの料金の目安
+    default_cost = 1.0
+
+    def fetch(self, theme: str, title: str, cancel: threading.Event) -> Optional[ImageResult]:
+        return self.generator.generate_image_from_banana_pro(theme, title, cancel)
+
+
+@register_provider
+class UnsplashProvider(ImageProvider):
+    name = 'unsplash'
+    label = 'Unsplash'
+    # 無料
+    default_cost = 0.0
+
+    def fetch(self, theme: str, title: str, cancel: threading.Event) -> Optional[ImageResult]:
+        return self.generator.generate_image_from_unsplash(theme)
+
+
+@register_provider
+class DalleProvider(ImageProvider):
+    name = 'dalle'
+    label = 'DALL-E 3'
+    # Banana Pro の数倍
+    default_cost = 4.0
+
+    def fetch(self, theme: str, title: str, cancel: threading.Event) -> Optional[ImageResult]:
+        return self.generator.generate_image_from_dalle(theme, title)
+
+
+def provider_chain(image_source: str) -> List[str]:
+    """
+    画像ソースの設定に応じた取得元の名前（優先順）
+    IMAGE_PROVIDERS（例: banana,unsplash,dalle）が設定されていればその順番を使う
+    """
+    configured = os.getenv('IMAGE_PROVIDERS', '')
+    if configured.strip():
+        return [name.strip() for name in configured.split(',') if name.strip()]
+    if image_source in ('banana', 'nano'):
+        # Banana Proが失敗・遅延した場合はUnsplash
+        return ['banana', 'unsplash']
+    if image_source == 'unsplash':
+        # Unsplashが失敗・遅延した場合はDALL-E（DALLE_FALLBACK=true の場合のみ）
+        if os.getenv('DALLE_FALLBACK', 'false').lower() == 'true':
+            return ['unsplash', 'dalle']
+        return ['unsplash']
+    return [image_source]
+
+
+def create_providers(names: List[str], generator) -> List[ImageProvider]:
+    """
+    名前から取得元を作成（登録されていない名前は警告して除く）
+    """
+    providers = []
+    for name in names:
+        provider_class = _registry.get(name)
+        if provider_class is None:
+            print(f"⚠️ 不明な画像ソース: {name}")
+            continue
+        providers.append(provider_class(generator))
+    return providers
+
+
+class ProviderHealth:
+    def __init__(self, stats_file: Optional[str] = None, threshold: Optional[int] = None,
+                 cooldown: Optional[float] = None):
+        """
+        Args:
+            stats_file: 稼働状況の保存先（デフォルトは .cache/image_providers.json）
+            threshold: 連続で何回失敗したら使わなくするか（デフォルトは3回）
+            cooldown: 使わなくする時間（秒、デフォルトは30分）
+        """
+        self.stats_file = Path(stats_file or os.getenv('IMAGE_PROVIDER_STATS', '.cache/image_providers.json'))
+        self.threshold = threshold if threshold is not None else int(
+            os.getenv('IMAGE_BREAKER_THRESHOLD', str(DEFAULT_BREAKER_THRESHOLD)))
+        self.cooldown = cooldown if cooldown is not None else float(
+            os.getenv('IMAGE_BREAKER_COOLDOWN', str(DEFAULT_BREAKER_COOLDOWN)))
+        # 複数のワーカースレッド・ヘッジのスレッドから同時に記録されるため、更新と保存を排他する
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Dict] = {}
+        self._load()
+
+    def _load(self):
+        """
+        保存済みの稼働状況を読み込む
+        """
+        if not self.stats_file.exists():
+            return
+        try:
+            with open(self.stats_file, 'r', encoding='utf-8') as f:
+                self.stats = json.load(f)
+        except Exception as e:
+            print(f"⚠️ 画像の取得元の稼働状況の読み込みエラー: {e}")
+
+    def _save(self):
+        """
+        稼働状況を保存（ロックを取得した状態で呼ぶ）
+        """
+        try:
+            write_json_atomic(self.stats_file, self.stats, indent=2)
+        except Exception as e:
+            print(f"⚠️ 画像の取得元の稼働状況の保存エラー: {e}")
+
+    def _entry(self, name: str) -> Dict:
+        return self.stats.setdefault(name, {
+            'calls': 0,
+            'successes': 0,
+            'latency': None,
+            'error_rate': 0.0,
+            'consecutive_failures': 0,
+            'open_until': 0.0,
+        })
+
+    def allow(self, name: str) -> bool:
+        """
+        取得元を使ってよいか（失敗が続いて使わなくしている間はFalse）
+        使わなくする時間が過ぎたら1回だけ試し、成功すれば元に戻す
+        （同時に呼ばれても試すのは1回だけにするため、次の再開時刻を先に進めてから許可する）
+        """
+        with self._lock:
+            entry = self.stats.get(name)
+            if entry is None or not entry.get('open_until'):
+                return True
+            now = time.time()
+            if entry['open_until'] > now:
+                return False
+            entry['open_until'] = now + self.cooldown
+            self._save()
+            return True
+
+    def record(self, name: str, success: bool, latency: float):
+        """
+        取得の結果を記録
+
+        Args:
+            name: 取得元の名前
+            success: 画像を取得できたか
+            latency: 所要時間（秒）
+        """
+        with self._lock:
+            entry = self._entry(name)
+            entry['calls'] += 1
+            entry['error_rate'] += STATS_SMOOTHING * ((0.0 if success else 1.0) - entry['error_rate'])
+            if success:
+                entry['successes'] += 1
+                previous = entry['latency']
+                entry['latency'] = latency if previous is None else previous + STATS_SMOOTHING * (latency - previous)
+                entry['consecutive_failures'] = 0
+                entry['open_until'] = 0.0
+            else:
+                entry['consecutive_failures'] += 1
+                if entry['consecutive_failures'] >= self.threshold:
+                    entry['open_until'] = time.time() + self.cooldown
+                    print(f"⚠️ 画像の取得元 {name} の失敗が{entry['consecutive_failures']}回続いたため、"
+                          f"{self.cooldown / 60:.0f}分間使用しません")
+            self._save()
+
+    def hedge_delay(self, name: str, default: float) -> float:
+        """
+        次の取得元を並列に開始するまでの待ち時間
+        所要時間の実績があれば平均の2倍（最短2秒、default以下）にする
+        """
+        with self._lock:
+            entry = self.stats.get(name)
+            if not entry or entry.get('successes', 0) < MIN_LATENCY_SAMPLES or entry.get('latency') is None:
+                return default
+            return min(default, max(MIN_HEDGE_DELAY, entry['latency'] * HEDGE_LATENCY_FACTOR))
+
+    def track(self, provider: ImageProvider, theme: str, title: str,
+              slow_after: Optional[float] = None) -> Callable[[threading.Event], Optional[ImageResult]]:
+        """
+        取得の結果と所要時間を記録する関数（hedged の候補として渡す）
+        他の取得元の画像が使われてキャンセルされた場合は、slow_after 秒以上かかっていた場合のみ失敗として数える
+        （応答のない取得元が、毎回ヘッジの待ち時間だけ遅らせ続けることを防ぐ）
+
+        Args:
+            provider: 取得元
+            theme: 記事のテーマ
+            title: 記事のタイトル
+            slow_after: キャンセルされた場合に失敗として数える所要時間（秒）
+        """
+        def run(cancel: threading.Event) -> Optional[ImageResult]:
+            started = time.monotonic()
+            try:
+                result = provider.fetch(theme, title, cancel)
+            except Exception:
+                self.record(provider.name, False, time.monotonic() - started)
+                raise
+            elapsed = time.monotonic() - started
+            if result is not None or not cancel.is_set():
+                self.record(provider.name, result is not None, elapsed)
+            elif slow_after is not None and elapsed >= slow_after:
+                self.record(provider.name, False, elapsed)
+            return result
+        return run
@@ -0,0 +1,202 @@
+"""
+画像データの一時保存モジュール
+ダウンロードした画像をチャンクごとに SpooledTemporaryFile に書き込み、そのままWordPressへアップロードします
+- 一定のサイズまではメモリ上に保持し、超えた分だけ名前のない一時ファイルに移す（閉じると自動で削除される）
+- 知覚ハッシュの計算・アップロード・アップロードのリトライで同じデータを先頭から読み直す
+- 画像の形式はファイルの先頭のバイト列（マジックナンバー）で判定する（URLの拡張子やContent-Typeは誤っている場合がある）
+一時ファイルのパスを受け渡す必要がなくなり、削除し忘れた一時ファイルが残ることもありません
+"""
+
+import os
+import tempfile
+from typing import Optional
+
+# メモリ上に保持する最大サイズ（バイト、超えた分は一時ファイルに移す）
+DEFAULT_SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+# ダウンロードの読み込み単位（バイト）
+CHUNK_SIZE = 64 * 1024
+
+# Content-Type と拡張子の対応（WordPressはファイル名の拡張子でも画像の形式を判定する）
+_SUFFIXES = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/webp': '.webp',
+    'image/gif': '.gif',
+}
+_MIME_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.webp': 'image/webp',
+    '.gif': 'image/gif',
+}
+
+# ファイルの先頭のバイト列と形式（WebPは 'RIFF' + サイズ(4バイト) + 'WEBP'）
+_SIGNATURES = [
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+]
+
+
+def detect_mime_type(header: bytes) -> Optional[str]:
+    """
+    ファイルの先頭のバイト列から画像の形式を判定
+
+    Args:
+        header: ファイルの先頭（12バイト以上）
+
+    Returns:
+        MIMEタイプ、判定できない場合はNone
+    """
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'image/webp'
+    for signature, mime_type in _SIGNATURES:
+        if header.startswith(signature):
+            return mime_type
+    return None
+
+
+class ImageSpool:
+    def __init__(self, suffix: str = '.jpg', mime_type: Optional[str] = None,
+                 max_memory: Optional[int] = None):
+        """
+        Args:
+            suffix: アップロードするファイル名の拡張子
+            mime_type: 画像のMIMEタイプ（省略時は拡張子から判定）
+            max_memory: メモリ上に保持する最大サイズ（デフォルトは8MB）
+        """
+        if max_memory is None:
+            max_memory = int(os.getenv('IMAGE_SPOOL_MAX_MEMORY', str(DEFAULT_SPOOL_MAX_MEMORY)))
+        self.suffix = suffix.lower()
+        self.mime_type = mime_type or _MIME_TYPES.get(self.suffix, 'image/jpeg')
+        self.size = 0
+        # 知覚ハッシュ（ImageCache.image_hash で1回だけ計算する）
+        self.phash: Optional[int] = None
+        self.hashed = False
+        self._file = tempfile.SpooledTemporaryFile(max_size=max_memory)
+
+    @classmethod
+    def from_response(cls, response, suffix: str = '.jpg') -> 'ImageSpool':
+        """
+        stream=True で取得したレスポンスの本文をチャンクごとに書き込む
+
+        Args:
+            response: requests のレスポンス（stream=True）
+            suffix: Content-Type が画像でない場合に使う拡張子
+        """
+        content_type = response.headers.get('Content-Type', '').split(';', 1)[0].strip().lower()
+        if content_type in _SUFFIXES:
+            spool = cls(_SUFFIXES[content_type], content_type)
+        else:
+            spool = cls(suffix)
+        try:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                spool.write(chunk)
+        except Exception:
+            spool.close()
+            raise
+        spool.detect_format()
+        return spool
+
+    @classmethod
+    def from_bytes(cls, data: bytes, suffix: str = '.jpg') -> 'ImageSpool':
+        """
+        メモリ上の画像データ（Base64で受け取った生成画像など）から作成
+        """
+        spool = cls(suffix)
+        spool.write(data)
+        spool.detect_format()
+        return spool
+
+    def write(self, chunk: bytes):
+        if chunk:
+            self._file.write(chunk)
+            self.size += len(chunk)
+
+    def detect_format(self) -> Optional[str]:
+        """
+        書き込んだデータの先頭から画像の形式を判定し、MIMEタイプと拡張子を合わせる
+
+        Returns:
+            MIMEタイプ、判定できない場合はNone（指定されたものをそのまま使う）
+        """
+        mime_type = detect_mime_type(self.open().read(16))
+        if mime_type:
+            self.mime_type = mime_type
+            self.suffix = _SUFFIXES[mime_type]
+        return mime_type
+
+    def copy(self) -> 'ImageSpool':
+        """
+        同じ画像データの複製（1枚の画像を複数のサイトに並列にアップロードする場合など）
+        読み込み位置を共有しないため、複製ごとに別のスレッドで読み出せる
+        """
+        spool = ImageSpool(self.suffix, self.mime_type)
+        try:
+            source = self.open()
+            for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                spool.write(chunk)
+        except Exception:
+            spool.close()
+            raise
+        spool.phash, spool.hashed = self.phash, self.hashed
+        return spool
+
+    def open(self):
+        """
+        先頭に戻したファイルオブジェクト（Pillowで読み込む場合など）
+        """
+        self._file.seek(0)
+        return self._file
+
+    def body(self) -> '_UploadBody':
+        """
+        アップロードのリクエストボディ（先頭から読み出す）
+        """
+        self._file.seek(0)
+        return _UploadBody(self._file, self.size)
+
+    def file_name(self, stem: str) -> str:
+        """
+        アップロードするファイル名
+        """
+        return f"{stem}{self.suffix}"
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _UploadBody:
+    """
+    requests にリクエストボディとして渡すラッパー
+    長さを返すことで Content-Length 付きで送信させる（fileno() を呼ばれると
+    SpooledTemporaryFile がディスクに書き出されるため、read / seek / tell のみ公開する）
+    """
+
+    def __init__(self, file, size: int):
+        self._file = file
+        self._size = size
+
+    def __len__(self) -> int:
+        return self._size
+
+    def read(self, size: int = -1) -> bytes:
+        return self._file.read(size)
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return self._file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._file.tell()
@@ -0,0 +1,232 @@
+"""
+長時間かかる生成ジョブの完了待ちモジュール
+Banana Pro のように「ジョブを開始 → 完了したか問い合わせる」形式のAPIで使います
+- 問い合わせの間隔を指数的に延ばし（ジッター付き）、全体の期限を過ぎたら待つのをやめる
+- threading.Event でキャンセルでき、待機中でもすぐに終了する
+- 複数の候補を並列に実行し、最初に完了したものを使う（残りはキャンセルして結果を破棄する）
+- 候補を順番に開始し、一定時間内に結果がなければ次の候補も並列に開始する（ヘッジ、コストの上限付き）
+1秒ごとに問い合わせる場合に比べ、30秒待つ場合の問い合わせの回数は半分以下になります
+"""
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Optional, Callable, Iterator, List, Tuple, TypeVar
+
+T = TypeVar('T')
+
+# 最初の問い合わせまでの待ち時間（秒）と、問い合わせの間隔の上限（秒）
+DEFAULT_INITIAL_DELAY = 0.5
+DEFAULT_MAX_DELAY = 4.0
+# 問い合わせごとに間隔を何倍にするか
+DEFAULT_MULTIPLIER = 2.0
+# 完了を待つ全体の期限（秒）
+DEFAULT_DEADLINE = 30.0
+
+
+class PollPolicy:
+    def __init__(self, deadline: Optional[float] = None, initial_delay: Optional[float] = None,
+                 max_delay: Optional[float] = None, multiplier: Optional[float] = None):
+        """
+        Args:
+            deadline: 完了を待つ全体の期限（秒、デフォルトは30秒）
+            initial_delay: 最初の問い合わせまでの待ち時間（秒）
+            max_delay: 問い合わせの間隔の上限（秒）
+            multiplier: 問い合わせごとに間隔を何倍にするか
+        """
+        self.deadline = deadline if deadline is not None else float(
+            os.getenv('JOB_POLL_DEADLINE', str(DEFAULT_DEADLINE)))
+        self.initial_delay = initial_delay if initial_delay is not None else float(
+            os.getenv('JOB_POLL_INITIAL_DELAY', str(DEFAULT_INITIAL_DELAY)))
+        self.max_delay = max_delay if max_delay is not None else float(
+            os.getenv('JOB_POLL_MAX_DELAY', str(DEFAULT_MAX_DELAY)))
+        self.multiplier = multiplier if multiplier is not None else float(
+            os.getenv('JOB_POLL_MULTIPLIER', str(DEFAULT_MULTIPLIER)))
+
+    def delays(self) -> Iterator[float]:
+        """
+        問い合わせの前の待ち時間（指数的に延ばし、上限で頭打ち）
+        複数のジョブの問い合わせが同じ時刻に重ならないよう、半分〜全体の範囲でばらつかせる
+        """
+        delay = self.initial_delay
+        while True:
+            yield random.uniform(delay / 2, delay)
+            delay = min(self.max_delay, delay * self.multiplier)
+
+
+def poll_job(check: Callable[[], Optional[T]], policy: Optional[PollPolicy] = None,
+             cancel: Optional[threading.Event] = None) -> Optional[T]:
+    """
+    ジョブが完了するまで問い合わせを繰り返す
+
+    Args:
+        check: 完了していれば結果、処理中ならNoneを返す関数（例外はそのまま呼び出し元に伝わる）
+        policy: 問い合わせの間隔と期限（省略時は環境変数の設定）
+        cancel: セットされたら待つのをやめるイベント
+
+    Returns:
+        ジョブの結果、期限切れまたはキャンセルの場合はNone
+    """
+    policy = policy or PollPolicy()
+    cancel = cancel or threading.Event()
+    deadline = time.monotonic() + policy.deadline
+    for delay in policy.delays():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        # 待機中にキャンセルされた場合はすぐに終了する
+        if cancel.wait(min(delay, remaining)):
+            return None
+        result = check()
+        if result is not None:
+            return result
+    return None
+
+
+def first_completed(jobs: List[Callable[[threading.Event], Optional[T]]],
+                    timeout: Optional[float] = None,
+                    discard: Optional[Callable[[T], None]] = None,
+                    cancel: Optional['CancelToken'] = None) -> Optional[T]:
+    """
+    複数の候補を並列に実行し、最初に結果を返したものを使う
+
+    Args:
+        jobs: キャンセル用のイベントを受け取り、結果（失敗時はNone）を返す関数のリスト
+        timeout: 全体の期限（秒、省略時は各候補の期限に任せる）
+        discard: 使わなかった候補の結果の後始末（一時データを閉じるなど）
+        cancel: 呼び出し元のキャンセル（セットされたらすべての候補をキャンセルする）
+
+    Returns:
+        最初に完了した候補の結果、すべて失敗した場合はNone
+    """
+    candidates = [(f"候補{i + 1}", job, 0.0) for i, job in enumerate(jobs)]
+    return hedged(candidates, hedge_delay=0, timeout=timeout, discard=discard, cancel=cancel)
+
+
+def hedged(candidates: List[Tuple[str, Callable[[threading.Event], Optional[T]], float]],
+           hedge_delay: float, budget: Optional[float] = None, timeout: Optional[float] = None,
+           discard: Optional[Callable[[T], None]] = None,
+           cancel: Optional['CancelToken'] = None) -> Optional[T]:
+    """
+    候補を順番に開始し、最初に結果を返したものを使う（ヘッジ）
+    - 実行中の候補が hedge_delay 秒以内に結果を返さなければ、次の候補を並列に開始する
+    - 実行中の候補がすべて失敗した場合は、待たずに次の候補を開始する
+    - 並列に開始する候補のコストの合計は budget までに抑える（超える候補は先の候補が失敗した場合のみ開始する）
+
+    Args:
+        candidates: (名前, キャンセル用のイベントを受け取り結果（失敗時はNone）を返す関数, コスト) のリスト（優先順）
+        hedge_delay: 次の候補を並列に開始するまでの待ち時間（秒、0ならすべて同時に開始）
+        budget: 並列に実行する候補のコストの合計の上限（Noneなら制限なし）
+        timeout: 全体の期限（秒、省略時は各候補の期限に任せる）
+        discard: 使わなかった候補の結果の後始末（一時データを閉じるなど）
+        cancel: 呼び出し元のキャンセル（セットされたらすべての候補をキャンセルする）
+
+    Returns:
+        最初に完了した候補の結果、すべて失敗した場合や期限切れの場合はNone
+    """
+    # 候補が1つの場合も、期限と例外の扱いを揃えるためワーカースレッドで実行する
+    token = cancel.child() if cancel is not None else CancelToken()
+    executor = ThreadPoolExecutor(max_workers=len(candidates))
+    futures = {}
+    pending = set()
+    next_index = 0
+    spent = 0.0
+    last_start = 0.0
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    winner = None
+
+    def start_next():
+        nonlocal next_index, spent, last_start
+        name, job, cost = candidates[next_index]
+        next_index += 1
+        spent += cost
+        last_start = time.monotonic()
+        future = executor.submit(job, token)
+        futures[future] = name
+        pending.add(future)
+
+    try:
+        start_next()
+        while True:
+            if not pending:
+                if next_index >= len(candidates) or token.is_set():
+                    break
+                # 実行中の候補がすべて失敗したため、次の候補に切り替える
+                start_next()
+                continue
+
+            can_hedge = next_index < len(candidates) and (
+                budget is None or spent + candidates[next_index][2] <= budget)
+            wait_time = max(0.0, last_start + hedge_delay - time.monotonic()) if can_hedge else None
+            if deadline is not None:
+                remaining = max(0.0, deadline - time.monotonic())
+                wait_time = remaining if wait_time is None else min(wait_time, remaining)
+
+            done, _ = wait(pending, timeout=wait_time, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.discard(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"⚠️ {futures[future]}の実行エラー: {e}")
+                    continue
+                if result is not None and winner is None:
+                    winner = future
+            if winner is not None:
+                if len(futures) > 1:
+                    print(f"✓ {futures[winner]}の結果を使用します")
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                print(f"⚠️ {timeout:g}秒以内に完了した候補がありませんでした")
+                break
+            if not done and can_hedge and hedge_delay > 0:
+                print(f"⚠️ {hedge_delay:g}秒以内に結果がないため、{candidates[next_index][0]}も並列に開始します")
+            if not done and can_hedge:
+                start_next()
+    finally:
+        # 残りの候補は待機を打ち切り、遅れて返ってきた結果は破棄する
+        token.set()
+        for future in futures:
+            if future is not winner and discard is not None:
+                future.add_done_callback(lambda f: _discard_result(f, discard))
+        executor.shutdown(wait=False)
+    return winner.result() if winner is not None else None
+
+
+def _discard_result(future, discard: Callable):
+    """
+    使わなかった候補の結果を破棄
+    """
+    if future.cancelled() or future.exception() is not None:
+        return
+    result = future.result()
+    if result is not None:
+        discard(result)
+
+
+class CancelToken(threading.Event):
+    """
+    キャンセル用のイベント（親のイベントがセットされると、child() で作成したイベントもセットされる）
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._children: List['CancelToken'] = []
+        self._children_lock = threading.Lock()
+
+    def child(self) -> 'CancelToken':
+        token = CancelToken()
+        with self._children_lock:
+            self._children.append(token)
+        if self.is_set():
+            token.set()
+        return token
+
+    def set(self):
+        super().set()
+        with self._children_lock:
+            children = list(self._children)
+        for token in children:
+            token.set()
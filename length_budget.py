@@ -0,0 +1,123 @@
+"""
+記事の文字数の予算管理モジュール
+過去の生成結果から「1トークンあたりの文字数（HTMLタグを除いた本文）」を測定して保存し、
+目標の文字数（4000〜5000字）に必要な max_tokens を呼び出しごとに決めます
+1回目の生成で目標の範囲に入れば「続き」の生成を省きます（上限を超えた分の切り詰めは html_normalizer で行います）
+"""
+
+import os
+import json
+import math
+import threading
+from pathlib import Path
+from typing import Optional
+from html_normalizer import plain_text_length
+from file_store import write_json_atomic
+
+# 記事の目標文字数（HTMLタグを除いた本文）
+TARGET_MIN_CHARS = 4000
+TARGET_CHARS = 4500
+TARGET_MAX_CHARS = 5000
+
+# 測定結果がない場合の1トークンあたりの文字数（gpt-4o-miniの日本語 + HTMLタグの実測値程度）
+DEFAULT_CHARS_PER_TOKEN = 1.0
+# 測定値の更新の重み（指数移動平均）
+RATIO_SMOOTHING = 0.2
+# 測定に使う最小のトークン数（打ち切った応答や短い応答は誤差が大きいため使わない）
+MIN_SAMPLE_TOKENS = 200
+# max_tokens の余裕（ばらつきで目標に届かないことを防ぐ）
+TOKEN_MARGIN = 1.05
+# gpt-4o-mini の出力トークン数の上限
+MAX_OUTPUT_TOKENS = 16000
+
+class LengthBudget:
+    def __init__(self, stats_file: Optional[str] = None,
+                 min_chars: int = TARGET_MIN_CHARS, target_chars: int = TARGET_CHARS,
+                 max_chars: int = TARGET_MAX_CHARS):
+        """
+        Args:
+            stats_file: 測定結果の保存先（デフォルトは .cache/length_budget.json）
+            min_chars: 目標の最小文字数（これ未満なら続きを生成）
+            target_chars: 続きを生成する場合の目標文字数
+            max_chars: 上限の文字数（超えた分は切り詰める）
+        """
+        self.stats_file = Path(stats_file or os.getenv('LENGTH_BUDGET_FILE', '.cache/length_budget.json'))
+        self.min_chars = min_chars
+        self.target_chars = target_chars
+        self.max_chars = max_chars
+        # 複数のワーカースレッドから同時に記録されるため、更新と保存を排他する
+        self._lock = threading.Lock()
+        self.chars_per_token = DEFAULT_CHARS_PER_TOKEN
+        self.samples = 0
+        self._load()
+
+    def _load(self):
+        """
+        保存済みの測定結果を読み込む
+        """
+        if not self.stats_file.exists():
+            return
+        try:
+            with open(self.stats_file, 'r', encoding='utf-8') as f:
+                stats = json.load(f)
+            self.chars_per_token = float(stats.get('chars_per_token', DEFAULT_CHARS_PER_TOKEN))
+            self.samples = int(stats.get('samples', 0))
+        except Exception as e:
+            print(f"⚠️ 文字数の測定結果の読み込みエラー: {e}")
+
+    def max_tokens_for(self, chars: int, overhead: int = 0) -> int:
+        """
+        指定した文字数を生成するための max_tokens
+
+        Args:
+            chars: 生成する文字数（HTMLタグを除く）
+            overhead: タイトル行など、本文以外に必要なトークン数
+        """
+        tokens = math.ceil(chars / self.chars_per_token * TOKEN_MARGIN) + overhead
+        return max(1, min(MAX_OUTPUT_TOKENS, tokens))
+
+    def draft_max_tokens(self) -> int:
+        """
+        1回目の生成（記事全体）の max_tokens（上限の文字数で止まるように設定）
+        """
+        return self.max_tokens_for(self.max_chars, overhead=50)
+
+    def continuation_chars(self, plain_length: int) -> Optional[int]:
+        """
+        続きとして生成する文字数
+
+        Args:
+            plain_length: 生成済みの本文の文字数
+
+        Returns:
+            続きの文字数、目標の範囲に入っている場合はNone（続きは不要）
+        """
+        if plain_length >= self.min_chars:
+            return None
+        return self.target_chars - plain_length
+
+    def record(self, content: str, completion_tokens: Optional[int]):
+        """
+        生成結果から1トークンあたりの文字数を測定して保存
+
+        Args:
+            content: 生成された本文（HTML）
+            completion_tokens: 応答のトークン数（usage.completion_tokens）
+        """
+        if not completion_tokens or completion_tokens < MIN_SAMPLE_TOKENS:
+            return
+        ratio = plain_text_length(content) / completion_tokens
+        if ratio <= 0:
+            return
+
+        with self._lock:
+            if self.samples == 0:
+                self.chars_per_token = ratio
+            else:
+                self.chars_per_token += RATIO_SMOOTHING * (ratio - self.chars_per_token)
+            self.samples += 1
+            stats = {'chars_per_token': round(self.chars_per_token, 4), 'samples': self.samples}
+            try:
+                write_json_atomic(self.stats_file, stats)
+            except Exception as e:
+                print(f"⚠️ 文字数の測定結果の保存エラー: {e}")
@@ -0,0 +1,137 @@
+"""
+OpenAIの応答キャッシュモジュール
+モデル・メッセージ・パラメータのハッシュをキーに、チャット補完の応答をキャッシュディレクトリに保存します
+同じプロンプトの再実行（CIの再実行や動作確認）ではAPIを呼ばずに保存済みの応答を返します
+TTLと合計サイズの上限を設け、使われていないもの（更新時刻が古いもの）から削除します
+
+キャッシュを使うかどうかは呼び出し箇所ごとに指定します
+- 'always': キーワード抽出など、同じ入力なら同じ結果でよい呼び出し（LLM_CACHE=off 以外で使用）
+- 'optional': ニュース検索・記事生成など、通常は毎回生成したい呼び出し（LLM_CACHE=all の場合のみ使用）
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from typing import Optional, Dict, List
+from file_store import write_json_atomic, evict_files
+
+# 呼び出し箇所ごとのキャッシュの方針
+ALWAYS = 'always'
+OPTIONAL = 'optional'
+
+
+def cache_key(model: str, messages: List[Dict], params: Dict) -> str:
+    """
+    リクエスト内容からキャッシュのキーを作成
+
+    Args:
+        model: モデル名
+        messages: チャットのメッセージ
+        params: temperature, max_tokens などのパラメータ
+
+    Returns:
+        SHA-256のハッシュ（16進数）
+    """
+    payload = json.dumps({'model': model, 'messages': messages, 'params': params},
+                         ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, cache_dir: Optional[str] = None, ttl_seconds: Optional[float] = None,
+                 max_bytes: Optional[int] = None, mode: Optional[str] = None):
+        """
+        Args:
+            cache_dir: キャッシュの保存先（デフォルトは .cache/llm）
+            ttl_seconds: キャッシュの有効期間（秒、デフォルトは7日）
+            max_bytes: キャッシュ全体の最大サイズ（バイト、デフォルトは20MB）
+            mode: 'on'（'always' の呼び出しのみ）, 'all'（すべて）, 'off'（使わない）
+        """
+        self.cache_dir = Path(cache_dir or os.getenv('LLM_CACHE_DIR', '.cache/llm'))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(
+            os.getenv('LLM_CACHE_TTL', str(7 * 24 * 3600)))
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            os.getenv('LLM_CACHE_MAX_BYTES', str(20 * 1024 * 1024)))
+        self.mode = (mode or os.getenv('LLM_CACHE', 'on')).lower()
+        # 複数のワーカースレッドから同時に呼ばれるため、削除処理を排他する
+        self._lock = threading.Lock()
+
+    def enabled_for(self, policy: Optional[str]) -> bool:
+        """
+        呼び出し箇所の方針に対してキャッシュを使うかどうか
+
+        Args:
+            policy: ALWAYS / OPTIONAL / None（キャッシュしない）
+        """
+        if policy == ALWAYS:
+            return self.mode != 'off'
+        if policy == OPTIONAL:
+            return self.mode == 'all'
+        return False
+
+    def _path_for(self, key: str) -> Path:
+        """
+        キーに対応するキャッシュファイルのパス
+        """
+        return self.cache_dir / f"{key[:32]}.json"
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        保存済みの応答を取得（期限切れの場合は削除してNone）
+
+        Args:
+            key: cache_key() で作成したキー
+
+        Returns:
+            応答の本文、なければNone
+        """
+        path = self._path_for(key)
+        if not path.exists():
+            return None
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except Exception as e:
+            print(f"⚠️ 応答キャッシュの読み込みエラー: {e}")
+            return None
+
+        if entry.get('key') != key or time.time() - entry.get('stored_at', 0) > self.ttl_seconds:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            return None
+
+        # 使われたキャッシュは削除の対象になりにくくする（更新時刻の古い順に削除するため）
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry.get('content')
+
+    def put(self, key: str, content: str):
+        """
+        応答を保存
+
+        Args:
+            key: cache_key() で作成したキー
+            content: 応答の本文
+        """
+        entry = {'key': key, 'content': content, 'stored_at': time.time()}
+        try:
+            write_json_atomic(self._path_for(key), entry)
+        except Exception as e:
+            print(f"⚠️ 応答キャッシュの保存エラー: {e}")
+            return
+        self._evict()
+
+    def _evict(self):
+        """
+        期限切れのものと、合計サイズが上限を超えた分を使われていない（更新時刻が古い）ものから削除
+        """
+        with self._lock:
+            evict_files(self.cache_dir, self.max_bytes, self.ttl_seconds)
@@ -12,11 +12,37 @@ def main():
     メイン関数
     引数なし: 即座に投稿
     --scheduler: スケジューラーとして実行
+    --batch N: N件の記事を並列に生成して投稿
+    --async: 非同期パイプラインで即座に投稿（画像の準備と本文の生成を並行）
+    --sites [名前,...]: サイトの一覧（sites.json）のサイトに並列に投稿（省略時はすべてのサイト）
     """
     if len(sys.argv) > 1 and sys.argv[1] == '--scheduler':
         # スケジューラーとして実行
         from scheduler import run_scheduler
         run_scheduler()
+    elif len(sys.argv) > 1 and sys.argv[1] == '--batch':
+        # バッチ投稿（件数の指定がなければ3件）
+        from batch_poster import run_batch
+        count_text = sys.argv[2] if len(sys.argv) > 2 else '3'
+        count = int(count_text) if count_text.isdecimal() else 0
+        if count < 1:
+            print(f"⚠️ 件数は1以上の整数で指定してください: {count_text}")
+            print("使い方: python main.py --batch [件数]（省略時は3件）")
+            sys.exit(1)
+        results = run_batch(count)
+        if any(r['error'] for r in results):
+            sys.exit(1)
+    elif len(sys.argv) > 1 and sys.argv[1] == '--async':
+        # 非同期パイプラインで即座に投稿
+        from async_pipeline import post_article_async
+        post_article_async()
+    elif len(sys.argv) > 1 and sys.argv[1] == '--sites':
+        # 複数サイトに並列に投稿（1サイトでも失敗した場合は終了コード1）
+        from multi_site_poster import run_multi_site
+        site_names = [name.strip() for name in sys.argv[2].split(',') if name.strip()] if len(sys.argv) > 2 else None
+        results = run_multi_site(site_names)
+        if any(r['error'] for r in results):
+            sys.exit(1)
     else:
         # 即座に投稿
         poster = WordPressPoster()
@@ -0,0 +1,314 @@
+"""
+複数サイトへの投稿モジュール
+サイトの一覧（sites.json）を読み込み、複数のWordPressサイトに並列に投稿します
+- 1つの記事をすべてのサイトに投稿する（"article": "shared"）か、サイトごとに別の記事を生成する（"article": "own"）
+- サイトごとにHTTPセッション（コネクションプール）・同時リクエスト数・リクエストの間隔・認証情報を分ける
+- 1つのサイトの失敗（WAFによる403など）や応答の遅れで、他のサイトへの投稿を止めない
+  （共有の limiter('wordpress') やコネクションプールの空きを、応答の遅いサイトが占有しない）
+"""
+
+import os
+import re
+import json
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Dict, List
+from article_generator import ArticleGenerator
+from batch_poster import NewsClaims
+from concurrency import RequestLimiter
+from http_client import create_session
+from wordpress_poster import WordPressPoster, FeaturedImageUploader
+
+# サイトごとの同時リクエスト数のデフォルト
+DEFAULT_SITE_CONCURRENCY = 2
+# 同時に投稿するサイト数のデフォルトの上限
+DEFAULT_MAX_WORKERS = 8
+# 記事の割り当て方
+ARTICLE_MODES = ('shared', 'own')
+
+
+def _env_suffix(name: str) -> str:
+    """
+    サイト名を環境変数名の末尾に使える形に変換（例: tech-blog → TECH_BLOG）
+    """
+    return re.sub(r'[^0-9A-Za-z]+', '_', name).strip('_').upper()
+
+
+def _failed(site_name: str, error: str) -> Dict:
+    """
+    投稿に失敗したサイトの結果
+    """
+    return {'site': site_name, 'post_id': None, 'link': None, 'error': error}
+
+
+class SiteConfig:
+    def __init__(self, name: str, url: str, username: Optional[str] = None, password: Optional[str] = None,
+                 article: str = 'shared', concurrency: int = DEFAULT_SITE_CONCURRENCY,
+                 min_interval: float = 0.0, schedule: Optional[str] = None, enabled: bool = True):
+        """
+        Args:
+            name: サイト名（ログ・スケジュールの実行状況の保存に使う）
+            url: サイトのURL
+            username: ユーザー名
+            password: アプリケーションパスワード
+            article: 'shared': 共通の記事を投稿 / 'own': このサイト用に別の記事を生成
+            concurrency: このサイトへの同時リクエスト数
+            min_interval: このサイトへのリクエストの最短の間隔（秒、WAFのレート制限への対策）
+            schedule: このサイトだけの投稿スケジュール（cron形式、省略時はスケジューラー共通のスケジュール）
+            enabled: 投稿するかどうか
+        """
+        if article not in ARTICLE_MODES:
+            raise ValueError(f"サイト {name} の article は shared / own のいずれかを指定してください: {article}")
+        self.name = name
+        self.url = url
+        self.username = username
+        self.password = password
+        self.article = article
+        self.concurrency = concurrency
+        self.min_interval = min_interval
+        self.schedule = schedule
+        self.enabled = enabled
+
+    @classmethod
+    def from_dict(cls, entry: Dict, defaults: Dict) -> 'SiteConfig':
+        """
+        設定ファイルの1サイト分から作成
+        認証情報は username / password、または環境変数名（username_env / password_env）で指定する
+        どちらもない場合は WORDPRESS_USERNAME_<サイト名> / WORDPRESS_PASSWORD_<サイト名> を使う
+        """
+        values = dict(defaults)
+        values.update(entry)
+        name = values.get('name')
+        url = values.get('url')
+        if not name or not url:
+            raise ValueError(f"サイトには name と url を指定してください: {entry}")
+
+        suffix = _env_suffix(name)
+        username = values.get('username') or os.getenv(
+            values.get('username_env') or f"WORDPRESS_USERNAME_{suffix}")
+        password = values.get('password') or os.getenv(
+            values.get('password_env') or f"WORDPRESS_PASSWORD_{suffix}")
+        return cls(
+            name=name,
+            url=url,
+            username=username,
+            password=password,
+            article=values.get('article', 'shared'),
+            concurrency=int(values.get('concurrency', DEFAULT_SITE_CONCURRENCY)),
+            min_interval=float(values.get('min_interval', 0.0)),
+            schedule=values.get('schedule'),
+            enabled=bool(values.get('enabled', True)),
+        )
+
+
+def load_sites(sites_file: Optional[str] = None) -> List[SiteConfig]:
+    """
+    サイトの一覧を読み込む（ファイルがない場合は空のリスト）
+
+    Args:
+        sites_file: 設定ファイルのパス（省略時は環境変数WORDPRESS_SITES_FILE、デフォルトは sites.json）
+
+    Returns:
+        投稿するサイトのリスト（enabled が false のサイトは除く）
+    """
+    path = Path(sites_file or os.getenv('WORDPRESS_SITES_FILE', 'sites.json'))
+    if not path.exists():
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+
+    defaults = config.get('defaults', {})
+    sites = [SiteConfig.from_dict(entry, defaults) for entry in config.get('sites', [])]
+    names = [site.name for site in sites]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"サイト名が重複しています: {', '.join(duplicates)}")
+    return [site for site in sites if site.enabled]
+
+
+class MultiSitePoster:
+    """
+    複数のサイトに並列に投稿する
+    サイトごとの WordPressPoster と ArticleGenerator は初回の投稿時に作成し、以降の投稿で使い回す
+    """
+
+    def __init__(self, sites: List[SiteConfig], image_source: Optional[str] = None,
+                 max_workers: Optional[int] = None):
+        """
+        Args:
+            sites: 投稿するサイト
+            image_source: 画像生成のソース（省略時は環境変数IMAGE_SOURCE）
+            max_workers: 同時に投稿するサイト数（省略時は環境変数MULTI_SITE_WORKERS、デフォルトは最大8）
+        """
+        self.sites = {site.name: site for site in sites}
+        self.image_source = image_source or os.getenv('IMAGE_SOURCE', 'unsplash')
+        if max_workers is None:
+            max_workers = int(os.getenv('MULTI_SITE_WORKERS', str(min(len(sites), DEFAULT_MAX_WORKERS))))
+        self.max_workers = max(1, max_workers)
+        self._generator = None
+        self._posters: Dict[str, WordPressPoster] = {}
+
+    @property
+    def generator(self) -> ArticleGenerator:
+        if self._generator is None:
+            self._generator = ArticleGenerator(image_source=self.image_source)
+        return self._generator
+
+    def _poster(self, site: SiteConfig) -> WordPressPoster:
+        """
+        サイトの WordPressPoster（専用のHTTPセッションとリクエストの制限を持つ）
+        """
+        poster = self._posters.get(site.name)
+        if poster is None:
+            poster = WordPressPoster(
+                base_url=site.url,
+                username=site.username,
+                password=site.password,
+                http=create_session(pool_maxsize=site.concurrency),
+                request_limiter=RequestLimiter(site.concurrency, site.min_interval),
+            )
+            self._posters[site.name] = poster
+        return poster
+
+    def _publish_shared(self, site: SiteConfig, poster: WordPressPoster, article_data: Dict) -> Dict:
+        """
+        共通の記事をサイトに投稿（article_data の画像はこのサイト用の複製）
+        """
+        return poster.publish_article(article_data)
+
+    def _publish_own(self, site: SiteConfig, poster: WordPressPoster, news_item: Optional[str]) -> Dict:
+        """
+        サイト用の記事を生成して投稿（画像は本文の生成中にこのサイトへアップロードしておく）
+        """
+        uploader = FeaturedImageUploader(poster)
+        try:
+            article_data = self.generator.generate_article(
+                generate_image=True,
+                latest_news=news_item,
+                fetch_news=False,
+                image_handler=uploader.upload
+            )
+            return poster.publish_article(article_data)
+        except Exception:
+            uploader.discard()
+            raise
+
+    def _run_site(self, site: SiteConfig, task, *args) -> Dict:
+        """
+        1サイト分の投稿（エラーは結果として返し、他のサイトの投稿を止めない）
+        """
+        try:
+            result = task(site, self._poster(site), *args)
+            print(f"[{site.name}] ✓ 投稿成功: {result.get('link', 'N/A')}")
+            return {'site': site.name, 'post_id': result.get('id'), 'link': result.get('link'), 'error': None}
+        except Exception as e:
+            print(f"[{site.name}] ⚠️ 投稿失敗: {e}")
+            return _failed(site.name, str(e))
+
+    def post(self, site_names: Optional[List[str]] = None) -> List[Dict]:
+        """
+        サイトに並列に投稿
+
+        Args:
+            site_names: 投稿するサイト名（省略時はすべてのサイト）
+
+        Returns:
+            サイトごとの結果のリスト（{'site', 'post_id', 'link', 'error'}）
+        """
+        sites = [self.sites[name] for name in (site_names or list(self.sites))]
+        if not sites:
+            return []
+        shared_sites = [site for site in sites if site.article == 'shared']
+        own_sites = [site for site in sites if site.article == 'own']
+
+        print(f"\n{'='*60}")
+        print(f"🚀 複数サイトへの投稿開始: {len(sites)}サイト"
+              f"（共通の記事 {len(shared_sites)}サイト / 個別の記事 {len(own_sites)}サイト）")
+        print(f"📅 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        print(f"{'='*60}\n")
+
+        # WordPressPoster の作成（設定の表示）はスレッドで行うとログが混ざるため、先にまとめて行う
+        # 認証情報の不足などで設定に失敗したサイトは、このサイトだけの失敗として除く
+        failures = {}
+        for site in sites:
+            try:
+                self._poster(site)
+            except Exception as e:
+                print(f"[{site.name}] ⚠️ サイトの設定エラー: {e}")
+                failures[site.name] = _failed(site.name, str(e))
+        shared_sites = [site for site in shared_sites if site.name not in failures]
+        own_sites = [site for site in own_sites if site.name not in failures]
+
+        claims = None
+        if own_sites:
+            # サイトごとの記事が同じ話題にならないよう、ニュースは1回だけ取得して割り当てる
+            generator = self.generator
+            claims = NewsClaims(generator._select_news_candidates(generator._get_latest_ai_news()))
+
+        futures = {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(sites))) as executor:
+            for site in own_sites:
+                futures[site.name] = executor.submit(self._run_site, site, self._publish_own, claims.claim())
+
+            if shared_sites:
+                # 共通の記事はサイトごとの記事の生成と並行して1回だけ生成する
+                try:
+                    if claims is not None:
+                        article_data = self.generator.generate_article(
+                            generate_image=True, latest_news=claims.claim(), fetch_news=False)
+                    else:
+                        article_data = self.generator.generate_article(generate_image=True)
+                except Exception as e:
+                    print(f"⚠️ 共通の記事の生成エラー: {e}")
+                    article_data = None
+                    for site in shared_sites:
+                        failures[site.name] = _failed(site.name, f"共通の記事の生成に失敗: {e}")
+
+                if article_data is not None:
+                    image = article_data.get('image')
+                    try:
+                        for site in shared_sites:
+                            # 画像は読み込み位置を共有しないよう、サイトごとに複製して渡す（投稿後に閉じられる）
+                            site_data = dict(article_data)
+                            if image:
+                                try:
+                                    site_data['image'] = image.copy()
+                                except Exception as e:
+                                    failures[site.name] = _failed(site.name, f"画像の複製に失敗: {e}")
+                                    continue
+                            futures[site.name] = executor.submit(
+                                self._run_site, site, self._publish_shared, site_data)
+                    finally:
+                        if image:
+                            image.close()
+
+        results = [failures.get(site.name) or futures[site.name].result() for site in sites]
+        succeeded = [r for r in results if not r['error']]
+        print(f"\n{'='*60}")
+        print(f"✅ 複数サイトへの投稿完了: 成功 {len(succeeded)}サイト / 失敗 {len(results) - len(succeeded)}サイト")
+        for r in results:
+            status = f"✓ {r['link']}" if not r['error'] else f"✗ {r['error']}"
+            print(f"  [{r['site']}] {status}")
+        print(f"{'='*60}\n")
+        return results
+
+
+def run_multi_site(site_names: Optional[List[str]] = None, image_source: Optional[str] = None) -> List[Dict]:
+    """
+    サイトの一覧（sites.json）のサイトに並列に投稿
+
+    Args:
+        site_names: 投稿するサイト名（省略時はすべてのサイト）
+        image_source: 画像生成のソース（省略時は環境変数IMAGE_SOURCE）
+
+    Returns:
+        サイトごとの結果のリスト
+    """
+    sites = load_sites()
+    if not sites:
+        raise ValueError(f"投稿するサイトがありません（{os.getenv('WORDPRESS_SITES_FILE', 'sites.json')} を確認してください）")
+    unknown = [name for name in site_names or [] if name not in {site.name for site in sites}]
+    if unknown:
+        raise ValueError(f"サイトの一覧にないサイト名: {', '.join(unknown)}")
+    return MultiSitePoster(sites, image_source=image_source).post(site_names)
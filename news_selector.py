@@ -0,0 +1,101 @@
+"""
+記事の元にするニュースの選択モジュール
+取得したニュースを1件ずつの記録に分解し、投稿履歴と照合して未使用のものを新しさの順に並べます
+記事の生成前に投稿済みのニュースを除くことで、生成後の重複チェックで破棄される記事（とリトライ）を減らします
+"""
+
+import re
+from typing import Optional, List, Dict
+from duplicate_index import DuplicateIndex, jaccard, containment, MIN_THEME_LENGTH
+
+# 投稿済みとみなす類似度（ニュースと過去の記事のテーマ）
+NEWS_REUSE_THRESHOLD = 0.6
+# 履歴に保存されるテーマの文字数（記事生成時の latest_news[:100] と合わせる）
+THEME_LENGTH = 100
+
+# 「- [ソース] タイトル: 説明 (URL)」または「- タイトル: 説明」形式の行
+_NEWS_LINE_RE = re.compile(r'^-\s*(?:\[(?P<source>[^\]]+)\]\s*)?(?P<body>.+)$')
+_LINK_RE = re.compile(r'\s*\((?P<link>https?://[^\s)]+)\)\s*$')
+_TITLE_SEPARATOR_RE = re.compile(r'[:：]\s*')
+
+
+def parse_news_items(latest_news: Optional[str]) -> List[Dict]:
+    """
+    ニュースの要約テキストを1件ずつの記録に分解
+
+    Args:
+        latest_news: 「- [ソース] タイトル: 説明 (URL)」形式の行を含むテキスト
+
+    Returns:
+        ニュースごとの辞書のリスト（{'source', 'title', 'description', 'link', 'text'}、textは元の行）
+    """
+    if not latest_news:
+        return []
+
+    items = []
+    for line in latest_news.split('\n'):
+        line = line.strip()
+        match = _NEWS_LINE_RE.match(line)
+        if not match:
+            continue
+
+        body = match.group('body').strip()
+        link_match = _LINK_RE.search(body)
+        link = link_match.group('link') if link_match else ''
+        if link_match:
+            body = body[:link_match.start()]
+
+        parts = _TITLE_SEPARATOR_RE.split(body, maxsplit=1)
+        items.append({
+            'source': match.group('source') or '',
+            'title': parts[0].strip(),
+            'description': parts[1].strip() if len(parts) > 1 else '',
+            'link': link,
+            'text': line,
+        })
+    return items
+
+
+def news_source_url(latest_news: Optional[str]) -> str:
+    """
+    1件のニュースからURLを取り出す（投稿履歴に記録する元ニュースのURL）
+
+    Returns:
+        URL、1件のニュースでない場合やURLがない場合は空文字
+    """
+    items = parse_news_items(latest_news)
+    return items[0]['link'] if len(items) == 1 else ''
+
+
+def rank_news_items(items: List[Dict], index: DuplicateIndex,
+                    reuse_threshold: float = NEWS_REUSE_THRESHOLD) -> List[Dict]:
+    """
+    投稿済みのニュースを除き、履歴と似ていない順に並べる
+
+    各ニュースに 'score'（1.0 - 履歴との最大類似度）を追加する
+    類似度は「ニュースの冒頭と過去のテーマ」「ニュースのタイトルが過去のテーマに含まれる割合」の大きい方
+    （短いタイトルは無関係なテーマにも含まれやすいため、タイトルの比較は一定の長さ以上の場合のみ）
+
+    Args:
+        items: parse_news_items の結果
+        index: 投稿履歴の重複チェック用インデックス
+        reuse_threshold: 投稿済みとみなす類似度
+
+    Returns:
+        未使用のニュースのリスト（スコアの高い順、同点なら元の順序）
+    """
+    ranked = []
+    for item in items:
+        similarity = max(
+            index.max_similarity(item['text'][:THEME_LENGTH], 'theme_tokens', jaccard),
+            index.max_similarity(item['title'], 'theme_tokens', containment)
+            if len(item['title']) > MIN_THEME_LENGTH else 0.0,
+        )
+        if similarity >= reuse_threshold:
+            print(f"  ⏭️ 投稿済みのニュースを除外 ({similarity:.0%}): {item['title'][:60]}")
+            continue
+        item['score'] = 1.0 - similarity
+        ranked.append(item)
+
+    ranked.sort(key=lambda item: item['score'], reverse=True)
+    return ranked
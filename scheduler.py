@@ -1,55 +1,337 @@
 """
-毎日自動でブログ記事を投稿するスケジューラー
+自動でブログ記事を投稿するスケジューラー
+cron形式のスケジュール（複数指定可）ごとに、次の実行時刻まで眠って投稿ジョブを実行します
+- 1分ごとに起きて確認せず、最も近い実行時刻まで待機する
+- 最後に実行した時刻を .cache/scheduler_state.json に保存し、停止中に過ぎた実行は再起動時に
+  SCHEDULE_MISSED_POLICY に従って1回だけ実行する（run）かスキップする（skip）
+- WordPressPoster / ArticleGenerator はジョブ間で使い回す（設定の読み込み・履歴や索引の読み込みを毎回行わない）
+- サイトの一覧（sites.json）がある場合は、その各サイトに投稿する（schedule を指定したサイトはそのスケジュールで）
 """
 
-import schedule
-import time
-from datetime import datetime
-from wordpress_poster import WordPressPoster
 import os
+import json
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional, Dict, List, Tuple, Callable, Set
 from dotenv import load_dotenv
+from file_store import write_json_atomic
 
 load_dotenv()
 
-def job():
+# 投稿時刻のデフォルト（POST_SCHEDULES が未設定の場合に POST_TIME で指定）
+DEFAULT_POST_TIME = '09:00'
+# 停止中に過ぎた実行を、何時間前のものまで再起動時に実行するか
+DEFAULT_CATCHUP_MAX_AGE_HOURS = 12
+# 1回の待機の上限（秒、システムの時刻が変更された場合に実行時刻を計算し直すため）
+MAX_SLEEP_SECONDS = 3600
+
+# cronの各フィールドの範囲（分, 時, 日, 月, 曜日（0と7=日曜））
+_CRON_FIELDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+
+def _parse_cron_field(field: str, low: int, high: int) -> Set[int]:
     """
-    毎日の投稿ジョブ
+    cronの1つのフィールド（*, 1,15, 9-17, */10, 1-5/2 など）を値の集合に変換
     """
-    try:
-        print(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ===== 投稿ジョブ開始 =====\n")
-        
-        poster = WordPressPoster()
-        poster.post_daily_article()
-        
-        print(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ===== 投稿ジョブ完了 =====\n")
-        
-    except Exception as e:
-        print(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] エラー: {e}\n")
-        # エラーが発生しても次回の実行は継続
-
-def run_scheduler():
+    values = set()
+    for part in field.split(','):
+        step = 1
+        if '/' in part:
+            part, step_text = part.split('/', 1)
+            step = int(step_text)
+            if step <= 0:
+                raise ValueError(f"不正な間隔: {field}")
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start_text, end_text = part.split('-', 1)
+            start, end = int(start_text), int(end_text)
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end:
+            raise ValueError(f"範囲外の値: {field}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    def __init__(self, expression: str):
+        """
+        Args:
+            expression: cron形式のスケジュール（分 時 日 月 曜日、例: "0 9 * * *", "30 18 * * 1-5"）
+        """
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron形式は5つのフィールドで指定してください: {expression}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            _parse_cron_field(field, low, high) for field, (low, high) in zip(fields, _CRON_FIELDS)
+        )
+        self.weekdays = {weekday % 7 for weekday in weekdays}
+        # 日と曜日の両方が指定された場合は、どちらかに一致すれば実行する（cronと同じ）
+        self._day_restricted = fields[2] != '*'
+        self._weekday_restricted = fields[4] != '*'
+
+    @classmethod
+    def daily_at(cls, post_time: str) -> 'CronSchedule':
+        """
+        毎日決まった時刻（HH:MM）に実行するスケジュール
+        """
+        hour, minute = post_time.strip().split(':')
+        return cls(f"{int(minute)} {int(hour)} * * *")
+
+    def _matches_day(self, day: datetime) -> bool:
+        if day.month not in self.months:
+            return False
+        day_match = day.day in self.days
+        # datetime.weekday() は月曜が0、cronは日曜が0
+        weekday_match = (day.weekday() + 1) % 7 in self.weekdays
+        if self._day_restricted and self._weekday_restricted:
+            return day_match or weekday_match
+        return day_match and weekday_match
+
+    def next_after(self, moment: datetime) -> datetime:
+        """
+        指定した時刻より後の、次の実行時刻
+
+        Args:
+            moment: 基準の時刻
+
+        Returns:
+            次の実行時刻（秒以下は0）
+        """
+        start = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.replace(hour=0, minute=0)
+        # 2月29日のみなどのスケジュールもあるため、最大で4年分を探す
+        for _ in range(366 * 4 + 1):
+            if self._matches_day(day):
+                for hour in sorted(self.hours):
+                    for minute in sorted(self.minutes):
+                        candidate = day.replace(hour=hour, minute=minute)
+                        if candidate >= start:
+                            return candidate
+            day += timedelta(days=1)
+        raise ValueError(f"実行時刻が見つかりません: {self.expression}")
+
+
+def load_schedules() -> List[Tuple[str, CronSchedule]]:
+    """
+    環境変数からスケジュールを読み込む
+    POST_SCHEDULES（例: "morning=0 9 * * *; evening=30 18 * * 1-5"）が未設定の場合は POST_TIME に毎日1回
+
+    Returns:
+        [(名前, スケジュール), ...]
+    """
+    configured = os.getenv('POST_SCHEDULES', '')
+    if not configured.strip():
+        return [('daily', CronSchedule.daily_at(os.getenv('POST_TIME', DEFAULT_POST_TIME)))]
+
+    schedules = []
+    for index, entry in enumerate(part.strip() for part in configured.split(';')):
+        if not entry:
+            continue
+        if '=' in entry:
+            name, expression = (text.strip() for text in entry.split('=', 1))
+        else:
+            name, expression = f"schedule{index + 1}", entry
+        schedules.append((name, CronSchedule(expression)))
+    return schedules
+
+
+class PostJob:
+    """
+    投稿ジョブ（WordPressPoster と ArticleGenerator は初回の実行時に作成し、以降のジョブで使い回す）
+    """
+
+    def __init__(self, image_source: Optional[str] = None):
+        """
+        Args:
+            image_source: 画像生成のソース（省略時は環境変数IMAGE_SOURCE）
+        """
+        self.image_source = image_source or os.getenv('IMAGE_SOURCE', 'unsplash')
+        self._poster = None
+        self._generator = None
+
+    def __call__(self):
+        if self._poster is None:
+            from wordpress_poster import WordPressPoster
+            from article_generator import ArticleGenerator
+            self._poster = WordPressPoster()
+            self._generator = ArticleGenerator(image_source=self.image_source)
+        self._poster.post_daily_article(generator=self._generator)
+
+
+class SitePostJob:
+    """
+    サイトの一覧のサイトへの投稿ジョブ（一部のサイトが失敗した場合は、すべてのサイトの投稿後にエラーとする）
+    """
+
+    def __init__(self, poster, site_names: List[str]):
+        """
+        Args:
+            poster: MultiSitePoster（すべてのジョブで共有する）
+            site_names: 投稿するサイト名
+        """
+        self.poster = poster
+        self.site_names = site_names
+
+    def __call__(self):
+        results = self.poster.post(self.site_names)
+        failed = [r['site'] for r in results if r['error']]
+        if failed:
+            raise RuntimeError(f"投稿に失敗したサイト: {', '.join(failed)}")
+
+
+class Scheduler:
+    def __init__(self, state_file: Optional[str] = None, missed_policy: Optional[str] = None,
+                 catchup_max_age_hours: Optional[float] = None):
+        """
+        Args:
+            state_file: 最後に実行した時刻の保存先（デフォルトは .cache/scheduler_state.json）
+            missed_policy: 停止中に過ぎた実行の扱い（'run': 再起動時に1回実行 / 'skip': 実行しない）
+            catchup_max_age_hours: 何時間前に過ぎた実行まで再起動時に実行するか
+        """
+        self.state_file = Path(state_file or os.getenv('SCHEDULER_STATE_FILE', '.cache/scheduler_state.json'))
+        self.missed_policy = (missed_policy or os.getenv('SCHEDULE_MISSED_POLICY', 'run')).lower()
+        self.catchup_max_age = timedelta(hours=catchup_max_age_hours if catchup_max_age_hours is not None else float(
+            os.getenv('SCHEDULE_CATCHUP_MAX_AGE_HOURS', str(DEFAULT_CATCHUP_MAX_AGE_HOURS))))
+        self.jobs: List[Tuple[str, CronSchedule, Callable[[], None]]] = []
+        self.state: Dict[str, Dict] = {}
+        self._load_state()
+
+    def _load_state(self):
+        """
+        保存済みの実行状況を読み込む
+        """
+        if not self.state_file.exists():
+            return
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                self.state = json.load(f)
+        except Exception as e:
+            print(f"⚠️ スケジューラーの実行状況の読み込みエラー: {e}")
+
+    def _save_state(self):
+        """
+        実行状況を保存
+        """
+        try:
+            write_json_atomic(self.state_file, self.state, indent=2)
+        except Exception as e:
+            print(f"⚠️ スケジューラーの実行状況の保存エラー: {e}")
+
+    def add(self, name: str, schedule: CronSchedule, action: Callable[[], None]):
+        """
+        ジョブを追加
+
+        Args:
+            name: ジョブの名前（実行状況の保存に使うため、ジョブごとに変える）
+            schedule: 実行するスケジュール
+            action: 実行する関数
+        """
+        self.jobs.append((name, schedule, action))
+
+    def _first_run(self, name: str, schedule: CronSchedule, now: datetime) -> datetime:
+        """
+        起動時の最初の実行時刻（停止中に過ぎた実行があればポリシーに従う）
+        """
+        last_run = self.state.get(name, {}).get('last_run')
+        if not last_run:
+            return schedule.next_after(now)
+        last_run = datetime.fromisoformat(last_run)
+        next_run = schedule.next_after(last_run)
+        if next_run > now:
+            return next_run
+        # 再起動時に実行するのは、catchup_max_age 以内に過ぎた実行のうち最も新しいもの（1回だけ）
+        latest = None
+        candidate = schedule.next_after(max(last_run, now - self.catchup_max_age - timedelta(minutes=1)))
+        while candidate <= now:
+            if now - candidate <= self.catchup_max_age:
+                latest = candidate
+            candidate = schedule.next_after(candidate)
+        if self.missed_policy == 'run' and latest is not None:
+            print(f"⚠️ [{name}] 停止中に過ぎた実行（{latest.strftime('%Y-%m-%d %H:%M')}）を今から実行します")
+            return now
+        print(f"⚠️ [{name}] 停止中に過ぎた実行（{next_run.strftime('%Y-%m-%d %H:%M')}〜）はスキップします")
+        return candidate
+
+    def _run_job(self, name: str, action: Callable[[], None]):
+        """
+        ジョブを実行して実行状況を保存（エラーが発生しても次回の実行は継続）
+        """
+        started = datetime.now()
+        print(f"\n[{started.strftime('%Y-%m-%d %H:%M:%S')}] ===== 投稿ジョブ開始: {name} =====\n")
+        status = 'ok'
+        try:
+            action()
+            print(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ===== 投稿ジョブ完了: {name} =====\n")
+        except Exception as e:
+            status = 'error'
+            print(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] エラー: {e}\n")
+        self.state[name] = {'last_run': started.isoformat(timespec='seconds'), 'status': status}
+        self._save_state()
+
+    def run_forever(self, stop_event: Optional[threading.Event] = None):
+        """
+        次の実行時刻まで待機してジョブを実行することを繰り返す
+
+        Args:
+            stop_event: セットされたら停止するイベント（省略時は Ctrl+C まで実行）
+        """
+        stop_event = stop_event or threading.Event()
+        now = datetime.now()
+        next_runs = {name: self._first_run(name, schedule, now) for name, schedule, _ in self.jobs}
+        for name, schedule, _ in self.jobs:
+            print(f"  [{name}] {schedule.expression} → 次回: {next_runs[name].strftime('%Y-%m-%d %H:%M')}")
+
+        while not stop_event.is_set():
+            now = datetime.now()
+            due = [(name, schedule, action) for name, schedule, action in self.jobs if next_runs[name] <= now]
+            for name, schedule, action in sorted(due, key=lambda job: next_runs[job[0]]):
+                self._run_job(name, action)
+                next_runs[name] = schedule.next_after(datetime.now())
+                print(f"  [{name}] 次回: {next_runs[name].strftime('%Y-%m-%d %H:%M')}")
+            if due:
+                continue
+
+            wait_seconds = (min(next_runs.values()) - now).total_seconds()
+            stop_event.wait(min(max(wait_seconds, 0.0), MAX_SLEEP_SECONDS))
+
+
+def run_scheduler(stop_event: Optional[threading.Event] = None):
     """
     スケジューラーを開始
     """
-    # 投稿時間を環境変数から取得（デフォルトは09:00）
-    post_time = os.getenv('POST_TIME', '09:00')
-    
+    from multi_site_poster import load_sites, MultiSitePoster
+
+    scheduler = Scheduler()
+    sites = load_sites()
+    if sites:
+        # サイトの一覧がある場合は、サイトごとの WordPressPoster と ArticleGenerator をすべてのジョブで使い回す
+        poster = MultiSitePoster(sites)
+        for site in sites:
+            if site.schedule:
+                scheduler.add(f"site:{site.name}", CronSchedule(site.schedule), SitePostJob(poster, [site.name]))
+        default_sites = [site.name for site in sites if not site.schedule]
+        if default_sites:
+            for name, schedule in load_schedules():
+                scheduler.add(name, schedule, SitePostJob(poster, default_sites))
+    else:
+        # すべてのスケジュールで同じ投稿ジョブ（WordPressPoster / ArticleGenerator）を使い回す
+        post_job = PostJob()
+        for name, schedule in load_schedules():
+            scheduler.add(name, schedule, post_job)
+
     print(f"スケジューラーを開始しました")
-    print(f"毎日 {post_time} に記事を投稿します")
     print(f"現在時刻: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("\nスケジューラーを停止するには Ctrl+C を押してください\n")
-    
-    # スケジュールを設定
-    schedule.every().day.at(post_time).do(job)
-    
-    # スケジューラーを実行
-    while True:
-        schedule.run_pending()
-        time.sleep(60)  # 1分ごとにチェック
+    scheduler.run_forever(stop_event)
+
 
 if __name__ == "__main__":
     try:
         run_scheduler()
     except KeyboardInterrupt:
         print("\n\nスケジューラーを停止しました")
-
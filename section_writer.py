@@ -0,0 +1,143 @@
+"""
+セクション分割による記事生成モジュール
+短い呼び出しで記事の構成（<h2>の見出しと要点）を作り、各セクションの本文を並列に生成して順番に組み立てます
+1回の長い生成 + 既存の記事全体を送り直す「続き」の生成に比べ、所要時間は最も長いセクション程度になり、
+記事を送り直す入力トークンもかかりません
+"""
+
+import re
+from html import escape
+from typing import Optional, List, Tuple, Dict
+
+# 構成案が読み取れない場合に使う構成（ARTICLE_SYSTEM_PROMPT の【構成について】と同じ）
+DEFAULT_SECTIONS = [
+    ("はじめに", "最新のAI技術やサービスの重要性を説明する"),
+    ("最新動向", "最新ニュースや技術動向を紹介する"),
+    ("詳細解説", "主要な機能や特徴を詳しく説明する"),
+    ("比較・評価", "複数のツールやサービスを比較する"),
+    ("実用例", "実際の使用例や活用方法を紹介する"),
+    ("まとめ", "読者にとっての価値や今後の展望を提示する"),
+]
+
+OUTLINE_SYSTEM_PROMPT = """あなたはAI技術の専門知識を持つ経験豊富なテックライターです。
+読者が興味を持つ実用的な記事（4000〜5000字）の構成を考えます。
+
+【構成について】
+- 導入から始め、最新動向・詳細解説・比較・実用例などを経て、まとめで終える
+- セクションは5〜7個とし、内容が重ならないようにする
+
+【出力フォーマット】
+1行目: タイトル: [記事のタイトル]
+2行目以降: 見出し: [セクションの見出し] | [このセクションで書く内容の要点（1〜2文）]
+本文は書かないでください。
+"""
+
+SECTION_SYSTEM_PROMPT = """あなたはAI技術の専門知識を持つ経験豊富なテックライターです。
+複数のライターで1本の記事を分担して執筆しており、あなたは指定された1つのセクションだけを担当します。
+
+【内容について】
+- 具体的な事例、比較情報、実用的なアドバイスを含める
+- 専門的でありながら、初心者にもわかりやすい説明をする
+- 他のセクションで扱う内容には踏み込まない
+
+【形式について】
+- HTML形式で出力する（段落は<p>タグで囲む）
+- セクションの見出し（<h2>）は出力しない（必要なら小見出しに<h3>を使う）
+- 重要なポイントは<strong>タグで強調する
+- リストは<ul>や<ol>タグを使用する
+- 前置きや「このセクションでは」などの説明は書かず、本文だけを出力する
+"""
+
+_OUTLINE_LINE_RE = re.compile(r'^(?:見出し|##)\s*[:：]?\s*(?P<heading>[^|｜]+?)\s*(?:[|｜]\s*(?P<summary>.*))?$')
+
+
+def build_outline_prompt(source_prompt: str) -> str:
+    """
+    構成案を作るためのユーザープロンプト
+
+    Args:
+        source_prompt: 記事の元になるニュース・トピックの指示（_build_user_prompt の結果）
+    """
+    return f"""{source_prompt}
+
+【今回の出力】
+本文はまだ書かず、上記の記事の構成案だけを出力フォーマットに従って出力してください。"""
+
+
+def parse_outline(outline_text: str) -> Tuple[Optional[str], List[Tuple[str, str]]]:
+    """
+    構成案をタイトルとセクションの一覧に分解
+
+    Args:
+        outline_text: 構成案（1行目: タイトル: ..., 2行目以降: 見出し: ... | ...）
+
+    Returns:
+        (タイトル, [(見出し, 要点), ...]) のタプル（読み取れない場合はタイトルがNone、セクションが空）
+    """
+    title = None
+    sections = []
+    for line in outline_text.split('\n'):
+        line = line.strip().lstrip('-・*0123456789. ')
+        if not line:
+            continue
+        if line.startswith('タイトル:') or line.startswith('タイトル：'):
+            title = line.replace('タイトル:', '').replace('タイトル：', '').strip() or None
+            continue
+        match = _OUTLINE_LINE_RE.match(line)
+        if match:
+            sections.append((match.group('heading').strip(), (match.group('summary') or '').strip()))
+    return title, sections
+
+
+def build_section_messages(title: str, sections: List[Tuple[str, str]], index: int,
+                           source: str, target_chars: int) -> List[Dict]:
+    """
+    1つのセクションを生成するためのメッセージ
+
+    Args:
+        title: 記事のタイトル
+        sections: 記事全体の構成
+        index: 担当するセクションの番号
+        source: 記事の元になるニュース・トピック
+        target_chars: このセクションの目標文字数
+    """
+    outline = '\n'.join(
+        f"{'→ ' if i == index else '  '}{i + 1}. {heading}" for i, (heading, _) in enumerate(sections)
+    )
+    heading, summary = sections[index]
+    user_prompt = f"""記事のタイトル: {title}
+
+【記事の元になる情報】
+{source}
+
+【記事全体の構成（→ が担当するセクション）】
+{outline}
+
+【担当するセクション】
+見出し: {heading}
+書く内容: {summary or heading}
+
+このセクションの本文を{target_chars}字程度で執筆してください。"""
+    return [
+        {"role": "system", "content": SECTION_SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt}
+    ]
+
+
+def assemble_sections(sections: List[Tuple[str, str]], bodies: List[str]) -> str:
+    """
+    セクションの本文を構成の順番に <h2> の見出しを付けて組み立てる
+
+    Args:
+        sections: 記事全体の構成
+        bodies: セクションごとの本文（構成と同じ順番、正規化済みのHTML）
+
+    Returns:
+        記事の本文（HTML）
+    """
+    parts = []
+    for (heading, _), body in zip(sections, bodies):
+        # モデルが見出しを付けてしまった場合は重複しないように取り除く
+        body = re.sub(r'^\s*<h2>.*?</h2>', '', body, flags=re.DOTALL).strip()
+        parts.append(f"<h2>{escape(heading, quote=False)}</h2>\n\n{body}")
+    return '\n\n'.join(parts)
@@ -0,0 +1,126 @@
+"""
+重複チェック用インデックスのテスト
+転置インデックスで候補を絞り込んだ結果が、全件との総当たりの比較と一致すること（取りこぼしがないこと）を確認する
+"""
+
+import random
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from duplicate_index import (
+    DuplicateIndex, tokenize, jaccard, containment,
+    TITLE_SIMILARITY_THRESHOLD, THEME_SIMILARITY_THRESHOLD, PREFIX_LENGTH,
+)
+from history_store import HistoryStore
+
+_WORDS = [
+    'AI', '画像', '生成', 'ツール', '比較', '最新', '動向', 'ChatGPT', 'Gemini', 'Claude', '活用', '方法',
+    '入門', '解説', 'セキュリティ', 'LLM', '推論', 'チップ', '量子', 'エージェント', '検索', '動画', '音声', '翻訳',
+]
+
+
+def _text(rng: random.Random, low: int, high: int) -> str:
+    return ''.join(rng.choice(_WORDS) for _ in range(rng.randint(low, high)))
+
+
+def _mutate(rng: random.Random, text: str) -> str:
+    """
+    既存のテキストの一部を書き換える（しきい値付近の類似度の問い合わせを作るため）
+    """
+    start = rng.randrange(len(text))
+    end = min(len(text), start + rng.randint(1, 6))
+    return text[:start] + rng.choice(_WORDS) + text[end:]
+
+
+class DuplicateIndexTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.store = HistoryStore(Path(self._tmp.name) / 'post_history.db')
+        self.rng = random.Random(0)
+        self.start = datetime(2026, 1, 1)
+        for i in range(400):
+            self.store.append({
+                'title': _text(self.rng, 2, 6),
+                'theme': _text(self.rng, 4, 12),
+                'date': (self.start + timedelta(hours=i)).isoformat(),
+            })
+        self.index = DuplicateIndex.from_store(self.store)
+
+    def tearDown(self):
+        self.store._connect().close()
+        self._tmp.cleanup()
+
+    def _queries(self):
+        docs = list(self.index.docs.values())
+        for _ in range(150):
+            yield _text(self.rng, 1, 8)
+        for _ in range(150):
+            yield _mutate(self.rng, self.rng.choice(docs)['title'])
+        for _ in range(100):
+            yield _mutate(self.rng, self.rng.choice(docs)['theme'])
+
+    def _brute_force(self, text: str, field: str, measure, floor: float) -> float:
+        query = tokenize(text.lower().strip())
+        best = max(measure(query, set(doc[field])) for doc in self.index.docs.values())
+        return best if best >= floor else 0.0
+
+    def _assert_recall(self, field: str, measure, floor: float):
+        near = 0
+        for text in self._queries():
+            expected = self._brute_force(text, field, measure, floor)
+            near += expected > 0
+            self.assertAlmostEqual(self.index.max_similarity(text, field, measure, floor), expected,
+                                   msg=f"{field} {measure.__name__} {floor}: {text}")
+        # しきい値を超える問い合わせが十分に含まれていること（テストデータの確認）
+        self.assertGreater(near, 50)
+
+    def test_title_jaccard_matches_brute_force(self):
+        for floor in (TITLE_SIMILARITY_THRESHOLD, 0.2):
+            self._assert_recall('title_tokens', jaccard, floor)
+
+    def test_theme_containment_matches_brute_force(self):
+        for floor in (THEME_SIMILARITY_THRESHOLD, 0.2):
+            self._assert_recall('theme_tokens', containment, floor)
+
+    def test_theme_jaccard_matches_brute_force(self):
+        self._assert_recall('theme_tokens', jaccard, 0.2)
+
+    def test_length_filter_bounds(self):
+        # 類似度がちょうどしきい値になる文書（シングル数が |q| / threshold）も候補から外さない
+        index = DuplicateIndex()
+        query_text = 'abcdefghij'  # シングル9個
+        index.add({'id': 1, 'title': query_text + 'klmnopqrstu', 'theme': '', 'date': self.start.isoformat()})
+        query = tokenize(query_text)
+        doc_tokens = index._token_sets['title_tokens'][1]
+        self.assertAlmostEqual(jaccard(query, doc_tokens), TITLE_SIMILARITY_THRESHOLD)
+        self.assertIsNotNone(index.find_duplicate(query_text))
+        self.assertAlmostEqual(index.max_similarity(query_text, 'title_tokens', jaccard, TITLE_SIMILARITY_THRESHOLD),
+                               TITLE_SIMILARITY_THRESHOLD)
+
+    def test_prefix_match(self):
+        title = 'x' * PREFIX_LENGTH + '生成AIの最新動向'
+        index = DuplicateIndex()
+        index.add({'id': 1, 'title': title, 'theme': '', 'date': self.start.isoformat()})
+        self.assertIn('冒頭一致', index.find_duplicate('x' * PREFIX_LENGTH + 'まったく別の話題について'))
+        # 冒頭一致は PREFIX_LENGTH 文字を超えるタイトルのみ
+        self.assertIsNone(index.find_duplicate('x' * (PREFIX_LENGTH - 5) + '別'))
+
+    def test_sync_and_prune(self):
+        self.store.append({'title': '量子チップとLLM推論の最前線', 'theme': '', 'date': datetime(2026, 6, 1).isoformat()})
+        self.assertTrue(self.index.sync(self.store))
+        self.assertFalse(self.index.sync(self.store))
+        self.assertIsNotNone(self.index.find_duplicate('量子チップとLLM推論の最前線'))
+
+        cutoff = self.start + timedelta(hours=199)
+        self.assertEqual(self.index.prune(cutoff), 200)
+        self.assertEqual(len(self.index.docs), 201)
+        self.assertTrue(all(doc['date'] > cutoff.isoformat() for doc in self.index.docs.values()))
+        for postings in (self.index._title_postings, self.index._theme_postings):
+            for doc_ids in postings.values():
+                self.assertTrue(doc_ids <= self.index.docs.keys())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+ファイルへの保存の共通処理のテスト
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from file_store import write_json_atomic, evict_files
+
+
+class WriteJsonAtomicTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self._tmp.name)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_writes_and_creates_directory(self):
+        path = self.dir / 'sub' / 'state.json'
+        write_json_atomic(path, {'名前': 1}, indent=2)
+        with open(path, encoding='utf-8') as f:
+            self.assertEqual(json.load(f), {'名前': 1})
+        self.assertEqual(os.listdir(path.parent), ['state.json'])
+
+    def test_failed_write_keeps_previous_file(self):
+        path = self.dir / 'state.json'
+        write_json_atomic(path, {'a': 1})
+        with self.assertRaises(TypeError):
+            write_json_atomic(path, {'a': object()})
+        with open(path, encoding='utf-8') as f:
+            self.assertEqual(json.load(f), {'a': 1})
+        self.assertEqual(os.listdir(self.dir), ['state.json'])
+
+    def test_concurrent_writers(self):
+        path = self.dir / 'state.json'
+        errors = []
+
+        def writer(n):
+            try:
+                for i in range(50):
+                    write_json_atomic(path, {'writer': n, 'data': 'x' * 1000 * n})
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(1, 5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        self.assertEqual(len(data['data']), 1000 * data['writer'])
+
+
+class EvictFilesTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self._tmp.name)
+        now = time.time()
+        # 古い順に a, b, c（各100バイト）
+        for i, name in enumerate('abc'):
+            path = self.dir / f'{name}.json'
+            path.write_bytes(b'0' * 100)
+            os.utime(path, (now - 300 + i * 100, now - 300 + i * 100))
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _names(self):
+        return sorted(p.stem for p in self.dir.glob('*.json'))
+
+    def test_within_limits(self):
+        evict_files(self.dir, max_bytes=300, max_age=1000)
+        self.assertEqual(self._names(), ['a', 'b', 'c'])
+
+    def test_evicts_oldest_over_size(self):
+        evict_files(self.dir, max_bytes=150)
+        self.assertEqual(self._names(), ['c'])
+
+    def test_evicts_expired(self):
+        evict_files(self.dir, max_bytes=10 ** 6, max_age=250)
+        self.assertEqual(self._names(), ['b', 'c'])
+
+    def test_ignores_other_files(self):
+        (self.dir / 'keep.tmp').write_bytes(b'0' * 1000)
+        evict_files(self.dir, max_bytes=0)
+        self.assertEqual(self._names(), [])
+        self.assertTrue((self.dir / 'keep.tmp').exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+"""
+本文の正規化（normalize_html）のテスト
+"""
+
+import unittest
+
+from html_normalizer import normalize_html
+
+
+class ImpliedEndTagTest(unittest.TestCase):
+    def test_unclosed_list_items(self):
+        self.assertEqual(normalize_html('<ul><li>a<li>b</ul>')['html'], '<ul><li>a</li><li>b</li></ul>')
+
+    def test_nested_list_item_is_not_closed(self):
+        self.assertEqual(normalize_html('<ul><li>a<ul><li>b<li>c</ul><li>d</ul>')['html'],
+                         '<ul><li>a<ul><li>b</li><li>c</li></ul></li><li>d</li></ul>')
+
+    def test_unclosed_paragraphs(self):
+        result = normalize_html('<p>a<p>b')
+        self.assertEqual(result['html'], '<p>a</p>\n\n<p>b</p>')
+        self.assertEqual(result['text_length'], 2)
+
+    def test_block_closes_paragraph(self):
+        self.assertEqual(normalize_html('<p>a<ul><li>b</li></ul>')['html'], '<p>a</p>\n\n<ul><li>b</li></ul>')
+        self.assertEqual(normalize_html('<p>a<h2>b</h2>')['html'], '<p>a</p>\n\n<h2>b</h2>')
+        self.assertEqual(normalize_html('<blockquote><p>a<p>b</blockquote>')['html'],
+                         '<blockquote><p>a</p><p>b</p></blockquote>')
+
+    def test_unclosed_table_cells(self):
+        self.assertEqual(normalize_html('<table><tr><td>1<td>2<tr><td>3</table>')['html'],
+                         '<table><tr><td>1</td><td>2</td></tr><tr><td>3</td></tr></table>')
+
+
+class TruncationTest(unittest.TestCase):
+    def test_truncates_at_block_boundary(self):
+        content = '<p>' + 'a' * 3000 + '</p><p>' + 'b' * 3000 + '</p>'
+        result = normalize_html(content, max_chars=5000)
+        self.assertEqual(result['html'], '<p>' + 'a' * 3000 + '</p>')
+        self.assertEqual(result['text_length'], 3000)
+
+    def test_long_text_node_is_cut(self):
+        result = normalize_html('x' * 6000, max_chars=5000)
+        self.assertEqual(result['html'], '<p>' + 'x' * 5000 + '</p>')
+        self.assertEqual(result['text_length'], 5000)
+
+    def test_long_paragraph_after_heading_is_cut(self):
+        result = normalize_html('<h2>見出し</h2><p>' + 'y' * 6000 + '</p>', max_chars=5000)
+        self.assertEqual(result['html'], '<h2>見出し</h2>\n\n<p>' + 'y' * 4997 + '</p>')
+        self.assertEqual(result['text_length'], 5000)
+        self.assertEqual(result['outline'], [(2, '見出し')])
+
+    def test_cut_inside_inline_tag_closes_tags(self):
+        result = normalize_html('<p><strong>' + 'z' * 100 + '</strong>after</p>', max_chars=10)
+        self.assertEqual(result['html'], '<p><strong>' + 'z' * 10 + '</strong></p>')
+
+    def test_no_limit(self):
+        result = normalize_html('x' * 6000)
+        self.assertEqual(result['text_length'], 6000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+"""
+ヘッジ（hedged）のテスト（期限・例外・使わなかった結果の破棄）
+"""
+
+import threading
+import time
+import unittest
+
+from job_poller import hedged
+
+
+class HedgedTest(unittest.TestCase):
+    def test_single_candidate_result(self):
+        self.assertEqual(hedged([('A', lambda cancel: 'a', 0.0)], hedge_delay=1, timeout=1), 'a')
+
+    def test_single_candidate_hangs(self):
+        # 候補が1つでも全体の期限で打ち切り、キャンセルを通知する
+        cancelled = threading.Event()
+
+        def hang(cancel):
+            if cancel.wait(5):
+                cancelled.set()
+            return 'late'
+
+        started = time.monotonic()
+        self.assertIsNone(hedged([('A', hang, 0.0)], hedge_delay=1, timeout=0.2))
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertTrue(cancelled.wait(1))
+
+    def test_single_candidate_ignores_cancel(self):
+        # キャンセルに応じない候補も待たずに戻り、遅れて返った結果は破棄する
+        discarded = threading.Event()
+
+        def slow(cancel):
+            time.sleep(0.5)
+            return 'late'
+
+        started = time.monotonic()
+        self.assertIsNone(hedged([('A', slow, 0.0)], hedge_delay=1, timeout=0.1,
+                                 discard=lambda result: discarded.set()))
+        self.assertLess(time.monotonic() - started, 0.4)
+        self.assertTrue(discarded.wait(2))
+
+    def test_single_candidate_raises(self):
+        def fail(cancel):
+            raise RuntimeError('boom')
+
+        self.assertIsNone(hedged([('A', fail, 0.0)], hedge_delay=1, timeout=1))
+
+    def test_failed_candidate_falls_back(self):
+        def fail(cancel):
+            raise RuntimeError('boom')
+
+        self.assertEqual(hedged([('A', fail, 0.0), ('B', lambda cancel: 'b', 0.0)], hedge_delay=5, timeout=1), 'b')
+
+    def test_slow_candidate_is_hedged(self):
+        def slow(cancel):
+            cancel.wait(5)
+            return 'a'
+
+        started = time.monotonic()
+        self.assertEqual(hedged([('A', slow, 0.0), ('B', lambda cancel: 'b', 0.0)], hedge_delay=0.1, timeout=2), 'b')
+        self.assertLess(time.monotonic() - started, 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+"""
+スケジューラーのテスト（cronの次回実行時刻・停止中に過ぎた実行の扱い）
+"""
+
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+from scheduler import CronSchedule, Scheduler
+
+
+class CronScheduleTest(unittest.TestCase):
+    def test_next_after_is_strictly_later(self):
+        schedule = CronSchedule('0 9 * * *')
+        self.assertEqual(schedule.next_after(datetime(2026, 1, 1, 8, 59, 30)), datetime(2026, 1, 1, 9, 0))
+        self.assertEqual(schedule.next_after(datetime(2026, 1, 1, 9, 0)), datetime(2026, 1, 2, 9, 0))
+
+    def test_step_and_range(self):
+        schedule = CronSchedule('*/15 9-10 * * *')
+        self.assertEqual(schedule.next_after(datetime(2026, 1, 1, 9, 7)), datetime(2026, 1, 1, 9, 15))
+        self.assertEqual(schedule.next_after(datetime(2026, 1, 1, 10, 45)), datetime(2026, 1, 2, 9, 0))
+
+    def test_day_of_month_or_day_of_week(self):
+        # 日と曜日の両方を指定した場合は、どちらかに一致すれば実行する（13日 または 金曜日）
+        schedule = CronSchedule('0 9 13 * 5')
+        # 2026-01-03（土）の次は 01-09（金）
+        self.assertEqual(schedule.next_after(datetime(2026, 1, 3)), datetime(2026, 1, 9, 9, 0))
+        # 2026-01-10（土）の次は 01-13（火、13日）
+        self.assertEqual(schedule.next_after(datetime(2026, 1, 10)), datetime(2026, 1, 13, 9, 0))
+
+    def test_day_of_month_or_day_of_week_alone(self):
+        # 片方だけ指定した場合は、その条件のみ
+        self.assertEqual(CronSchedule('0 9 13 * *').next_after(datetime(2026, 1, 3)), datetime(2026, 1, 13, 9, 0))
+        self.assertEqual(CronSchedule('0 9 * * 5').next_after(datetime(2026, 1, 10)), datetime(2026, 1, 16, 9, 0))
+
+    def test_sunday_as_seven(self):
+        # 2026-01-04 は日曜日
+        for expression in ('0 9 * * 0', '0 9 * * 7'):
+            self.assertEqual(CronSchedule(expression).next_after(datetime(2026, 1, 1)), datetime(2026, 1, 4, 9, 0))
+
+    def test_february_29(self):
+        schedule = CronSchedule('0 0 29 2 *')
+        self.assertEqual(schedule.next_after(datetime(2026, 3, 1)), datetime(2028, 2, 29, 0, 0))
+        self.assertEqual(schedule.next_after(datetime(2028, 2, 29, 0, 0)), datetime(2032, 2, 29, 0, 0))
+
+    def test_impossible_date(self):
+        with self.assertRaises(ValueError):
+            CronSchedule('0 0 31 2 *').next_after(datetime(2026, 1, 1))
+
+    def test_invalid_expression(self):
+        for expression in ('0 9 * *', '60 9 * * *', '0 9 32 * *', '0 9 * * 8', '*/0 9 * * *', '0 17-9 * * *'):
+            with self.assertRaises(ValueError, msg=expression):
+                CronSchedule(expression)
+
+    def test_daily_at(self):
+        schedule = CronSchedule.daily_at('07:30')
+        self.assertEqual(schedule.next_after(datetime(2026, 1, 1, 8, 0)), datetime(2026, 1, 2, 7, 30))
+
+
+class SchedulerCatchUpTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.state_file = Path(self._tmp.name) / 'scheduler_state.json'
+        self.schedule = CronSchedule('0 9 * * *')
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _scheduler(self, policy: str, last_run=None) -> Scheduler:
+        scheduler = Scheduler(state_file=str(self.state_file), missed_policy=policy, catchup_max_age_hours=12)
+        if last_run is not None:
+            scheduler.state['job'] = {'last_run': last_run.isoformat()}
+        return scheduler
+
+    def test_first_start(self):
+        now = datetime(2026, 1, 11, 10, 0)
+        scheduler = self._scheduler('run')
+        self.assertEqual(scheduler._first_run('job', self.schedule, now), datetime(2026, 1, 12, 9, 0))
+
+    def test_nothing_missed(self):
+        now = datetime(2026, 1, 11, 10, 0)
+        scheduler = self._scheduler('run', last_run=datetime(2026, 1, 11, 9, 0))
+        self.assertEqual(scheduler._first_run('job', self.schedule, now), datetime(2026, 1, 12, 9, 0))
+
+    def test_missed_run_is_caught_up(self):
+        now = datetime(2026, 1, 11, 10, 0)
+        scheduler = self._scheduler('run', last_run=datetime(2026, 1, 10, 9, 0))
+        self.assertEqual(scheduler._first_run('job', self.schedule, now), now)
+
+    def test_many_missed_runs_are_caught_up_once(self):
+        # 数日停止していても、最も新しい実行（1時間前）を1回だけ実行する
+        now = datetime(2026, 1, 11, 10, 0)
+        scheduler = self._scheduler('run', last_run=datetime(2026, 1, 5, 9, 0))
+        self.assertEqual(scheduler._first_run('job', self.schedule, now), now)
+
+    def test_missed_run_too_old_is_skipped(self):
+        # 最も新しい実行が catchup_max_age（12時間）より前なら、次の実行時刻まで待つ
+        now = datetime(2026, 1, 11, 22, 0)
+        scheduler = self._scheduler('run', last_run=datetime(2026, 1, 5, 9, 0))
+        self.assertEqual(scheduler._first_run('job', self.schedule, now), datetime(2026, 1, 12, 9, 0))
+
+    def test_skip_policy(self):
+        now = datetime(2026, 1, 11, 10, 0)
+        scheduler = self._scheduler('skip', last_run=datetime(2026, 1, 10, 9, 0))
+        self.assertEqual(scheduler._first_run('job', self.schedule, now), datetime(2026, 1, 12, 9, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
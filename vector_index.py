@@ -0,0 +1,344 @@
+"""
+意味的な重複チェック用のベクトルインデックスモジュール
+記事（タイトル + 本文の冒頭）の埋め込みベクトルを投稿履歴の隣に保存し、
+言い回しが違うだけの同じ話題の記事を検出します
+ベクトルは NumPy の memmap（float32の連続領域）として保存し、全件とのコサイン類似度を1回の行列積で計算します
+埋め込みの計算方法（バックエンド）は差し替え可能で、テスト用にAPIを使わない決定的な実装も用意しています
+スケジューラーと手動実行など複数のプロセスが同じファイルに書き込むため、書き込みはファイルロックを取得し、
+他のプロセスが追加した行を読み込み直してから行う（ベクトルの行とメタデータの記事がずれないように）
+"""
+
+import os
+import re
+import json
+import hashlib
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Dict, List, Tuple
+import numpy as np
+from concurrency import limiter
+from duplicate_index import tokenize
+from file_store import write_json_atomic
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+# 重複と判定するコサイン類似度（環境変数 SEMANTIC_DUPLICATE_THRESHOLD で上書き可能）
+DEFAULT_SEMANTIC_THRESHOLD = 0.85
+# 埋め込みに使う本文の文字数（1回目の生成結果の冒頭）
+EMBEDDING_TEXT_LENGTH = 1000
+
+
+def article_text_for_embedding(title: str, content: str) -> str:
+    """
+    埋め込みの対象にするテキスト（タイトル + HTMLタグを除いた本文の冒頭）
+    """
+    plain_text = re.sub(r'<[^>]+>', '', content or '')
+    return f"{title}\n{plain_text.strip()[:EMBEDDING_TEXT_LENGTH]}"
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """
+    各行を単位ベクトルにする（内積 = コサイン類似度になるように）
+    """
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+@contextmanager
+def _file_lock(lock_path: Path):
+    """
+    プロセス間の排他ロック（with文で使用、ロックファイルは残しておく）
+    """
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class OpenAIEmbeddingBackend:
+    """
+    OpenAIの埋め込みAPIを使うバックエンド
+    """
+
+    def __init__(self, client, model: str = None):
+        """
+        Args:
+            client: OpenAIクライアント
+            model: 埋め込みモデル（省略時は環境変数EMBEDDING_MODEL、デフォルトは text-embedding-3-small）
+        """
+        self.client = client
+        self.model = model or os.getenv('EMBEDDING_MODEL', 'text-embedding-3-small')
+        self.name = f"openai:{self.model}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        テキストを埋め込みベクトルに変換
+
+        Returns:
+            (テキスト数, 次元数) の単位ベクトルの配列
+        """
+        with limiter('openai'):
+            response = self.client.embeddings.create(model=self.model, input=texts)
+        vectors = np.array([item.embedding for item in response.data], dtype=np.float32)
+        return _normalize_rows(vectors)
+
+
+class HashingEmbeddingBackend:
+    """
+    文字2-gramをハッシュで固定次元に割り当てる決定的なバックエンド
+    APIキーやネットワークなしで動作するため、テストや動作確認に使用
+    """
+
+    def __init__(self, dim: int = 256):
+        """
+        Args:
+            dim: ベクトルの次元数
+        """
+        self.dim = dim
+        self.name = f"hash:{dim}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        テキストを埋め込みベクトルに変換
+
+        Returns:
+            (テキスト数, 次元数) の単位ベクトルの配列
+        """
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for shingle in tokenize(text):
+                digest = hashlib.md5(shingle.encode('utf-8')).digest()
+                column = int.from_bytes(digest[:4], 'little') % self.dim
+                vectors[row, column] += 1.0 if digest[4] & 1 else -1.0
+        return _normalize_rows(vectors)
+
+
+def create_embedding_backend(client=None, name: str = None):
+    """
+    設定に応じた埋め込みバックエンドを作成
+
+    Args:
+        client: OpenAIクライアント（'openai' の場合に使用）
+        name: バックエンド名（省略時は環境変数EMBEDDING_BACKEND、デフォルトは 'openai'）
+
+    Returns:
+        埋め込みバックエンド
+    """
+    name = (name or os.getenv('EMBEDDING_BACKEND', 'openai')).lower()
+    if name == 'hash':
+        return HashingEmbeddingBackend()
+    if name == 'openai':
+        if client is None:
+            raise ValueError("OpenAIの埋め込みバックエンドにはクライアントが必要です")
+        return OpenAIEmbeddingBackend(client)
+    raise ValueError(f"不明な埋め込みバックエンドです: {name}")
+
+
+class VectorIndex:
+    def __init__(self, vectors_file: Path, backend):
+        """
+        Args:
+            vectors_file: ベクトルの保存先（float32の生データ、隣に .json のメタデータを保存）
+            backend: 埋め込みバックエンド
+        """
+        self.vectors_file = Path(vectors_file)
+        self.meta_file = self.vectors_file.with_suffix('.json')
+        self.lock_file = self.vectors_file.with_suffix('.lock')
+        self.backend = backend
+        self.threshold = float(os.getenv('SEMANTIC_DUPLICATE_THRESHOLD', str(DEFAULT_SEMANTIC_THRESHOLD)))
+        self._lock = threading.Lock()
+        # 行ごとの記事情報（{'title', 'date'}）
+        self.entries: List[Dict] = []
+        self.dim: Optional[int] = None
+        self._matrix: Optional[np.ndarray] = None
+        # 読み込んだメタデータの更新日時とサイズ（他のプロセスが更新したかの判定に使う）
+        self._meta_stamp: Optional[Tuple[int, int]] = None
+        with _file_lock(self.lock_file):
+            self._load()
+
+    def _stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = self.meta_file.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self):
+        """
+        保存済みのベクトルを読み込む（バックエンドが変わった場合は使わない、ファイルロックを取得した状態で呼ぶ）
+        """
+        self.entries = []
+        self.dim = None
+        self._matrix = None
+        self._meta_stamp = self._stamp()
+        if self._meta_stamp is None:
+            return
+        try:
+            with open(self.meta_file, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('backend') != self.backend.name:
+                print(f"⚠️ 埋め込みバックエンドが変更されたため、保存済みのベクトルを使用しません: {meta.get('backend')}")
+                return
+            entries = meta.get('entries', [])
+            dim = meta.get('dim')
+            expected_size = len(entries) * dim * 4 if entries else 0
+            actual_size = self.vectors_file.stat().st_size if self.vectors_file.exists() else 0
+            if actual_size != expected_size:
+                # 行がずれたベクトルで誤った記事と比較しないよう、一致しないファイルは使わない
+                raise ValueError(f"ベクトルファイルのサイズがメタデータと一致しません"
+                                 f"（{actual_size}バイト、{expected_size}バイトのはず）")
+            self.entries = entries
+            self.dim = dim
+        except Exception as e:
+            print(f"⚠️ ベクトルインデックスの読み込みエラー: {e}")
+            self.entries = []
+            self.dim = None
+
+    def _refresh(self):
+        """
+        他のプロセスがメタデータを更新していれば読み込み直す（ロックを取得した状態で呼ぶ）
+        """
+        if self._stamp() != self._meta_stamp:
+            with _file_lock(self.lock_file):
+                self._load()
+
+    def _vectors(self) -> np.ndarray:
+        """
+        保存済みのベクトルを memmap で取得（ファイル全体をメモリに読み込まない）
+        """
+        if not self.entries:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        if self._matrix is None:
+            self._matrix = np.memmap(self.vectors_file, dtype=np.float32, mode='r',
+                                     shape=(len(self.entries), self.dim))
+        return self._matrix
+
+    def embed(self, title: str, content: str) -> np.ndarray:
+        """
+        記事の埋め込みベクトルを計算
+
+        Returns:
+            次元数の長さの単位ベクトル
+        """
+        return self.backend.embed([article_text_for_embedding(title, content)])[0]
+
+    def search(self, vector: np.ndarray,
+               extra: Optional[Dict[str, np.ndarray]] = None) -> Optional[Tuple[str, float]]:
+        """
+        しきい値以上に類似した記事を探す（全件との内積を1回で計算）
+
+        Args:
+            vector: 記事の埋め込みベクトル
+            extra: 履歴に未保存の比較対象（生成中の記事のタイトル -> ベクトル）
+
+        Returns:
+            (類似した記事のタイトル, 類似度) のタプル、見つからなければNone
+        """
+        with self._lock:
+            self._refresh()
+            titles = [entry['title'] for entry in self.entries]
+            matrix = self._vectors()
+        if extra:
+            titles = titles + list(extra.keys())
+            extra_matrix = np.stack(list(extra.values())).astype(np.float32)
+            matrix = np.vstack([matrix, extra_matrix]) if len(matrix) else extra_matrix
+        if not titles or matrix.shape[1] != vector.shape[0]:
+            return None
+
+        scores = matrix @ vector
+        best = int(np.argmax(scores))
+        if scores[best] >= self.threshold:
+            return titles[best], float(scores[best])
+        return None
+
+    def add(self, title: str, date: str, vector: np.ndarray):
+        """
+        記事のベクトルを追加して保存
+        他のプロセスが追加した行を読み込み直し、メタデータの行数の位置に書き込む（追記モードは使わない）
+
+        Args:
+            title: 記事のタイトル
+            date: 投稿日時（ISO形式）
+            vector: 記事の埋め込みベクトル
+        """
+        with self._lock, _file_lock(self.lock_file):
+            self._load()
+            if self.dim is not None and self.dim != vector.shape[0]:
+                print(f"⚠️ ベクトルの次元数が一致しないため保存しません: {vector.shape[0]}")
+                return
+            dim = vector.shape[0]
+            offset = len(self.entries) * dim * 4
+            try:
+                with open(self.vectors_file, 'r+b' if self.vectors_file.exists() else 'wb') as f:
+                    f.seek(offset)
+                    f.write(np.asarray(vector, dtype=np.float32).tobytes())
+                    f.truncate()
+                try:
+                    self._save_meta(self.entries + [{'title': title, 'date': date}], dim)
+                except Exception:
+                    # メタデータを保存できなかった場合は、書き込んだ行を取り消してファイルのサイズを合わせる
+                    with open(self.vectors_file, 'r+b') as f:
+                        f.truncate(offset)
+                    raise
+                self.entries.append({'title': title, 'date': date})
+                self.dim = dim
+                self._meta_stamp = self._stamp()
+            except Exception as e:
+                print(f"⚠️ ベクトルインデックスの保存エラー: {e}")
+
+    def prune(self, cutoff_date: datetime):
+        """
+        保存期間を過ぎた記事のベクトルを削除（残す行だけでファイルを書き直す）
+
+        Args:
+            cutoff_date: これより前の記事を削除
+        """
+        with self._lock, _file_lock(self.lock_file):
+            self._load()
+            keep = []
+            for row, entry in enumerate(self.entries):
+                try:
+                    if datetime.fromisoformat(entry['date']) > cutoff_date:
+                        keep.append(row)
+                except ValueError:
+                    pass
+            if len(keep) == len(self.entries):
+                return
+            try:
+                kept_vectors = np.array(self._vectors()[keep], dtype=np.float32)
+                self._matrix = None
+                tmp_path = self.vectors_file.with_suffix('.tmp')
+                with open(tmp_path, 'wb') as f:
+                    f.write(kept_vectors.tobytes())
+                os.replace(tmp_path, self.vectors_file)
+                self.entries = [self.entries[row] for row in keep]
+                self._save_meta(self.entries, self.dim)
+                self._meta_stamp = self._stamp()
+            except Exception as e:
+                print(f"⚠️ ベクトルインデックスの保存エラー: {e}")
+                self._load()
+
+    def _save_meta(self, entries: List[Dict], dim: Optional[int]):
+        """
+        メタデータを保存（ベクトルの書き込み後に更新する）
+        """
+        write_json_atomic(self.meta_file, {'backend': self.backend.name, 'dim': dim, 'entries': entries})
@@ -5,17 +5,35 @@ AI関連の最新ニュースを毎日自動投稿します
 """
 
 import os
+import threading
+import time
 import requests
 from datetime import datetime
 from dotenv import load_dotenv
-from article_generator import generate_article
+from article_generator import ArticleGenerator, generate_article
+from http_client import get_session, get_timeout
+from concurrency import limiter
+from image_cache import ImageCache
+from image_spool import ImageSpool
+from image_optimizer import ImageOptimizer
 from pathlib import Path
+from typing import Optional, Tuple
 
 # 環境変数を読み込み
 load_dotenv()
 
 class WordPressPoster:
-    def __init__(self):
+    def __init__(self, base_url: Optional[str] = None, username: Optional[str] = None,
+                 password: Optional[str] = None, http: Optional[requests.Session] = None,
+                 request_limiter=None):
+        """
+        Args:
+            base_url: サイトのURL（省略時は環境変数WORDPRESS_URL）
+            username: ユーザー名（省略時は環境変数WORDPRESS_USERNAME）
+            password: アプリケーションパスワード（省略時は環境変数WORDPRESS_PASSWORD）
+            http: 使用するHTTPセッション（省略時は記事生成側と共有のセッション）
+            request_limiter: WordPressへのリクエストの制限（with文で使用、省略時は共有の limiter('wordpress')）
+        """
         # 環境変数を読み込み（.envファイルがあれば読み込むが、なくてもOK）
         load_dotenv()
         
@@ -23,17 +41,21 @@ class WordPressPoster:
         print("🔧 WordPress設定を読み込み中...")
         print(f"{'='*60}")
         
-        self.base_url = os.getenv('WORDPRESS_URL', '').strip()
-        # 環境変数が空、または不正な場合にデフォルト値を設定
-        if not self.base_url or not self.base_url.startswith(('http://', 'https://')):
-            self.base_url = 'https://freeeeeeestyle.com'
-            print(f"⚠️ WORDPRESS_URLが未設定のため、デフォルト値を使用: {self.base_url}")
+        if base_url is not None:
+            # サイトの一覧などで明示的に指定された場合は、デフォルト値に置き換えない
+            self.base_url = base_url.strip()
+        else:
+            self.base_url = os.getenv('WORDPRESS_URL', '').strip()
+            # 環境変数が空、または不正な場合にデフォルト値を設定
+            if not self.base_url or not self.base_url.startswith(('http://', 'https://')):
+                self.base_url = 'https://freeeeeeestyle.com'
+                print(f"⚠️ WORDPRESS_URLが未設定のため、デフォルト値を使用: {self.base_url}")
         
         # URLの末尾にスラッシュがある場合は削除
         self.base_url = self.base_url.rstrip('/')
 
-        self.username = os.getenv('WORDPRESS_USERNAME')
-        self.password = os.getenv('WORDPRESS_PASSWORD')
+        self.username = username if username is not None else os.getenv('WORDPRESS_USERNAME')
+        self.password = password if password is not None else os.getenv('WORDPRESS_PASSWORD')
         
         # 設定状況を表示
         print(f"🌐 WordPress URL: {self.base_url}")
@@ -55,69 +77,187 @@ class WordPressPoster:
         self.media_api_url = f"{self.base_url}/wp-json/wp/v2/media"
         print(f"📡 API URL: {self.api_url}")
         print(f"{'='*60}\n")
+        
+        # 指定がなければ記事生成側と同じコネクションプールを共有する
+        self.http = http or get_session()
+        self.request_limiter = request_limiter or limiter('wordpress')
+        # アップロード済みの画像のメディアIDを再利用する
+        self.image_cache = ImageCache()
+        # アップロード前に画像を縮小・再圧縮する
+        self.image_optimizer = ImageOptimizer()
+    
+    def _media_exists(self, media_id: int) -> bool:
+        """
+        メディアがWordPressに残っているか（管理画面で削除された場合は再利用しない）
+        """
+        try:
+            with self.request_limiter:
+                response = self.http.get(
+                    f"{self.media_api_url}/{media_id}",
+                    params={'context': 'edit', '_fields': 'id'},
+                    auth=(self.username, self.password),
+                    timeout=get_timeout('wordpress_post')
+                )
+            return response.status_code == 200
+        except Exception as e:
+            print(f"⚠️ メディアの確認エラー: {e}")
+            return False
+    
+    def _download_image(self, image_url: str) -> Optional[ImageSpool]:
+        """
+        画像をチャンクごとにダウンロード（記事生成側でダウンロードを省いた画像を、このサイトにアップロードする場合）
+        
+        Returns:
+            画像データ、失敗時はNone
+        """
+        try:
+            print(f"画像をダウンロード中: {image_url}")
+            with self.http.get(image_url, timeout=get_timeout('image_download'), stream=True) as response:
+                response.raise_for_status()
+                suffix = Path(image_url.split('?', 1)[0]).suffix or '.jpg'
+                return ImageSpool.from_response(response, suffix)
+        except Exception as e:
+            print(f"⚠️ 画像のダウンロードエラー: {e}")
+            return None
+    
+    def upload_featured_image(self, image: Optional[ImageSpool], title: str = "",
+                              image_url: str = "") -> Tuple[Optional[int], bool]:
+        """
+        アイキャッチ画像をアップロード（同じ画像がアップロード済みならそのメディアIDを再利用）
+        画像データは呼び出し側で close する
+        
+        Args:
+            image: 画像データ（記事生成側でダウンロードを省いた場合はNone）
+            title: 画像のタイトル
+            image_url: 画像の取得元URL
+        
+        Returns:
+            (メディアID, 新しくアップロードしたかどうか) のタプル、失敗時はメディアIDがNone
+        """
+        phash = self.image_cache.image_hash(image)
+        media_id = self.image_cache.find_media(self.base_url, image_url, phash)
+        if media_id:
+            if self._media_exists(media_id):
+                print(f"✓ アップロード済みの画像を再利用します (ID: {media_id})")
+                self.image_cache.record(self.base_url, media_id, image_url, phash)
+                return media_id, False
+            self.image_cache.forget_media(self.base_url, media_id)
+        
+        if image is None:
+            if not image_url.startswith(('http://', 'https://')):
+                return None, False
+            downloaded = self._download_image(image_url)
+            if downloaded is None:
+                return None, False
+            with downloaded:
+                phash = self.image_cache.image_hash(downloaded)
+                media_id = self._upload_optimized(downloaded, title)
+        else:
+            media_id = self._upload_optimized(image, title)
+        if media_id:
+            self.image_cache.record(self.base_url, media_id, image_url, phash)
+        return media_id, bool(media_id)
+    
+    def _upload_optimized(self, image: ImageSpool, title: str = "") -> Optional[int]:
+        """
+        画像を縮小・再圧縮してからアップロード
+        """
+        optimized = self.image_optimizer.optimize(image)
+        try:
+            return self.upload_media(optimized, title)
+        finally:
+            if optimized is not image:
+                optimized.close()
     
-    def upload_media(self, image_path: str, title: str = ""):
+    def upload_media(self, image: ImageSpool, title: str = ""):
         """
         WordPressにメディア（画像）をアップロード
+        画像データをそのままリクエストボディとして送信する（multipart形式にエンコードしない）
+        接続エラーやサーバーの一時的なエラーの場合は、画像データを先頭から読み直して再送する
         
         Args:
-            image_path: アップロードする画像ファイルのパス
+            image: アップロードする画像データ
             title: 画像のタイトル（省略可）
         
         Returns:
             アップロードされたメディアのID、失敗時はNone
         """
-        try:
-            # ファイルが存在するか確認
-            if not os.path.exists(image_path):
-                print(f"⚠️ 画像ファイルが見つかりません: {image_path}")
+        file_name = image.file_name(f"featured-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+        headers = {
+            'Content-Type': image.mime_type,
+            'Content-Disposition': f'attachment; filename="{file_name}"'
+        }
+        # タイトルはクエリパラメータで渡す（本文は画像データのみ）
+        params = {'title': title} if title else None
+        max_attempts = int(os.getenv('MEDIA_UPLOAD_ATTEMPTS', '2'))
+        
+        print(f"画像をアップロード中: {file_name} ({image.size}バイト)")
+        for attempt in range(1, max_attempts + 1):
+            try:
+                with self.request_limiter:
+                    response = self.http.post(
+                        self.media_api_url,
+                        data=image.body(),
+                        headers=headers,
+                        params=params,
+                        auth=(self.username, self.password),
+                        timeout=get_timeout('wordpress_media')
+                    )
+            except requests.exceptions.ConnectionError as e:
+                # 送信前・送信中に切断された場合（応答待ちのタイムアウトは二重登録を避けるため再送しない）
+                if attempt < max_attempts:
+                    print(f"⚠️ 画像アップロードの接続エラー、再送します ({attempt}/{max_attempts}): {e}")
+                    time.sleep(attempt)
+                    continue
+                print(f"⚠️ 画像アップロードエラー: {e}")
+                return None
+            except Exception as e:
+                print(f"⚠️ 画像アップロードエラー: {e}")
                 return None
             
-            # ファイル名とMIMEタイプを取得
-            file_name = Path(image_path).name
-            mime_type = 'image/jpeg' if image_path.endswith('.jpg') or image_path.endswith('.jpeg') else 'image/png'
-            
-            print(f"画像をアップロード中: {file_name}")
+            print(f"DEBUG: メディアアップロードレスポンスステータス: {response.status_code}")
             
-            # ファイルを読み込み
-            with open(image_path, 'rb') as img_file:
-                files = {
-                    'file': (file_name, img_file, mime_type)
-                }
-                
-                headers = {
-                    'Content-Disposition': f'attachment; filename="{file_name}"'
-                }
-                
-                # タイトルを設定
-                data = {}
-                if title:
-                    data['title'] = title
-                
-                response = requests.post(
-                    self.media_api_url,
-                    files=files,
-                    headers=headers,
-                    data=data,
+            if response.status_code == 201:
+                media_data = response.json()
+                media_id = media_data.get('id')
+                print(f"✓ 画像をアップロードしました (ID: {media_id})")
+                return media_id
+            if response.status_code in (502, 503, 504) and attempt < max_attempts:
+                print(f"⚠️ 画像アップロードの一時的なエラー、再送します ({attempt}/{max_attempts}): {response.status_code}")
+                time.sleep(attempt)
+                continue
+            print(f"⚠️ 画像アップロード失敗: {response.status_code}")
+            print(f"レスポンス: {response.text}")
+            return None
+        return None
+        
+    def delete_media(self, media_id: int) -> bool:
+        """
+        アップロード済みのメディアを削除（記事を投稿しなかった場合の後始末）
+        
+        Args:
+            media_id: 削除するメディアのID
+        
+        Returns:
+            削除に成功した場合True
+        """
+        try:
+            with self.request_limiter:
+                response = self.http.delete(
+                    f"{self.media_api_url}/{media_id}",
+                    params={'force': 'true'},
                     auth=(self.username, self.password),
-                    timeout=60
+                    timeout=get_timeout('wordpress_post')
                 )
-                
-                print(f"DEBUG: メディアアップロードレスポンスステータス: {response.status_code}")
-                
-                if response.status_code == 201:
-                    media_data = response.json()
-                    media_id = media_data.get('id')
-                    print(f"✓ 画像をアップロードしました (ID: {media_id})")
-                    return media_id
-                else:
-                    print(f"⚠️ 画像アップロード失敗: {response.status_code}")
-                    print(f"レスポンス: {response.text}")
-                    return None
-                    
+            if response.status_code == 200:
+                print(f"✓ 未使用の画像を削除しました (ID: {media_id})")
+                self.image_cache.forget_media(self.base_url, media_id)
+                return True
+            print(f"⚠️ 画像の削除に失敗: {response.status_code}")
+            return False
         except Exception as e:
-            print(f"⚠️ 画像アップロードエラー: {e}")
-            return None
+            print(f"⚠️ 画像削除エラー: {e}")
+            return False
         
     def create_post(self, title, content, status='publish', featured_media_id=None):
         """
@@ -154,13 +294,14 @@ class WordPressPoster:
             print(f"DEBUG: パスワードの長さ: {len(self.password) if self.password else 0}文字")
             print(f"DEBUG: パスワードの先頭4文字: {self.password[:4] if self.password else 'なし'}")
             
-            response = requests.post(
-                self.api_url,
-                json=data,
-                headers=headers,
-                auth=(self.username, self.password),
-                timeout=30
-            )
+            with self.request_limiter:
+                response = self.http.post(
+                    self.api_url,
+                    json=data,
+                    headers=headers,
+                    auth=(self.username, self.password),
+                    timeout=get_timeout('wordpress_post')
+                )
             
             print(f"DEBUG: レスポンスステータス: {response.status_code}")
             print(f"DEBUG: レスポンスヘッダー: {dict(response.headers)}")
@@ -206,10 +347,65 @@ class WordPressPoster:
                 print(f"レスポンス内容: {e.response.text}")
             raise
     
-    def post_daily_article(self):
+    def publish_article(self, article_data: dict):
+        """
+        生成済みの記事をWordPressに投稿（画像があればアイキャッチとしてアップロード）
+        
+        Args:
+            article_data: generate_article の戻り値
+        
+        Returns:
+            投稿のレスポンス
+        """
+        print(f"タイトル: {article_data['title']}")
+        print(f"本文の長さ: {len(article_data['content'])}文字")
+        
+        # 画像をアップロード（記事生成中にアップロード済みならそのIDを使う）
+        featured_media_id = article_data.get('featured_media_id')
+        uploaded = False
+        image = article_data.get('image')
+        if not featured_media_id and (image or article_data.get('image_url')):
+            print("\n画像をWordPressにアップロードします...")
+            try:
+                featured_media_id, uploaded = self.upload_featured_image(
+                    image=image,
+                    title=article_data['title'],
+                    image_url=article_data.get('image_url', '')
+                )
+            finally:
+                if image:
+                    image.close()
+        
+        # WordPressに投稿
+        print("\nWordPressへの投稿を開始します...")
+        try:
+            result = self.create_post(
+                title=article_data['title'],
+                content=article_data['content'],
+                status='publish',
+                featured_media_id=featured_media_id
+            )
+        except Exception:
+            # 投稿できなかった場合、アップロードした画像が残らないように削除（再利用した画像は残す）
+            if featured_media_id and uploaded:
+                self.delete_media(featured_media_id)
+            raise
+        
+        print(f"\n✓ 投稿成功！")
+        print(f"記事ID: {result.get('id')}")
+        print(f"記事URL: {result.get('link', 'N/A')}")
+        if featured_media_id:
+            print(f"アイキャッチ画像ID: {featured_media_id}")
+        
+        return result
+    
+    def post_daily_article(self, generator: Optional[ArticleGenerator] = None):
         """
         毎日の記事を生成して投稿（画像付き）
         4000〜5000字の実用的でユニークなAI記事をBanana Pro Nano画像付きで投稿
+        
+        Args:
+            generator: 使い回す ArticleGenerator（スケジューラーなど、省略時は毎回作成）
         """
         print(f"\n{'='*60}")
         print(f"🚀 AI記事自動投稿開始")
@@ -218,54 +414,73 @@ class WordPressPoster:
         
         try:
             # 画像ソースを環境変数から取得（デフォルトはunsplash - 無料）
-            image_source = os.getenv('IMAGE_SOURCE', 'unsplash')
+            image_source = generator.image_source if generator is not None else os.getenv('IMAGE_SOURCE', 'unsplash')
             print(f"📝 画像ソース: {image_source}")
             
-            # 記事を生成（画像も生成）
+            # 記事を生成（画像は本文の生成中にアップロードしておく）
             print("\n📰 記事生成を開始します...")
-            article_data = generate_article(image_source=image_source, generate_image=True)
-            
-            print(f"タイトル: {article_data['title']}")
-            print(f"本文の長さ: {len(article_data['content'])}文字")
-            
-            # 画像をアップロード
-            featured_media_id = None
-            if 'image_path' in article_data and article_data['image_path']:
-                print("\n画像をWordPressにアップロードします...")
-                featured_media_id = self.upload_media(
-                    image_path=article_data['image_path'],
-                    title=article_data['title']
-                )
-                
-                # 一時ファイルを削除
-                try:
-                    os.unlink(article_data['image_path'])
-                    print(f"一時ファイルを削除しました: {article_data['image_path']}")
-                except Exception as e:
-                    print(f"⚠️ 一時ファイルの削除に失敗: {e}")
-            
-            # WordPressに投稿
-            print("\nWordPressへの投稿を開始します...")
-            result = self.create_post(
-                title=article_data['title'],
-                content=article_data['content'],
-                status='publish',
-                featured_media_id=featured_media_id
-            )
-            
-            print(f"\n✓ 投稿成功！")
-            print(f"記事ID: {result.get('id')}")
-            print(f"記事URL: {result.get('link', 'N/A')}")
-            if featured_media_id:
-                print(f"アイキャッチ画像ID: {featured_media_id}")
-            
-            return result
+            uploader = FeaturedImageUploader(self)
+            # 記事の生成・投稿に失敗した場合は、生成中にアップロードした画像を削除する
+            try:
+                if generator is not None:
+                    article_data = generator.generate_article(generate_image=True, image_handler=uploader.upload)
+                else:
+                    article_data = generate_article(
+                        image_source=image_source,
+                        generate_image=True,
+                        image_handler=uploader.upload
+                    )
+                return self.publish_article(article_data)
+            except Exception:
+                uploader.discard()
+                raise
             
         except Exception as e:
             print(f"投稿処理でエラーが発生しました: {e}")
             raise
 
 
+class FeaturedImageUploader:
+    """
+    記事の生成中に画像をWordPressへアップロードしておくためのハンドラー
+    generate_article の image_handler に upload を渡し、記事を破棄する場合は discard で削除する
+    """
+    
+    def __init__(self, poster: WordPressPoster):
+        self.poster = poster
+        self.media_ids = []
+        self._lock = threading.Lock()
+    
+    def upload(self, image_url: str, image: Optional[ImageSpool], title: str = "") -> Optional[int]:
+        """
+        画像をアップロードして画像データを閉じる（画像生成のバックグラウンドスレッドで呼ばれる）
+        アップロード済みの画像はそのメディアIDを再利用する（記事を破棄しても削除しない）
+        
+        Returns:
+            アップロードされたメディアのID、失敗時はNone
+        """
+        print("\n画像をWordPressにアップロードします（本文の生成と並行）...")
+        try:
+            media_id, uploaded = self.poster.upload_featured_image(image, title=title, image_url=image_url)
+        finally:
+            if image:
+                image.close()
+        
+        if media_id and uploaded:
+            with self._lock:
+                self.media_ids.append(media_id)
+        return media_id
+    
+    def discard(self):
+        """
+        記事を投稿しない場合に、アップロード済みの画像を削除
+        """
+        with self._lock:
+            media_ids, self.media_ids = self.media_ids, []
+        for media_id in media_ids:
+            self.poster.delete_media(media_id)
+
+
 if __name__ == "__main__":
     poster = WordPressPoster()
     poster.post_daily_article()